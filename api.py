@@ -0,0 +1,23 @@
+import argparse
+
+from src.api import APIServer
+
+# Read-only JSON API next to the dashboard: python api.py, then e.g. GET /impact/roles?impact=Impact on DJ.
+# The DANCEFLOOR_* settings of the dashboard (backend, streaming, incremental ingest) apply here as well.
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the dashboard aggregates as JSON.")
+    parser.add_argument('--host', default='127.0.0.1', help="interface to listen on")
+    parser.add_argument('--port', type=int, default=8502, help="port to listen on")
+    parser.add_argument('--workers', type=int, default=4, help="worker threads answering requests")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args()
+
+    server = APIServer((args.host, args.port), args.workers, args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_port} with {args.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,19 +1,66 @@
+import cProfile
+import importlib
+
 import streamlit as st
-from src import home, demographics, talking_behaviour, impact_analysis, quiet_importance, yapping_factor
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from src.filters import render_filter_sidebar
+from src.utils import INCREMENTAL, render_shared_memory_report
+from src.figure_cache import render_figure_cache_report, get_figure_cache
+from src.validation import render_validation_report
+from src.profiling import PERF_LOG, span, start_rerun, finish_rerun, render_profiling_controls, \
+    render_performance_panel
 
 st.set_page_config(page_title="Rave Data Analysis Dashboard", layout="wide")
 
+# Page modules are imported only when selected; pages import plotly inside app() for the same reason
 PAGES = {
-    "Home": home,
-    "Demographics": demographics,
-    "Talking Behavior": talking_behaviour,
-    "Impact Analysis": impact_analysis,
-    "Quiet Importance": quiet_importance,
-    "Yapping Factor": yapping_factor
+    "Home": "src.home",
+    "Demographics": "src.demographics",
+    "Talking Behavior": "src.talking_behaviour",
+    "Impact Analysis": "src.impact_analysis",
+    "Quiet Importance": "src.quiet_importance",
+    "Yapping Factor": "src.yapping_factor",
+    "Talking Factors": "src.talking_factors",
+    "Associations": "src.associations",
+    "Open Answers": "src.open_answers",
+    "Trends Over Time": "src.trends"
 }
 
 st.sidebar.title("Navigation")
 selection = st.sidebar.radio("Go to", list(PAGES.keys()))
 
-page = PAGES[selection]
-page.app()
+# Record timing spans when the performance panel is open or a performance log is configured
+if st.session_state.get('debug:panel') or PERF_LOG:
+    ctx = get_script_run_ctx()
+    start_rerun(selection, ctx.session_id if ctx else None)
+
+# Pick up responses appended to the export since the last rerun
+if INCREMENTAL:
+    from src.ingest import refresh_dataset, render_ingest_report
+    refresh_dataset()
+
+# Filters apply to every page
+with span('filters'):
+    matching = render_filter_sidebar()
+show_panel, capture_profile = render_profiling_controls()
+if matching == 0 and selection != "Home":
+    st.warning("No participants match the selected filters.")
+    st.stop()
+
+page = importlib.import_module(PAGES[selection])
+profile = cProfile.Profile() if capture_profile else None
+with span(f'page:{PAGES[selection]}'):
+    if profile is None:
+        page.app()
+    else:
+        profile.runcall(page.app)
+
+render_validation_report()
+render_shared_memory_report()
+if INCREMENTAL:
+    render_ingest_report()
+render_figure_cache_report()
+
+rerun = finish_rerun()
+if show_panel and rerun is not None:
+    render_performance_panel(rerun, profile, get_figure_cache().stats())
@@ -0,0 +1,150 @@
+import math
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+
+# Integer codes of a categorical column against a fixed category order (-1 for missing/unknown values)
+def get_codes(values, categories):
+    if isinstance(values.dtype, pd.CategoricalDtype) and list(values.cat.categories) == list(categories):
+        return values.cat.codes.to_numpy()
+    return pd.Categorical(values, categories=categories).codes
+
+
+# Bit pattern of the options ticked in one comma-joined multi-select answer (bit i for options[i]).
+# Options are matched whole and longest first, so labels that contain the separator are never split,
+# and free text that matches no option is ignored.
+def tokenize_multi_select(answer, options, separator=', '):
+    # Stray separators at either end (e.g. 'A, ') are dropped before matching
+    text = f'{separator}{answer.strip(separator + " ")}{separator}'
+    pattern = 0
+    for i in sorted(range(len(options)), key=lambda i: len(options[i]), reverse=True):
+        token = f'{separator}{options[i]}{separator}'
+        if token in text:
+            pattern |= 1 << i
+            text = text.replace(token, separator)
+    return pattern
+
+
+# Bit patterns of a column of multi-select answers, -1 where unanswered. Every distinct answer is
+# tokenized once and broadcast through its codes, so the cost does not grow with the number of rows.
+def parse_multi_select(values, options, separator=', '):
+    codes, uniques = pd.factorize(values)
+    patterns = np.array([tokenize_multi_select(str(answer), options, separator) for answer in uniques] + [-1],
+                        dtype=np.int8 if len(options) < 8 else np.int64)
+    return patterns[codes]
+
+
+# Histogram bins computed server-side exactly as plotly.js autobins a numeric trace with nbinsx set
+# (Axes.autoBin, autoTicks, tickFirst, autoShiftNumericBins and Lib.increment), so only bar geometry
+# has to be sent to the browser. values may be distinct values with their counts passed as weights.
+def histogram_bins(values, nbins, weights=None):
+    values = np.asarray(values, dtype=float)
+    weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+    keep = ~np.isnan(values) & (weights > 0)
+    values, weights = values[keep], weights[keep]
+    if not len(values):
+        return {'start': None, 'end': None, 'size': None, 'edges': np.empty(0),
+                'centers': np.empty(0), 'counts': np.empty(0, dtype=np.int64)}
+
+    data_min, data_max = values.min(), values.max()
+    size = auto_dtick((data_max - data_min) / nbins)
+
+    # First tick inside the range padded by 1e-4 of its span, then one step back
+    padded_min = data_min - (data_max - data_min) * 1e-4
+    start = js_increment(math.ceil(padded_min / size) * size, -size)
+    start = auto_shift_bins(start, size, values, weights, data_min, data_max)
+    end = start + (1 + math.floor((data_max - start) / size)) * size
+
+    # Bin edges are generated by repeated increments, as in the histogram calc
+    edges = [start]
+    stop = end + (start - js_increment(start, size)) / 1e6
+    while edges[-1] < stop:
+        edge = js_increment(edges[-1], size)
+        if edge <= edges[-1]:
+            break
+        edges.append(edge)
+    edges = np.array(edges)
+
+    bins = np.floor((values - start) / size + 1e-9).astype(np.int64)
+    inside = (bins >= 0) & (bins < len(edges) - 1)
+    counts = np.bincount(bins[inside], weights=weights[inside], minlength=len(edges) - 1).round().astype(np.int64)
+
+    # Bars are drawn from the first to the last non-empty bin
+    filled = np.flatnonzero(counts)
+    bars = slice(filled[0], filled[-1] + 1) if len(filled) else slice(0, 0)
+    return {'start': start, 'end': end, 'size': size, 'edges': edges,
+            'centers': ((edges[:-1] + edges[1:]) / 2)[bars], 'counts': counts[bars]}
+
+
+def auto_dtick(rough):
+    # "Nice" tick spacing strictly above rough: 2, 5 or 10 times a power of ten
+    if not rough > 0:
+        return 1.0
+    base = math.pow(10, math.floor(math.log(rough) / math.log(10)))
+    dtick = base * js_round_up(rough / base, [2, 5, 10])
+    return dtick or 1.0
+
+
+def js_round_up(value, levels):
+    low, high = 0, len(levels) - 1
+    while low < high:
+        mid = (low + high) // 2
+        if levels[mid] <= value:
+            low = mid + 1
+        else:
+            high = mid
+    return levels[low]
+
+
+def auto_shift_bins(start, size, values, weights, data_min, data_max):
+    def near_edge(v):
+        # Within 1% of a bin edge (JS remainder keeps the sign of the dividend, like fmod)
+        return np.fmod(1 + (v - start) * 100 / size, 100) < 2
+
+    total = weights.sum()
+    integers = weights[values % 1 == 0].sum()
+    edge_count = weights[near_edge(values)].sum()
+    mid_count = weights[near_edge(values + size / 2)].sum()
+
+    if integers == total:
+        if size < 1:
+            return data_min - 0.5 * size
+        start -= 0.5
+        return start + size if start + size < data_min else start
+    if mid_count < 0.1 * total and (edge_count > 0.3 * total or near_edge(data_min) or near_edge(data_max)):
+        shift = size / 2
+        return start + shift if start + shift < data_min else start - shift
+    return start
+
+
+def js_increment(x, delta):
+    # Lib.increment: add delta while cleaning up floating point noise in the result
+    if not delta:
+        return x
+    r = 1 / abs(delta)
+    result = (r * x + r * delta) / r if r > 1 else x + delta
+    length = len(js_number_str(result))
+    if length > 16 and length >= len(js_number_str(x)) + len(js_number_str(delta)) and abs(result) < 1e12:
+        result = float(f'{result:.11e}')
+    return result
+
+
+def js_number_str(x):
+    # Number.prototype.toString for finite floats
+    if x == 0:
+        return '0'
+    sign = '-' if x < 0 else ''
+    decimal = Decimal(repr(abs(x)))
+    digits = ''.join(map(str, decimal.as_tuple().digits)).rstrip('0') or '0'
+    n = decimal.adjusted() + 1
+    k = len(digits)
+    if k <= n <= 21:
+        return sign + digits + '0' * (n - k)
+    if 0 < n <= 21:
+        return sign + digits[:n] + '.' + digits[n:]
+    if -6 < n <= 0:
+        return sign + '0.' + '0' * (-n) + digits
+    rest = '.' + digits[1:] if k > 1 else ''
+    return f"{sign}{digits[0]}{rest}e{'+' if n - 1 >= 0 else '-'}{abs(n - 1)}"
@@ -0,0 +1,348 @@
+import numpy as np
+import pandas as pd
+from src.utils import DATA_PATH, COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE, COL_TALK_FREQUENCY, \
+    COL_TALK_DURATION, COL_TALK_PERCEPTION, COL_QUIET_IMPORTANCE, COL_LIKELIHOOD_INTERVENE, ROLES, ROLE_COLUMNS, \
+    TALK_FREQUENCY, TALK_DURATION, TALKING_FACTORS, COL_FACTOR_PATTERN, FACTOR_PATTERNS, LIKERT_LEVELS, read_dataset
+from src.scoring import frequency_map_variants, duration_map_variants, perturb_maps, build_variant_grid, score_table, \
+    sweep_cells, summarize_sensitivity, YAPPING_FACTOR
+from src.aggregations import histogram_bins
+from src.profiling import timed
+
+# Numbers behind every chart and statistic of the dashboard, computed from an AggregateCube (or per-respondent
+# scores) without touching Streamlit. Pages render these; batch jobs, benchmarks and reports can call them directly.
+
+# Bootstrap confidence intervals of group means: resamples, confidence level, seed, and resamples drawn per batch
+BOOTSTRAP_RESAMPLES = 10000
+BOOTSTRAP_CONFIDENCE = 0.95
+BOOTSTRAP_SEED = 0
+BOOTSTRAP_BATCH = 1000
+
+
+# Cube for the whole dataset, or the rows selected by a boolean mask, read straight from disk
+def build_dataset_cube(path=DATA_PATH, mask=None):
+    from src.cube import build_cube, CUBE_COLUMNS
+
+    df = read_dataset(path, CUBE_COLUMNS)
+    return build_cube(df if mask is None else df[mask])
+
+
+# Pair counts of every question for the whole dataset, or the rows selected by a boolean mask
+def build_dataset_contingency(path=DATA_PATH, mask=None):
+    from src.contingency import build_contingency, ASSOCIATION_COLUMNS
+
+    df = read_dataset(path, ASSOCIATION_COLUMNS)
+    return build_contingency(df if mask is None else df[mask])
+
+
+# Percentile bootstrap interval of the mean of every group, for answers that take a few distinct values:
+# counts[..., k] respondents of a group gave values[k]. Resampling a group's n respondents with replacement only
+# changes how many of them give each value, so every resample is one multinomial draw of n over the group's
+# shares, distributed exactly like resampling row indices. All groups are drawn together, BOOTSTRAP_BATCH
+# resamples at a time, at a cost that depends on the number of groups and values, not of respondents.
+# Returns the lower and upper bounds, NaN for groups without respondents.
+@timed
+def bootstrap_mean_intervals(counts, values, n_resamples=BOOTSTRAP_RESAMPLES, confidence=BOOTSTRAP_CONFIDENCE,
+                             seed=BOOTSTRAP_SEED):
+    counts = np.asarray(counts, dtype=np.int64)
+    shape = counts.shape[:-1]
+    counts = counts.reshape(-1, counts.shape[-1])
+    sizes = counts.sum(axis=1)
+    shares = counts / np.where(sizes > 0, sizes, 1)[:, None]
+    values = np.asarray(values, dtype=np.float64)
+
+    rng = np.random.default_rng(seed)
+    means = np.empty((n_resamples, len(counts)))
+    for start in range(0, n_resamples, BOOTSTRAP_BATCH):
+        batch = min(BOOTSTRAP_BATCH, n_resamples - start)
+        draws = rng.multinomial(sizes, shares, size=(batch, len(counts)))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means[start:start + batch] = draws @ values / sizes
+
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(means, [alpha, 1 - alpha], axis=0)
+    empty = sizes == 0
+    lower[empty] = upper[empty] = np.nan
+    return lower.reshape(shape), upper.reshape(shape)
+
+
+# Demographics
+
+@timed
+def total_participants(cube):
+    return cube.total()
+
+
+@timed
+def age_distribution(cube):
+    return cube.series(COL_AGE)
+
+
+@timed
+def gender_distribution(cube):
+    return cube.value_counts(COL_GENDER)
+
+
+@timed
+def attendance_distribution(cube):
+    return cube.value_counts(COL_ATTENDANCE)
+
+
+@timed
+def experience_distribution(cube):
+    return cube.series(COL_EXPERIENCE)
+
+
+@timed
+def role_distribution(cube):
+    return pd.Series({col: cube.total(f'sum:{col}') for col in ROLE_COLUMNS}).sort_values(ascending=False)
+
+
+# Talking behaviour
+
+@timed
+def talk_frequency_distribution(cube):
+    return cube.series(COL_TALK_FREQUENCY)
+
+
+@timed
+def talk_duration_distribution(cube):
+    return cube.series(COL_TALK_DURATION)
+
+
+@timed
+def talk_perception_distribution(cube):
+    return cube.series(COL_TALK_PERCEPTION)
+
+
+# Impact analysis
+
+@timed
+def impact_distribution(cube, impact_column):
+    return cube.value_counts(impact_column)
+
+
+# Percentage and count of each role per impact answer
+@timed
+def impact_by_role(cube, impact_column):
+    return cube.multilabel_crosstab(impact_column, ROLE_COLUMNS, labels=ROLES)
+
+
+# Impact answers in the order the breakdown bars are grouped
+IMPACT_BREAKDOWN_ORDER = ['Yes, positively', 'No effect', 'Yes, negatively']
+
+
+# Long table of the share and count of each impact answer within every level of a breakdown column
+@timed
+def impact_breakdown(cube, breakdown_column, impact_column):
+    counts = cube.frame(breakdown_column, impact_column)
+    percentages = counts.div(counts.sum(axis=1), axis=0) * 100
+
+    data = pd.melt(percentages.reset_index(), id_vars=[breakdown_column], value_vars=IMPACT_BREAKDOWN_ORDER,
+                   var_name='Impact', value_name='Percentage')
+    data['Count'] = pd.melt(counts.reset_index(), id_vars=[breakdown_column], value_vars=IMPACT_BREAKDOWN_ORDER,
+                            var_name='Impact', value_name='Count')['Count']
+    return data
+
+
+# Quiet importance
+
+# Counts and overall percentages for every importance x likelihood pair, likelihood on the rows
+@timed
+def quiet_heatmap(cube):
+    counts = cube.frame(COL_LIKELIHOOD_INTERVENE, COL_QUIET_IMPORTANCE)
+    return counts, counts.div(counts.sum().sum()) * 100
+
+
+@timed
+def quiet_averages(cube):
+    return cube.mean([], COL_QUIET_IMPORTANCE), cube.mean([], COL_LIKELIHOOD_INTERVENE)
+
+
+# Average intervention likelihood per answered importance level (rows) and demographic group (columns)
+@timed
+def likelihood_by_importance(cube, demographic_column):
+    data = pd.DataFrame(cube.mean([COL_QUIET_IMPORTANCE, demographic_column], COL_LIKELIHOOD_INTERVENE),
+                        index=cube.get_index(COL_QUIET_IMPORTANCE), columns=cube.get_index(demographic_column))
+    return data[cube.series(COL_QUIET_IMPORTANCE) > 0]
+
+
+# Bootstrap intervals of likelihood_by_importance, as (lower, upper) tables of the same shape
+@timed
+def likelihood_intervals(cube, demographic_column, **bootstrap):
+    counts = cube.aggregate([COL_QUIET_IMPORTANCE, demographic_column, COL_LIKELIHOOD_INTERVENE])
+    bounds = bootstrap_mean_intervals(counts, LIKERT_LEVELS, **bootstrap)
+    answered = cube.series(COL_QUIET_IMPORTANCE) > 0
+    return [pd.DataFrame(bound, index=cube.get_index(COL_QUIET_IMPORTANCE),
+                         columns=cube.get_index(demographic_column))[answered] for bound in bounds]
+
+
+# Yapping factor
+
+@timed
+def yapping_histogram(scores, nbins=20):
+    return score_histogram(score_counts(scores), nbins)
+
+
+# Number of respondents per distinct score; counts of disjoint sets of respondents add up
+@timed
+def score_counts(scores):
+    scores = np.asarray(scores, dtype=float)
+    values, counts = np.unique(scores[~np.isnan(scores)], return_counts=True)
+    return pd.Series(counts, index=values)
+
+
+# The same counts from the frequency x duration cells of a cube, for backends that never see single respondents
+@timed
+def cube_score_counts(cube):
+    cells = cube.aggregate([COL_TALK_FREQUENCY, COL_TALK_DURATION])
+    answered = cells > 0
+    return pd.Series(cells[answered], index=score_table[:-1, :-1][answered]).groupby(level=0).sum()
+
+
+@timed
+def score_histogram(counts, nbins=20):
+    return histogram_bins(counts.index, nbins, counts.to_numpy())
+
+
+@timed
+def yapping_by_group(cube, column):
+    return pd.Series(cube.mean([column], YAPPING_FACTOR), index=cube.get_index(column), name=YAPPING_FACTOR)
+
+
+# Bootstrap intervals of yapping_by_group. A score is fixed by the frequency x duration cell, so every group's
+# scores are its respondents per answered cell.
+@timed
+def yapping_intervals(cube, column, **bootstrap):
+    counts = cube.aggregate([column, COL_TALK_FREQUENCY, COL_TALK_DURATION])
+    lower, upper = bootstrap_mean_intervals(counts.reshape(len(counts), -1), score_table[:-1, :-1].ravel(),
+                                            **bootstrap)
+    return pd.DataFrame({'Lower': lower, 'Upper': upper}, index=cube.get_index(column))
+
+
+# Long table of respondents per (group, answer) pair
+@timed
+def answers_by_group(cube, column, answer_column):
+    return cube.frame(column, answer_column).stack().reset_index(name='count')
+
+
+# Average, maximum and minimum score. Scores only take the values of the frequency x duration table,
+# so the extremes come from its answered cells.
+@timed
+def yapping_summary(cube):
+    answered_scores = score_table[:-1, :-1][cube.aggregate([COL_TALK_FREQUENCY, COL_TALK_DURATION]) > 0]
+    return cube.mean([], YAPPING_FACTOR), answered_scores.max(), answered_scores.min()
+
+
+# Group means under every weight/mapping variant, summarized against the default scoring.
+# Returns the summary table and the number of variants.
+@timed
+def yapping_sensitivity(cube, column, weight_range, map_names, copies, spread):
+    frequency_weights = np.arange(weight_range[0], weight_range[1] + 0.025, 0.05)
+    frequency_maps = perturb_maps([frequency_map_variants[m] for m in map_names], TALK_FREQUENCY, copies, spread, seed=0)
+    duration_maps = perturb_maps([duration_map_variants[m] for m in map_names], TALK_DURATION, copies, spread, seed=1)
+    tables = build_variant_grid(frequency_weights, frequency_maps, duration_maps)
+
+    # Group x frequency x duration counts from the cube are all the sweep needs
+    cells = cube.aggregate([column, COL_TALK_FREQUENCY, COL_TALK_DURATION])
+    groups = cube.get_index(column)
+    baseline = pd.Series(sweep_cells(cells, score_table[None, :-1, :-1])[0], index=groups)
+    means = pd.DataFrame(sweep_cells(cells, tables), columns=groups)
+    return summarize_sensitivity(means, baseline), len(tables)
+
+
+# Talking factors
+
+# Factors ticked in every answer pattern, one row per pattern
+FACTOR_PATTERN_BITS = (np.array(FACTOR_PATTERNS)[:, None] >> np.arange(len(TALKING_FACTORS))) & 1
+
+
+# Respondents per answer pattern, for everyone or only the given levels of a demographic column
+def factor_pattern_counts(cube, column=None, levels=None):
+    if column is None:
+        return cube.aggregate([COL_FACTOR_PATTERN])
+    counts = pd.DataFrame(cube.aggregate([column, COL_FACTOR_PATTERN]), index=cube.get_index(column))
+    return counts.loc[list(levels) if levels is not None else counts.index].sum().to_numpy()
+
+
+# Respondents ticking each factor, and their share of everyone who answered the question
+@timed
+def factor_prevalence(cube, column=None, levels=None):
+    counts = factor_pattern_counts(cube, column, levels)
+    ticked = FACTOR_PATTERN_BITS.T @ counts
+    answered = counts.sum()
+    return pd.DataFrame({'Count': ticked, 'Percentage': ticked / answered * 100 if answered else 0.0},
+                        index=pd.Index(TALKING_FACTORS, name='Factor'))
+
+
+# Respondents ticking both factors of every pair, as one product of the pattern bit matrix weighted by the
+# pattern counts; the diagonal holds each factor's own count. normalize='respondents' gives shares of everyone
+# who answered, normalize='row' the share of the row factor's respondents who also ticked the column factor.
+@timed
+def factor_cooccurrence(cube, column=None, levels=None, normalize=None):
+    counts = factor_pattern_counts(cube, column, levels)
+    matrix = FACTOR_PATTERN_BITS.T @ (counts[:, None] * FACTOR_PATTERN_BITS)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if normalize == 'respondents':
+            matrix = matrix / counts.sum() * 100
+        elif normalize == 'row':
+            matrix = matrix / np.diag(matrix)[:, None] * 100
+    return pd.DataFrame(np.nan_to_num(matrix), index=pd.Index(TALKING_FACTORS, name='Factor'),
+                        columns=pd.Index(TALKING_FACTORS, name='Co-occurring factor'))
+
+
+# Associations
+
+# Chi-square test of independence and Cramér's V for every pair of questions in ContingencyTables, all pairs
+# at once on the zero-padded stack of their tables. Each pair counts the respondents who answered both, and
+# answers nobody in the pair gave do not add degrees of freedom. Sorted by Cramér's V, strongest first.
+@timed
+def pairwise_association(tables):
+    from scipy.stats import chi2
+    from src.contingency import ASSOCIATION_COLUMNS, ASSOCIATION_LABELS, ASSOCIATION_PAIRS
+
+    observed = tables.pair_tables().astype(np.float64)
+    n = observed.sum(axis=(1, 2))
+    row_totals, column_totals = observed.sum(axis=2), observed.sum(axis=1)
+    n_rows, n_columns = (row_totals > 0).sum(axis=1), (column_totals > 0).sum(axis=1)
+    dof = (n_rows - 1) * (n_columns - 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        expected = row_totals[:, :, None] * column_totals[:, None, :] / n[:, None, None]
+        statistic = np.where(expected > 0, (observed - expected) ** 2 / expected, 0).sum(axis=(1, 2))
+        cramers_v = np.where(dof > 0, np.sqrt(statistic / (n * (np.minimum(n_rows, n_columns) - 1))), np.nan)
+    p_value = np.where(dof > 0, chi2.sf(statistic, np.maximum(dof, 1)), np.nan)
+    statistic = np.where(dof > 0, statistic, np.nan)
+    min_expected = np.where(expected > 0, expected, np.inf).min(axis=(1, 2))
+
+    labels = np.array([ASSOCIATION_LABELS[col] for col in ASSOCIATION_COLUMNS])
+    first, second = np.array(ASSOCIATION_PAIRS).T
+    pairs = pd.DataFrame({
+        'Question': labels[first],
+        'Other question': labels[second],
+        "Cramér's V": cramers_v,
+        'Chi-square': statistic,
+        'Degrees of freedom': dof,
+        'p-value': p_value,
+        'Respondents': n.astype(np.int64),
+        'Smallest expected count': np.where(np.isfinite(min_expected), min_expected, np.nan),
+    })
+    return pairs.sort_values("Cramér's V", ascending=False, na_position='last', kind='stable').reset_index(drop=True)
+
+
+# Square matrix of Cramér's V between all questions, with 1 on the diagonal. order='strength' puts the
+# questions with the strongest association to any other question first, otherwise they keep the survey order.
+@timed
+def association_matrix(pairs, order=None):
+    from src.contingency import ASSOCIATION_COLUMNS, ASSOCIATION_LABELS
+
+    labels = [ASSOCIATION_LABELS[col] for col in ASSOCIATION_COLUMNS]
+    positions = {label: i for i, label in enumerate(labels)}
+    first, second = pairs['Question'].map(positions).to_numpy(), pairs['Other question'].map(positions).to_numpy()
+    values = np.eye(len(labels))
+    values[first, second] = values[second, first] = pairs["Cramér's V"].to_numpy()
+    matrix = pd.DataFrame(values, index=pd.Index(labels, name='Question'),
+                          columns=pd.Index(labels, name='Other question'))
+    if order == 'strength':
+        ranked = matrix.where(~np.eye(len(labels), dtype=bool)).max().sort_values(ascending=False, kind='stable')
+        ranked = [positions[label] for label in ranked.index]
+        matrix = matrix.iloc[ranked, ranked]
+    return matrix
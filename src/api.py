@@ -0,0 +1,284 @@
+import json
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+from src.utils import INCREMENTAL, get_dataset_version
+from src import analytics
+from src.cube import CUBE_COLUMNS, load_cube
+from src.contingency import ASSOCIATION_LABELS, load_contingency
+from src.derived import load_yapping_histogram
+from src.filters import FILTERS, get_options
+from src.figure_cache import FigureCache
+from src.impact_analysis import IMPACT_TYPES, BREAKDOWN_FACTORS
+from src.quiet_importance import DEMOGRAPHIC_FACTORS
+from src.yapping_factor import BREAKDOWN_VARIABLES
+from src.timeline import PERIODS, load_timeline, resample_timeline, rolling_timeline
+from src.trends import ROLLING_WINDOWS
+from src.profiling import span
+
+# Read-only JSON API over the aggregates behind the dashboard pages, computed by the same cached loaders.
+# Every response carries the dataset version as its ETag, so clients poll with If-None-Match and get an empty
+# 304 until the data changes. Sidebar filters are query parameters named like the sidebar (?Gender=Female&Age=18-24,
+# repeated for several levels), and questions are named by their short labels (?impact=Impact on DJ).
+
+# Memory budget for encoded responses, shared by all workers
+RESPONSE_CACHE_BYTES = 16 * 10 ** 6
+
+# Sidebar label of every filter column
+FILTER_LABELS = {column: label for label, column in FILTERS.items()}
+
+# Short question label -> column, for the questions each parameter accepts
+QUESTION_COLUMNS = {label: col for col, label in ASSOCIATION_LABELS.items()}
+IMPACT_QUESTIONS = [ASSOCIATION_LABELS[col] for col in IMPACT_TYPES.values()]
+BREAKDOWN_QUESTIONS = [ASSOCIATION_LABELS[col] for col in BREAKDOWN_FACTORS.values()]
+DEMOGRAPHIC_QUESTIONS = [ASSOCIATION_LABELS[col] for col in DEMOGRAPHIC_FACTORS.values()]
+YAPPING_QUESTIONS = [ASSOCIATION_LABELS[col] for options in BREAKDOWN_VARIABLES.values() for col in options]
+DISTRIBUTION_QUESTIONS = [ASSOCIATION_LABELS[col] for col in CUBE_COLUMNS
+                          if col in ASSOCIATION_LABELS and not col.startswith('Role_')]
+
+
+# Missing values become null, datetimes ISO 8601 strings
+def to_records(frame):
+    return json.loads(frame.to_json(orient='records', date_format='iso'))
+
+
+def to_number(value):
+    return None if pd.isna(value) else float(value)
+
+
+def participants(filter_key):
+    return {'Participants': int(analytics.total_participants(load_cube(filter_key)))}
+
+
+def distribution(filter_key, question):
+    counts = load_cube(filter_key).series(QUESTION_COLUMNS[question])
+    return to_records(pd.DataFrame({'Answer': counts.index.astype(object), 'Count': counts.to_numpy()}))
+
+
+def roles(filter_key):
+    counts = analytics.role_distribution(load_cube(filter_key))
+    return to_records(pd.DataFrame({'Role': [col.removeprefix('Role_') for col in counts.index],
+                                    'Count': counts.to_numpy()}))
+
+
+def impact_by_role(filter_key, impact):
+    percentages, counts = analytics.impact_by_role(load_cube(filter_key), QUESTION_COLUMNS[impact])
+    table = pd.DataFrame({'Percentage': percentages.stack(), 'Count': counts.stack()})
+    return to_records(table.rename_axis(['Answer', 'Role']).reset_index())
+
+
+def impact_breakdown(filter_key, impact, by):
+    data = analytics.impact_breakdown(load_cube(filter_key), QUESTION_COLUMNS[by], QUESTION_COLUMNS[impact])
+    return to_records(data.rename(columns={QUESTION_COLUMNS[by]: 'Group'}))
+
+
+def quiet(filter_key):
+    cube = load_cube(filter_key)
+    counts, percentages = analytics.quiet_heatmap(cube)
+    importance, likelihood = analytics.quiet_averages(cube)
+    cells = pd.DataFrame({'Count': counts.stack(), 'Percentage': percentages.stack()})
+    return {'Average importance': to_number(importance), 'Average likelihood': to_number(likelihood),
+            'cells': to_records(cells.rename_axis(['Likelihood', 'Importance']).reset_index())}
+
+
+def quiet_likelihood(filter_key, by):
+    cube = load_cube(filter_key)
+    column = QUESTION_COLUMNS[by]
+    means = analytics.likelihood_by_importance(cube, column)
+    lower, upper = analytics.likelihood_intervals(cube, column)
+    table = pd.DataFrame({'Mean likelihood': means.stack(future_stack=True),
+                          'Lower': lower.stack(future_stack=True), 'Upper': upper.stack(future_stack=True)})
+    return to_records(table.rename_axis(['Importance', 'Group']).reset_index())
+
+
+def yapping_groups(filter_key, by):
+    cube = load_cube(filter_key)
+    column = QUESTION_COLUMNS[by]
+    table = analytics.yapping_intervals(cube, column)
+    table.insert(0, 'Mean', analytics.yapping_by_group(cube, column))
+    return to_records(table.rename_axis('Group').reset_index().astype({'Group': object}))
+
+
+def yapping_summary(filter_key):
+    average, maximum, minimum = analytics.yapping_summary(load_cube(filter_key))
+    return {'Average': to_number(average), 'Maximum': to_number(maximum), 'Minimum': to_number(minimum)}
+
+
+def yapping_histogram(filter_key):
+    bins = load_yapping_histogram(filter_key)
+    return {'size': bins['size'], 'centers': bins['centers'].tolist(), 'counts': bins['counts'].tolist()}
+
+
+def talking_factors(filter_key):
+    return to_records(analytics.factor_prevalence(load_cube(filter_key)).reset_index())
+
+
+def associations(filter_key):
+    pairs = analytics.pairwise_association(load_contingency(filter_key))
+    return to_records(pairs.replace({col: ASSOCIATION_LABELS for col in ['Question', 'Other question']}))
+
+
+def trends(filter_key, period):
+    # Events are found among all responses, as on the page
+    return to_records(resample_timeline(load_timeline(filter_key), period, load_timeline(())))
+
+
+def rolling_trends(filter_key, window):
+    return to_records(rolling_timeline(load_timeline(filter_key), ROLLING_WINDOWS[window]))
+
+
+# Path -> (parameter -> accepted values, aggregate served). Every aggregate takes the filter key first.
+ENDPOINTS = {
+    '/participants': ({}, participants),
+    '/distribution': ({'question': DISTRIBUTION_QUESTIONS}, distribution),
+    '/roles': ({}, roles),
+    '/impact/roles': ({'impact': IMPACT_QUESTIONS}, impact_by_role),
+    '/impact/breakdown': ({'impact': IMPACT_QUESTIONS, 'by': BREAKDOWN_QUESTIONS}, impact_breakdown),
+    '/quiet': ({}, quiet),
+    '/quiet/likelihood': ({'by': DEMOGRAPHIC_QUESTIONS}, quiet_likelihood),
+    '/yapping/groups': ({'by': YAPPING_QUESTIONS}, yapping_groups),
+    '/yapping/summary': ({}, yapping_summary),
+    '/yapping/histogram': ({}, yapping_histogram),
+    '/talking-factors': ({}, talking_factors),
+    '/associations': ({}, associations),
+    '/trends': ({'period': PERIODS}, trends),
+    '/trends/rolling': ({'window': list(ROLLING_WINDOWS)}, rolling_trends),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+# Endpoint parameters and filter key of a query string, validated against the accepted values
+def parse_query(parameters, query):
+    values = parse_qs(query, keep_blank_values=True)
+    unknown = set(values) - set(parameters) - set(FILTERS)
+    if unknown:
+        raise BadRequest(f"Unknown parameters: {', '.join(sorted(unknown))}")
+
+    arguments = {}
+    for name, accepted in parameters.items():
+        if len(values.get(name, [])) != 1:
+            raise BadRequest(f"Expected one '{name}', one of: {', '.join(accepted)}")
+        if values[name][0] not in accepted:
+            raise BadRequest(f"Unknown {name} '{values[name][0]}', expected one of: {', '.join(accepted)}")
+        arguments[name] = values[name][0]
+
+    # Levels in the sidebar's order, so the same selection always shares one cache entry
+    selections = []
+    for label, column in FILTERS.items():
+        levels = values.get(label)
+        if levels:
+            options = get_options(column)
+            unknown = [level for level in levels if level not in options]
+            if unknown:
+                raise BadRequest(f"Unknown {label} '{unknown[0]}', expected one of: {', '.join(options)}")
+            selections.append((column, tuple(level for level in options if level in levels)))
+    return arguments, tuple(selections)
+
+
+def get_etag(version):
+    return f'"{version}"'
+
+
+def etag_matches(header, etag):
+    if header is None:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return '*' in tags or etag in tags
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'DancefloorAPI'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/') or '/'
+        if path == '/':
+            return self.send_json(HTTPStatus.OK, {'endpoints': {name: parameters for name, (parameters, _)
+                                                                in ENDPOINTS.items()},
+                                                  'filters': {label: get_options(column)
+                                                              for label, column in FILTERS.items()}})
+        if path not in ENDPOINTS:
+            return self.send_json(HTTPStatus.NOT_FOUND, {'error': f"No endpoint {path}"})
+        parameters, aggregate = ENDPOINTS[path]
+        try:
+            arguments, filter_key = parse_query(parameters, url.query)
+        except BadRequest as error:
+            return self.send_json(HTTPStatus.BAD_REQUEST, {'error': str(error)})
+
+        with span(f'api:{path}'):
+            # Pick up responses appended to the export, and pin that state for the whole request
+            if INCREMENTAL:
+                from src.ingest import refresh_dataset
+                refresh_dataset()
+            version = get_dataset_version()
+            etag = get_etag(version)
+            if etag_matches(self.headers.get('If-None-Match'), etag):
+                return self.send_json(HTTPStatus.NOT_MODIFIED, None, etag)
+
+            cache = self.server.responses
+            key = (path, version, filter_key, tuple(sorted(arguments.items())))
+            body = cache.get(key)
+            if body is None:
+                try:
+                    data = aggregate(filter_key, **arguments)
+                except Exception:
+                    traceback.print_exc()
+                    return self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"Could not compute {path}"})
+                body = json.dumps({'version': version,
+                                   'filters': {FILTER_LABELS[column]: list(levels) for column, levels in filter_key},
+                                   'data': data}, allow_nan=False).encode()
+                cache.put(key, body)
+        self.send_body(HTTPStatus.OK, body, etag)
+
+    def send_json(self, status, payload, etag=None):
+        self.send_body(status, b'' if payload is None else json.dumps(payload).encode(), etag)
+
+    def send_body(self, status, body, etag=None):
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+            # Cacheable, but always revalidated against the current dataset version
+            self.send_header('Cache-Control', 'no-cache')
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class APIServer(HTTPServer):
+    # Connections are handed to a fixed pool of worker threads, so a burst of requests queues instead of
+    # starting a thread per request. Every worker reads the same process-wide caches.
+
+    def __init__(self, address, workers=4, verbose=False):
+        super().__init__(address, APIRequestHandler)
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix='api')
+        self.responses = FigureCache(RESPONSE_CACHE_BYTES)
+        self.verbose = verbose
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,50 @@
+import streamlit as st
+from src import analytics
+from src.contingency import load_contingency
+from src.figure_cache import plot_figure
+
+# Orders the matrix can be shown in, with the ordering behind each
+ASSOCIATION_ORDERS = {
+    "Survey order": None,
+    "Strongest association first": 'strength'
+}
+
+# Significance level of the "only significant pairs" filter
+SIGNIFICANCE_LEVEL = 0.05
+
+def app():
+    from src import figures
+
+    st.header("Which Answers Move Together")
+    tables = load_contingency()
+    pairs = analytics.pairwise_association(tables)
+
+    st.subheader("Association matrix")
+    order = st.radio("Order questions by:", list(ASSOCIATION_ORDERS), horizontal=True)
+    plot_figure('associations', 'matrix', [order],
+                lambda: figures.association_heatmap(analytics.association_matrix(pairs, ASSOCIATION_ORDERS[order]),
+                                                    order))
+
+    st.subheader("All question pairs")
+    if st.checkbox(f"Only significant pairs (p < {SIGNIFICANCE_LEVEL})"):
+        pairs = pairs[pairs['p-value'] < SIGNIFICANCE_LEVEL]
+    st.write(f"{len(pairs)} pairs. Click a column header to sort.")
+    st.dataframe(pairs, hide_index=True, use_container_width=True,
+                 column_config={"Cramér's V": st.column_config.ProgressColumn(min_value=0, max_value=1, format="%.3f"),
+                                'Chi-square': st.column_config.NumberColumn(format="%.2f"),
+                                'p-value': st.column_config.NumberColumn(format="%.2e"),
+                                'Smallest expected count': st.column_config.NumberColumn(format="%.1f")})
+
+    # Add an explanation for people without analytical background
+    st.markdown("""
+    ### What am I seeing?
+
+    Every pair of questions is compared: the demographics, talking behaviour, perception and impact answers, the two 1-5 scales, and every role as a yes/no question.
+
+    1. **Cramér's V**: How strongly the answers to two questions go together, from 0 (knowing one answer tells you nothing about the other) to 1 (one answer fully determines the other). It shows association, not cause or direction.
+    2. **Chi-square and p-value**: A test of whether the pattern could be chance. A small p-value (below 0.05) means it is unlikely to be chance alone.
+    3. **Respondents**: Every pair counts the participants who answered both questions.
+    4. **Smallest expected count**: When it is below 5, some answer combinations are too rare for the p-value to be reliable; read such pairs with care.
+
+    With this many pairs a few will look significant by chance. The sidebar filters apply as well.
+    """)
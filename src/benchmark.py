@@ -0,0 +1,222 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from src.utils import COL_TALK_FREQUENCY, COL_TALK_DURATION, TEXT_COLUMNS, read_csv, read_dataset
+from src.scoring import score_yapping_factor, frequency_map_variants
+from src.cube import build_cube, CUBE_COLUMNS
+from src.contingency import build_contingency, ASSOCIATION_COLUMNS
+from src.streaming import stream_aggregates
+from src import analytics
+from src.synthetic import write_survey
+from src.report import CHARTS, enumerate_tasks
+from src.impact_analysis import IMPACT_TYPES, BREAKDOWN_FACTORS
+from src.quiet_importance import DEMOGRAPHIC_FACTORS
+from src.yapping_factor import BREAKDOWN_VARIABLES, SENSITIVITY_WEIGHT_RANGE, SENSITIVITY_COPIES, \
+    SENSITIVITY_SPREAD
+from src.talking_factors import SLICE_FACTORS, COOCCURRENCE_MEASURES
+from src.associations import ASSOCIATION_ORDERS
+from src.text_index import TEXT_INDEX_COLUMNS, build_text_index, term_ranking
+from src.timeline import TIMELINE_COLUMNS, PERIODS, build_timeline, resample_timeline, rolling_timeline
+from src.trends import ROLLING_WINDOWS
+
+# Scaling benchmark on synthetic surveys: wall time, throughput and peak traced memory of every stage behind
+# the dashboard, per dataset size, written as a JSON baseline that later runs are compared against.
+
+SIZES = [10**3, 10**4, 10**5, 10**6]
+# 10^7 rows needs minutes per stage and more memory than most machines have, so it only runs on request
+# (--large, or pytest --large)
+LARGE_SIZES = [10**7]
+# Synthetic surveys are kept between runs in the system temp directory, not in the repository's data/.cache (their
+# Parquet snapshots follow DANCEFLOOR_CACHE_DIR)
+WORK_DIR = os.path.join(tempfile.gettempdir(), 'dancefloor-benchmark')
+
+YAPPING_COLUMNS = [column for options in BREAKDOWN_VARIABLES.values() for column in options]
+
+# Keyword and phrase searches run against the text index
+SEARCH_QUERIES = ['talking', 'dj music', '"the end of the night"']
+
+# Every statistic a page computes, under every option its widgets offer
+PAGE_AGGREGATIONS = {
+    "Demographics": lambda ctx: [
+        analytics.total_participants(ctx['cube']), analytics.age_distribution(ctx['cube']),
+        analytics.gender_distribution(ctx['cube']), analytics.attendance_distribution(ctx['cube']),
+        analytics.experience_distribution(ctx['cube']), analytics.role_distribution(ctx['cube'])],
+    "Talking Behavior": lambda ctx: [
+        analytics.talk_frequency_distribution(ctx['cube']), analytics.talk_duration_distribution(ctx['cube']),
+        analytics.talk_perception_distribution(ctx['cube'])],
+    "Impact Analysis": lambda ctx: [analytics.impact_distribution(ctx['cube'], col) for col in IMPACT_TYPES.values()]
+    + [analytics.impact_by_role(ctx['cube'], col) for col in IMPACT_TYPES.values()]
+    + [analytics.impact_breakdown(ctx['cube'], factor, col)
+       for factor in BREAKDOWN_FACTORS.values() for col in IMPACT_TYPES.values()],
+    "Quiet Importance": lambda ctx: [analytics.quiet_heatmap(ctx['cube']), analytics.quiet_averages(ctx['cube'])]
+    + [analytics.likelihood_by_importance(ctx['cube'], col) for col in DEMOGRAPHIC_FACTORS.values()]
+    + [analytics.likelihood_intervals(ctx['cube'], col) for col in DEMOGRAPHIC_FACTORS.values()],
+    "Yapping Factor": lambda ctx: [analytics.yapping_histogram(ctx['scores']), analytics.yapping_summary(ctx['cube'])]
+    + [analytics.yapping_by_group(ctx['cube'], col) for col in YAPPING_COLUMNS]
+    + [analytics.yapping_intervals(ctx['cube'], col) for col in YAPPING_COLUMNS]
+    + [analytics.yapping_sensitivity(ctx['cube'], col, SENSITIVITY_WEIGHT_RANGE, list(frequency_map_variants),
+                                     SENSITIVITY_COPIES, SENSITIVITY_SPREAD) for col in YAPPING_COLUMNS],
+    "Talking Factors": lambda ctx: [analytics.factor_prevalence(ctx['cube'], col) for col in SLICE_FACTORS.values()]
+    + [analytics.factor_cooccurrence(ctx['cube'], col, normalize=normalize)
+       for col in SLICE_FACTORS.values() for normalize in COOCCURRENCE_MEASURES.values()],
+    "Associations": lambda ctx: [analytics.association_matrix(analytics.pairwise_association(ctx['contingency']), order)
+                                 for order in ASSOCIATION_ORDERS.values()],
+    "Open Answers": lambda ctx: [ctx['text_index'].search(query) for query in SEARCH_QUERIES]
+    + [term_ranking(ctx['text_index'], ctx['text_index'].answer_mask([col])) for col in TEXT_COLUMNS],
+    "Trends Over Time": lambda ctx: [resample_timeline(ctx['timeline'], period) for period in PERIODS]
+    + [rolling_timeline(ctx['timeline'], hours) for hours in ROLLING_WINDOWS.values()],
+}
+
+
+def get_survey(n_rows, seed=0, work_dir=WORK_DIR):
+    # Generated once per size and seed, then reused by later runs
+    path = os.path.join(work_dir, f'survey_{n_rows}_{seed}.csv')
+    if not os.path.exists(path):
+        write_survey(path, n_rows, seed)
+    return path
+
+
+def build_stages(path):
+    # (name, function) pairs run in order; each function receives the results of the stages before it
+    stages = [
+        ('load_csv', lambda ctx: read_csv(path)),
+        ('load_snapshot', lambda ctx: read_dataset(path)),
+        ('scores', lambda ctx: score_yapping_factor(ctx['load_snapshot'][COL_TALK_FREQUENCY],
+                                                   ctx['load_snapshot'][COL_TALK_DURATION])),
+        ('cube', lambda ctx: build_cube(ctx['load_snapshot'][CUBE_COLUMNS])),
+        ('contingency', lambda ctx: build_contingency(ctx['load_snapshot'][ASSOCIATION_COLUMNS])),
+        ('text_index', lambda ctx: build_text_index(ctx['load_snapshot'][TEXT_INDEX_COLUMNS])),
+        ('timeline', lambda ctx: build_timeline(ctx['load_snapshot'][TIMELINE_COLUMNS])),
+        # Out-of-core alternative to load_csv + scores + cube; its peak memory should not grow with the size
+        ('stream', lambda ctx: stream_aggregates(path)),
+    ]
+    stages += [(f'aggregate:{page}', aggregate) for page, aggregate in PAGE_AGGREGATIONS.items()]
+
+    # Figure construction includes the aggregations each chart runs
+    page_tasks = defaultdict(list)
+    for page, _, chart, selections in enumerate_tasks():
+        page_tasks[page].append((chart, selections))
+    stages += [(f'figures:{page}', lambda ctx, tasks=tasks: [CHARTS[chart](ctx, *selections)
+                                                             for chart, selections in tasks])
+               for page, tasks in page_tasks.items()]
+    return stages
+
+
+def run_stage(function, ctx, repeat):
+    # Best-of-n wall time, then one more run under tracemalloc for the peak memory it allocates. As in timeit,
+    # the garbage collector is off while timing, so the time does not depend on what else the process holds.
+    seconds = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function(ctx)
+            seconds.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    function(ctx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, min(seconds), peak
+
+
+def benchmark_size(n_rows, seed=0, repeat=3, work_dir=WORK_DIR):
+    path = get_survey(n_rows, seed, work_dir)
+    # Write the Parquet snapshot up front so load_snapshot always measures a warm read
+    read_dataset(path, [])
+
+    ctx = {}
+    results = {}
+    for name, function in build_stages(path):
+        result, seconds, peak = run_stage(function, ctx, repeat)
+        ctx[name] = result
+        results[name] = {'seconds': seconds, 'rows_per_second': n_rows / seconds if seconds else None,
+                         'peak_bytes': peak}
+    return results
+
+
+def build_baseline(sizes=SIZES, seed=0, repeat=3, work_dir=WORK_DIR):
+    return {
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__},
+        'seed': seed,
+        'repeat': repeat,
+        'sizes': {str(n_rows): benchmark_size(n_rows, seed, repeat, work_dir) for n_rows in sizes},
+    }
+
+
+# Stages slower or hungrier than the baseline by more than the tolerance, as (size, stage, metric, old, new).
+# A stage the baseline has no entry for is reported with metric 'missing', so new stages and sizes cannot
+# pass unchecked; regenerate the baseline with --output when they are added.
+def find_regressions(baseline, current, tolerance=0.5, min_seconds=0.005):
+    regressions = []
+    for size, stages in current['sizes'].items():
+        for stage, result in stages.items():
+            old = baseline['sizes'].get(size, {}).get(stage)
+            if old is None:
+                regressions.append((size, stage, 'missing', None, result['seconds']))
+                continue
+            # Sub-millisecond stages are all noise
+            if result['seconds'] > max(old['seconds'] * (1 + tolerance), min_seconds):
+                regressions.append((size, stage, 'seconds', old['seconds'], result['seconds']))
+            if result['peak_bytes'] > old['peak_bytes'] * (1 + tolerance):
+                regressions.append((size, stage, 'peak_bytes', old['peak_bytes'], result['peak_bytes']))
+    return regressions
+
+
+def print_results(results):
+    for size, stages in results['sizes'].items():
+        print(f"{int(size):,} rows")
+        for stage, result in stages.items():
+            throughput = f"{result['rows_per_second']:14,.0f} rows/s" if result['rows_per_second'] else ''
+            print(f"    {stage:<30}{result['seconds'] * 1000:10.1f} ms{throughput}"
+                  f"{result['peak_bytes'] / 1e6:10.1f} MB peak")
+
+
+def print_regressions(regressions):
+    for size, stage, metric, old, new in regressions:
+        if metric == 'missing':
+            print(f"REGRESSION {int(size):,} rows {stage}: not in the baseline")
+        else:
+            print(f"REGRESSION {int(size):,} rows {stage} {metric}: {old:.4g} -> {new:.4g}")
+
+
+# Usage: python -m src.benchmark [--sizes 1000 10000 ...] [--large] [--output baseline.json] [--compare baseline.json]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time every dashboard stage on synthetic surveys of growing size.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="survey sizes in rows")
+    parser.add_argument('--large', action='store_true', help=f"also run {', '.join(map(str, LARGE_SIZES))} rows")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the synthetic surveys")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage (the best one is kept)")
+    parser.add_argument('--work-dir', default=WORK_DIR, help="where the synthetic surveys are kept")
+    parser.add_argument('--output', help="write the results as a JSON baseline")
+    parser.add_argument('--compare', help="baseline JSON to check the results against; exits 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="allowed relative slowdown or memory growth")
+    args = parser.parse_args()
+
+    sizes = args.sizes + [n_rows for n_rows in LARGE_SIZES if args.large and n_rows not in args.sizes]
+    results = build_baseline(sizes, args.seed, args.repeat, args.work_dir)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = find_regressions(json.load(f), results, args.tolerance)
+        print_regressions(regressions)
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,143 @@
+import numpy as np
+import streamlit as st
+from src.utils import BACKEND, INCREMENTAL, STREAMING, load_data, COL_AGE, COL_GENDER, COL_ATTENDANCE, \
+    COL_EXPERIENCE, COL_TALK_FREQUENCY, COL_TALK_DURATION, COL_TALK_PERCEPTION, COL_COVID_CHANGE, \
+    COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ, COL_IMPACT_ATMOSPHERE, COL_QUIET_IMPORTANCE, COL_LIKELIHOOD_INTERVENE, \
+    CATEGORICAL_COLUMNS, LIKERT_COLUMNS, LIKERT_LEVELS, ROLE_COLUMNS, ROLE_LEVELS, ROLES, get_order
+from src.aggregations import get_codes
+from src.filters import get_filter_key, get_filter_mask, select_rows
+from src.ingest import IncrementalCache
+from src.profiling import span
+
+# Questions compared pairwise on the Associations page: every categorical column, the Likert scales and the
+# Role_* flags (each flag a yes/no question)
+ASSOCIATION_COLUMNS = CATEGORICAL_COLUMNS + LIKERT_COLUMNS + ROLE_COLUMNS
+
+# Short names of the questions for axis labels and tables
+ASSOCIATION_LABELS = {
+    COL_AGE: "Age",
+    COL_GENDER: "Gender",
+    COL_ATTENDANCE: "Attendance",
+    COL_EXPERIENCE: "Experience",
+    COL_TALK_FREQUENCY: "Talk frequency",
+    COL_TALK_DURATION: "Talk duration",
+    COL_TALK_PERCEPTION: "Talk perception",
+    COL_COVID_CHANGE: "Change since COVID",
+    COL_IMPACT_EXPERIENCE: "Impact on own experience",
+    COL_IMPACT_DJ: "Impact on DJ",
+    COL_IMPACT_ATMOSPHERE: "Impact on atmosphere",
+    COL_QUIET_IMPORTANCE: "Quiet importance",
+    COL_LIKELIHOOD_INTERVENE: "Likelihood to intervene",
+}
+ASSOCIATION_LABELS.update({col: f"Role: {role}" for role, col in zip(ROLES, ROLE_COLUMNS)})
+
+
+def get_association_levels(col):
+    if col in ROLE_COLUMNS:
+        return ROLE_LEVELS
+    return LIKERT_LEVELS if col in LIKERT_COLUMNS else get_order(col)
+
+
+# Column i owns slots SLOT_OFFSETS[i] .. SLOT_OFFSETS[i] + len(levels) of the pair counts, the first of them
+# for missing answers
+SLOT_COUNTS = np.array([len(get_association_levels(col)) + 1 for col in ASSOCIATION_COLUMNS])
+SLOT_OFFSETS = np.concatenate([[0], np.cumsum(SLOT_COUNTS)[:-1]])
+N_SLOTS = int(SLOT_COUNTS.sum())
+
+# Every pair of columns (first < second), and for each the slots of its answered levels padded to the longest
+# level list, so all tables are gathered as one stack
+ASSOCIATION_PAIRS = [(i, j) for i in range(len(ASSOCIATION_COLUMNS)) for j in range(i + 1, len(ASSOCIATION_COLUMNS))]
+MAX_LEVELS = int(SLOT_COUNTS.max()) - 1
+LEVEL_SLOTS = np.array([[offset + 1 + min(k, n_slots - 2) for k in range(MAX_LEVELS)]
+                        for offset, n_slots in zip(SLOT_OFFSETS, SLOT_COUNTS)])
+LEVEL_MASK = np.arange(MAX_LEVELS)[None, :] < (SLOT_COUNTS - 1)[:, None]
+
+# Rows one-hot encoded per matrix product, few enough for the block to stay in cache (and for float32 sums
+# to stay exact)
+PAIR_CHUNK_ROWS = 1 << 12
+
+
+class ContingencyTables:
+    # Respondents per pair of answer slots over all ASSOCIATION_COLUMNS (a Burt matrix), from which the
+    # contingency table of any two questions is a block. Tables of disjoint sets of rows add up.
+
+    def __init__(self, counts):
+        self.counts = counts
+
+    @property
+    def n_rows(self):
+        # Every row takes exactly one slot of the first column
+        first = slice(SLOT_OFFSETS[0], SLOT_OFFSETS[0] + SLOT_COUNTS[0])
+        return int(self.counts[first, first].sum())
+
+    def table(self, row_col, column_col):
+        # Respondents per answered (row level, column level) pair
+        i, j = ASSOCIATION_COLUMNS.index(row_col), ASSOCIATION_COLUMNS.index(column_col)
+        return self.counts[SLOT_OFFSETS[i] + 1:SLOT_OFFSETS[i] + SLOT_COUNTS[i],
+                           SLOT_OFFSETS[j] + 1:SLOT_OFFSETS[j] + SLOT_COUNTS[j]]
+
+    def pair_tables(self):
+        # Tables of all ASSOCIATION_PAIRS as one (pairs, levels, levels) stack, zero-padded
+        first, second = np.array(ASSOCIATION_PAIRS).T
+        tables = self.counts[LEVEL_SLOTS[first][:, :, None], LEVEL_SLOTS[second][:, None, :]]
+        return np.where(LEVEL_MASK[first][:, :, None] & LEVEL_MASK[second][:, None, :], tables, 0)
+
+    def merge(self, other):
+        counts = self.counts + other.counts
+        counts.flags.writeable = False
+        return ContingencyTables(counts)
+
+
+# Answer slot of every row in every ASSOCIATION_COLUMNS column (level index + 1, 0 when missing)
+def get_slots(df):
+    slots = np.empty((len(df), len(ASSOCIATION_COLUMNS)), dtype=np.int8)
+    for i, col in enumerate(ASSOCIATION_COLUMNS):
+        slots[:, i] = get_codes(df[col], get_association_levels(col)) + 1
+    return slots
+
+
+def count_answer_pairs(slots, weights=None):
+    # All pairs at once: the one-hot encoding X of a block of rows gives the counts of every slot pair as X.T @ X,
+    # or X.T @ (w X) when row r stands for weights[r] respondents (float64 keeps those sums exact)
+    counts = np.zeros((N_SLOTS, N_SLOTS), dtype=np.int64)
+    for start in range(0, len(slots), PAIR_CHUNK_ROWS):
+        block = slots[start:start + PAIR_CHUNK_ROWS].astype(np.int64) + SLOT_OFFSETS
+        onehot = np.zeros((len(block), N_SLOTS), dtype=np.float32 if weights is None else np.float64)
+        np.put_along_axis(onehot, block, 1, axis=1)
+        weighted = onehot if weights is None else onehot * weights[start:start + PAIR_CHUNK_ROWS, None]
+        counts += (onehot.T @ weighted).round().astype(np.int64)
+    counts.flags.writeable = False
+    return ContingencyTables(counts)
+
+
+def build_contingency(df):
+    return count_answer_pairs(get_slots(df))
+
+
+# One set of tables per filter selection, shared read-only by all sessions
+@st.cache_resource(max_entries=16)
+def build_filtered_contingency(filter_key):
+    df = load_data(ASSOCIATION_COLUMNS)
+    mask = get_filter_mask(filter_key)
+    return build_contingency(df if mask is None else df[mask])
+
+
+# Tables of the live dataset per filter selection, merged with the tables of the rows appended since
+live_contingency = IncrementalCache(lambda filter_key, rows: build_contingency(rows[select_rows(rows, filter_key)]
+                                                                               if filter_key else rows),
+                                    ContingencyTables.merge)
+
+
+# Tables for the current sidebar filters, or for the selection in filter_key
+def load_contingency(filter_key=None):
+    filter_key = get_filter_key() if filter_key is None else filter_key
+    with span('load_contingency'):
+        if BACKEND != 'csv':
+            from src.database import get_database_contingency
+            return get_database_contingency(filter_key)
+        if STREAMING:
+            from src.streaming import get_streamed_aggregates
+            return get_streamed_aggregates(filter_key).contingency
+        if INCREMENTAL:
+            return live_contingency.get(filter_key)
+        return build_filtered_contingency(filter_key)
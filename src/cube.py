@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from src.utils import BACKEND, INCREMENTAL, STREAMING, load_data, COL_AGE, COL_GENDER, COL_ATTENDANCE, \
+    COL_EXPERIENCE, COL_TALK_FREQUENCY, COL_TALK_DURATION, COL_TALK_PERCEPTION, COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ, \
+    COL_IMPACT_ATMOSPHERE, COLUMN_ORDERS, LIKERT_COLUMNS, LIKERT_LEVELS, ROLE_COLUMNS, COL_FACTOR_PATTERN, \
+    FACTOR_PATTERNS, MISSING_INTEGER
+from src.aggregations import get_codes
+from src.scoring import score_yapping_factor, YAPPING_FACTOR
+from src.filters import get_filter_key, get_filter_mask, select_rows
+from src.ingest import IncrementalCache
+from src.profiling import span
+
+# Cube dimensions
+DEMOGRAPHIC_DIMS = [COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE]
+BEHAVIOUR_DIMS = [COL_TALK_FREQUENCY, COL_TALK_DURATION, COL_TALK_PERCEPTION]
+IMPACT_DIMS = [COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ, COL_IMPACT_ATMOSPHERE]
+
+# Group-by sets materialized when the cube is built. Every chart is answered by summing out the other
+# dimensions of the smallest cuboid that covers it, so no query touches individual responses.
+CUBOIDS = [
+    DEMOGRAPHIC_DIMS + BEHAVIOUR_DIMS,
+    IMPACT_DIMS + BEHAVIOUR_DIMS,
+    IMPACT_DIMS + DEMOGRAPHIC_DIMS,
+    LIKERT_COLUMNS + DEMOGRAPHIC_DIMS,
+    [COL_FACTOR_PATTERN] + DEMOGRAPHIC_DIMS,
+]
+
+# Columns the cube is built from
+CUBE_COLUMNS = list(dict.fromkeys(DEMOGRAPHIC_DIMS + BEHAVIOUR_DIMS + IMPACT_DIMS + LIKERT_COLUMNS + ROLE_COLUMNS
+                                  + [COL_FACTOR_PATTERN]))
+
+
+def get_levels(dim):
+    if dim == COL_FACTOR_PATTERN:
+        return FACTOR_PATTERNS
+    return COLUMN_ORDERS[dim] if dim in COLUMN_ORDERS else LIKERT_LEVELS
+
+
+class AggregateCube:
+    # Dense count and sum arrays per cuboid. Axis position 0 of every dimension holds missing/unknown answers,
+    # positions 1.. follow the level order from utils.
+
+    def __init__(self, cuboids):
+        self.cuboids = cuboids
+
+    def find_cuboid(self, dims):
+        candidates = [cuboid for cuboid in self.cuboids if set(dims) <= set(cuboid)]
+        if not candidates:
+            raise ValueError(f'No cuboid covers {dims}')
+        return min(candidates, key=lambda cuboid: self.cuboids[cuboid]['count'].size)
+
+    def aggregate(self, dims, measure='count', dropna=True):
+        # Marginalize onto dims (in the given order); dropna drops the missing-answer slot like groupby does
+        dims = list(dims)
+        cuboid = self.find_cuboid(dims)
+        array = self.cuboids[cuboid][measure]
+        array = array.sum(axis=tuple(i for i, dim in enumerate(cuboid) if dim not in dims))
+
+        remaining = [dim for dim in cuboid if dim in dims]
+        array = np.transpose(array, [remaining.index(dim) for dim in dims])
+        if dropna:
+            array = array[(slice(1, None),) * len(dims)]
+        return array
+
+    def total(self, measure='count'):
+        return self.aggregate([], measure)[()]
+
+    def mean(self, dims, measure):
+        counts = self.aggregate(dims, f'count:{measure}')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (self.aggregate(dims, f'sum:{measure}') / np.where(counts > 0, counts, np.nan))[()]
+
+    def get_index(self, dim):
+        levels = get_levels(dim)
+        if dim in COLUMN_ORDERS:
+            return pd.CategoricalIndex(levels, categories=levels, ordered=True, name=dim)
+        return pd.Index(levels, name=dim)
+
+    def series(self, dim, measure='count'):
+        return pd.Series(self.aggregate([dim], measure), index=self.get_index(dim))
+
+    def frame(self, row_dim, column_dim, measure='count'):
+        return pd.DataFrame(self.aggregate([row_dim, column_dim], measure),
+                            index=self.get_index(row_dim), columns=self.get_index(column_dim))
+
+    def value_counts(self, dim):
+        # Same order as Series.value_counts() on the categorical column
+        return self.series(dim).sort_values(ascending=False)
+
+    def merge(self, other):
+        # Counts and sums over disjoint sets of rows add up cell by cell
+        arrays = {}
+        for cuboid, cells in self.cuboids.items():
+            arrays[cuboid] = {}
+            for name, array in cells.items():
+                merged = array + other.cuboids[cuboid][name]
+                merged.flags.writeable = False
+                arrays[cuboid][name] = merged
+        return AggregateCube(arrays)
+
+    def multilabel_crosstab(self, dim, label_columns, labels=None):
+        # Crosstab of one dimension against a multi-hot label matrix (e.g. the Role_* flags): percentages and
+        # counts of the rows with each label, answered from the label sums stored in every cell
+        labels = list(labels) if labels is not None else list(label_columns)
+        counts = np.stack([self.aggregate([dim], f'sum:{col}') for col in label_columns], axis=1)
+        totals = np.array([self.total(f'sum:{col}') for col in label_columns])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            percentages = np.where(totals > 0, counts / totals * 100, 0)
+        return (pd.DataFrame(percentages, columns=labels, index=get_levels(dim)),
+                pd.DataFrame(counts, columns=labels, index=get_levels(dim)))
+
+
+def build_cube(df, cuboids=CUBOIDS):
+    measures = {col: df[col].to_numpy() for col in ROLE_COLUMNS + LIKERT_COLUMNS}
+    measures[YAPPING_FACTOR] = score_yapping_factor(df[COL_TALK_FREQUENCY], df[COL_TALK_DURATION])
+
+    # Shift codes by one so missing answers (-1) land in slot 0
+    dims = list(dict.fromkeys(dim for cuboid in cuboids for dim in cuboid))
+    codes = {dim: get_codes(df[dim], get_levels(dim)).astype(np.int64) + 1 for dim in dims}
+
+    arrays = {}
+    for cuboid in cuboids:
+        shape = tuple(len(get_levels(dim)) + 1 for dim in cuboid)
+        size = int(np.prod(shape))
+        index = np.ravel_multi_index([codes[dim] for dim in cuboid], shape)
+
+        cells = {'count': np.bincount(index, minlength=size)}
+        for name, values in measures.items():
+            if np.issubdtype(values.dtype, np.integer) and not (values == MISSING_INTEGER).any():
+                cells[f'sum:{name}'] = np.bincount(index, weights=values, minlength=size).round().astype(np.int64)
+                cells[f'count:{name}'] = cells['count']
+            elif np.issubdtype(values.dtype, np.integer):
+                # Blank integer answers are left out, as NaN scores are
+                valid = values != MISSING_INTEGER
+                cells[f'sum:{name}'] = np.bincount(index[valid], weights=values[valid],
+                                                   minlength=size).round().astype(np.int64)
+                cells[f'count:{name}'] = np.bincount(index[valid], minlength=size)
+            else:
+                valid = ~np.isnan(values)
+                cells[f'sum:{name}'] = np.bincount(index[valid], weights=values[valid], minlength=size)
+                cells[f'count:{name}'] = np.bincount(index[valid], minlength=size)
+
+        for array in cells.values():
+            array.flags.writeable = False
+        arrays[tuple(cuboid)] = {name: array.reshape(shape) for name, array in cells.items()}
+
+    return AggregateCube(arrays)
+
+
+# One cube per dataset and filter selection, shared read-only by all pages and sessions
+@st.cache_resource(max_entries=16)
+def build_filtered_cube(filter_key):
+    df = load_data(CUBE_COLUMNS)
+    mask = get_filter_mask(filter_key)
+    return build_cube(df if mask is None else df[mask])
+
+
+# Cubes of the live dataset per filter selection, merged with the cube of the rows appended since
+live_cubes = IncrementalCache(lambda filter_key, rows: build_cube(rows[select_rows(rows, filter_key)] if filter_key
+                                                                  else rows), AggregateCube.merge)
+
+
+# Cube for the current sidebar filters, or for the selection in filter_key
+def load_cube(filter_key=None):
+    filter_key = get_filter_key() if filter_key is None else filter_key
+    with span('load_cube'):
+        if BACKEND != 'csv':
+            from src.database import get_database_cube
+            return get_database_cube(filter_key)
+        if STREAMING:
+            from src.streaming import get_streamed_aggregates
+            return get_streamed_aggregates(filter_key).cube
+        if INCREMENTAL:
+            return live_cubes.get(filter_key)
+        return build_filtered_cube(filter_key)
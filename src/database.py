@@ -0,0 +1,375 @@
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from src.utils import DATA_PATH, BACKEND, COL_GENDER, COL_AGE, COL_TALK_FREQUENCY, COL_TALK_DURATION, COL_TIMESTAMP, \
+    LIKERT_COLUMNS, LIKERT_LEVELS, ROLE_COLUMNS, ROLE_LEVELS, ROLES, MISSING_INTEGER, read_dataset, get_file_version, \
+    get_order, get_cache_path, make_temp_file
+from src.aggregations import get_codes
+from src.scoring import score_table, score_yapping_factor, YAPPING_FACTOR
+from src.cube import AggregateCube, CUBOIDS, CUBE_COLUMNS, build_cube, get_levels
+from src.filters import INDEX_COLUMNS, ROLE_FILTER, get_filter_key, select_rows
+from src.contingency import ASSOCIATION_COLUMNS, SLOT_COUNTS, build_contingency, count_answer_pairs
+from src.timeline import SHARE_MEASURES, build_timeline, count_timeline, get_hours, share_values
+from src.profiling import span
+
+# Embedded SQL backend (DANCEFLOOR_BACKEND=sqlite, or duckdb when it is installed). The survey is loaded once
+# into a database file beside the Parquet snapshot, with an index on every categorical and Role_* column.
+# The cube every page reads is then built by GROUP BY queries pushed into the engine, sidebar filters become
+# WHERE clauses, and only the grouped counts and sums come back to Python.
+
+# Columns of the survey table: the cube's, the associated questions' and the ones the sidebar filters select on
+DATABASE_COLUMNS = list(dict.fromkeys(CUBE_COLUMNS + ASSOCIATION_COLUMNS + INDEX_COLUMNS))
+TABLE = 'survey'
+
+# Hour of every response (see timeline.get_hours), -1 when it has no timestamp, stored after the answers
+COL_HOUR = 'Hour'
+TABLE_COLUMNS = DATABASE_COLUMNS + [COL_HOUR]
+
+# Measures summed per cell, as in build_cube
+INTEGER_MEASURES = ROLE_COLUMNS + LIKERT_COLUMNS
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_database_path(path, engine):
+    return get_cache_path(path, f'.{engine}')
+
+
+def connect(database_path, engine, read_only=True):
+    if engine == 'duckdb':
+        import duckdb
+        return duckdb.connect(database_path, read_only=read_only)
+    if read_only:
+        return sqlite3.connect(f'file:{database_path}?mode=ro', uri=True)
+    return sqlite3.connect(database_path)
+
+
+def get_database_errors(engine):
+    if engine == 'duckdb':
+        import duckdb
+        return (duckdb.Error, OSError)
+    return (sqlite3.Error, OSError)
+
+
+# Database file for a CSV, rebuilt whenever the CSV or the schema changed
+# Sessions of one process that find the database out of date wait for a single build
+build_lock = threading.Lock()
+
+
+def get_database(path=DATA_PATH, engine=BACKEND):
+    database_path = get_database_path(path, engine)
+    version = get_file_version(path)
+    if read_version(database_path, engine) != version:
+        with build_lock:
+            if read_version(database_path, engine) != version:
+                write_database(path, database_path, engine, version)
+    return database_path
+
+
+def read_version(database_path, engine):
+    if not os.path.exists(database_path):
+        return None
+    try:
+        con = connect(database_path, engine)
+        try:
+            return con.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        finally:
+            con.close()
+    except get_database_errors(engine):
+        return None
+
+
+def to_table_frame(df):
+    # Every answer as an integer: categorical answers and talking factor patterns as their cube slot (level
+    # index + 1, 0 when missing), Likert answers and Role_* flags as they are
+    columns = {}
+    for col in DATABASE_COLUMNS:
+        if col in INTEGER_MEASURES:
+            columns[col] = df[col].to_numpy().astype(np.int64)
+        else:
+            columns[col] = get_codes(df[col], get_levels(col)).astype(np.int64) + 1
+    columns[COL_HOUR] = get_hours(df[COL_TIMESTAMP])
+    return pd.DataFrame(columns)
+
+
+def write_database(path, database_path, engine, version):
+    df = to_table_frame(read_dataset(path, DATABASE_COLUMNS + [COL_TIMESTAMP]))
+
+    # Built under a temporary name of its own so concurrent readers never open a partial database, and
+    # concurrent builds never write to the same file
+    tmp_path = make_temp_file(database_path)
+    try:
+        if engine == 'duckdb':
+            # DuckDB creates the file itself; the random name keeps it unique
+            os.remove(tmp_path)
+        con = connect(tmp_path, engine, read_only=False)
+        try:
+            con.execute(f"CREATE TABLE {TABLE} ({', '.join(f'{quote(col)} INTEGER' for col in TABLE_COLUMNS)})")
+            if engine == 'duckdb':
+                con.register('frame', df)
+                con.execute(f'INSERT INTO {TABLE} SELECT * FROM frame')
+            else:
+                con.executemany(f"INSERT INTO {TABLE} VALUES ({', '.join('?' * len(TABLE_COLUMNS))})",
+                                zip(*(df[col].tolist() for col in TABLE_COLUMNS)))
+            for i, col in enumerate(INDEX_COLUMNS):
+                con.execute(f'CREATE INDEX {TABLE}_{i} ON {TABLE} ({quote(col)})')
+            con.execute('CREATE TABLE meta (key TEXT, value TEXT)')
+            con.execute("INSERT INTO meta VALUES ('version', ?)", [version])
+            if engine == 'sqlite':
+                con.commit()
+        finally:
+            con.close()
+        os.replace(tmp_path, database_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def slot_expression(dim):
+    # Likert answers and Role_* flags are stored as given; values off the scale land in the missing slot, as in
+    # the cube
+    if dim in INTEGER_MEASURES:
+        levels = LIKERT_LEVELS if dim in LIKERT_COLUMNS else ROLE_LEVELS
+        low, high = levels[0], levels[-1]
+        return f'CASE WHEN {quote(dim)} BETWEEN {low} AND {high} THEN {quote(dim)} - {low - 1} ELSE 0 END'
+    return quote(dim)
+
+
+def get_where(filter_key):
+    # Levels OR-ed within a filter and filters AND-ed, like BitmapIndex.select
+    clauses, params = [], []
+    for column, levels in filter_key:
+        if column == ROLE_FILTER:
+            roles = [f'{quote(ROLE_COLUMNS[ROLES.index(level)])} = 1' for level in levels]
+            clauses.append(f"({' OR '.join(roles)})")
+        else:
+            clauses.append(f"{quote(column)} IN ({', '.join('?' * len(levels))})")
+            params += [get_order(column).index(level) + 1 for level in levels]
+    return (f" WHERE {' AND '.join(clauses)}" if clauses else ''), params
+
+
+# The cube of build_cube for the rows matching a filter selection, from one GROUP BY query per cuboid
+def query_cube(con, filter_key=(), cuboids=CUBOIDS):
+    where, params = get_where(filter_key)
+    behaviour = [COL_TALK_FREQUENCY, COL_TALK_DURATION]
+
+    arrays = {}
+    for cuboid in cuboids:
+        # Also grouped by the two answers the Yapping Factor is scored from, so its sums are count x score.
+        # The slots are packed into one integer per cell, which SQLite groups by far faster than separate columns.
+        dims = list(cuboid) + [dim for dim in behaviour if dim not in cuboid]
+        dims_shape = tuple(len(get_levels(dim)) + 1 for dim in dims)
+        key = '0'
+        for dim, n_slots in zip(dims, dims_shape):
+            key = f'({key}) * {n_slots} + {slot_expression(dim)}'
+        # Blank integer answers are stored as MISSING_INTEGER and left out of the sums and counts, as in the cube
+        select = [key, 'COUNT(*)']
+        for col in INTEGER_MEASURES:
+            select += [f'SUM(CASE WHEN {quote(col)} = {MISSING_INTEGER} THEN 0 ELSE {quote(col)} END)',
+                       f'COUNT(NULLIF({quote(col)}, {MISSING_INTEGER}))']
+        sql = f"SELECT {', '.join(select)} FROM {TABLE}{where} GROUP BY 1"
+        rows = np.array(con.execute(sql, params).fetchall(), dtype=np.int64).reshape(-1, len(select))
+
+        slots = np.unravel_index(rows[:, 0], dims_shape)
+        shape = dims_shape[:len(cuboid)]
+        size = int(np.prod(shape))
+        index = np.ravel_multi_index(slots[:len(cuboid)], shape)
+        counts = rows[:, 1]
+
+        cells = {'count': np.bincount(index, weights=counts, minlength=size).round().astype(np.int64)}
+        for i, name in enumerate(INTEGER_MEASURES):
+            sums, answered = rows[:, 2 + 2 * i], rows[:, 3 + 2 * i]
+            cells[f'sum:{name}'] = np.bincount(index, weights=sums, minlength=size).round().astype(np.int64)
+            if (answered == counts).all():
+                cells[f'count:{name}'] = cells['count']
+            else:
+                cells[f'count:{name}'] = np.bincount(index, weights=answered, minlength=size).round().astype(np.int64)
+
+        # Slot 0 (missing) indexes the padded NaN row and column of the score table
+        scores = score_table[slots[dims.index(COL_TALK_FREQUENCY)] - 1, slots[dims.index(COL_TALK_DURATION)] - 1]
+        valid = ~np.isnan(scores)
+        cells[f'sum:{YAPPING_FACTOR}'] = np.bincount(index[valid], weights=counts[valid] * scores[valid],
+                                                     minlength=size)
+        cells[f'count:{YAPPING_FACTOR}'] = np.bincount(index[valid], weights=counts[valid],
+                                                       minlength=size).round().astype(np.int64)
+
+        for array in cells.values():
+            array.flags.writeable = False
+        arrays[tuple(cuboid)] = {name: array.reshape(shape) for name, array in cells.items()}
+
+    return AggregateCube(arrays)
+
+
+# Pair counts of the associated questions for the rows matching a filter selection. The answer slots of every
+# row are packed into one integer and grouped in the engine, so one row comes back per distinct combination of
+# answers and is counted with its respondents as weight.
+def query_contingency(con, filter_key=()):
+    where, params = get_where(filter_key)
+    key = '0'
+    for col, n_slots in zip(ASSOCIATION_COLUMNS, SLOT_COUNTS):
+        key = f'({key}) * {n_slots} + {slot_expression(col)}'
+    sql = f"SELECT {key}, COUNT(*) FROM {TABLE}{where} GROUP BY 1"
+    rows = np.array(con.execute(sql, params).fetchall(), dtype=np.int64).reshape(-1, 2)
+    slots = np.stack(np.unravel_index(rows[:, 0], tuple(SLOT_COUNTS)), axis=1).astype(np.int8)
+    return count_answer_pairs(slots, rows[:, 1])
+
+
+# Timeline of build_timeline for the rows matching a filter selection. Responses are grouped by hour and by the
+# answers each trend measure is computed from, so one row comes back per hour and answer combination.
+def query_timeline(con, filter_key=()):
+    where, params = get_where(filter_key)
+    dated = f"{where} AND {quote(COL_HOUR)} >= 0" if where else f" WHERE {quote(COL_HOUR)} >= 0"
+
+    def group(dims):
+        select = [quote(COL_HOUR)] + [quote(dim) for dim in dims] + ['COUNT(*)']
+        groups = ', '.join(str(i + 1) for i in range(len(dims) + 1))
+        sql = f"SELECT {', '.join(select)} FROM {TABLE}{dated} GROUP BY {groups}"
+        rows = np.array(con.execute(sql, params).fetchall(), dtype=np.int64).reshape(-1, len(select))
+        return rows[:, 0], rows[:, 1:-1], rows[:, -1]
+
+    # Slot 0 (missing) indexes the padded NaN row and column of the score table, as in query_cube
+    hours, slots, counts = group([COL_TALK_FREQUENCY, COL_TALK_DURATION])
+    measures = [(hours, score_table[slots[:, 0] - 1, slots[:, 1] - 1], counts)]
+    for col, answers in SHARE_MEASURES.values():
+        share_hours, share_slots, share_counts = group([col])
+        measures.append((share_hours, share_values(col, answers, share_slots[:, 0] - 1), share_counts))
+
+    undated = f"{where} AND {quote(COL_HOUR)} < 0" if where else f" WHERE {quote(COL_HOUR)} < 0"
+    n_undated = con.execute(f"SELECT COUNT(*) FROM {TABLE}{undated}", params).fetchone()[0]
+    return count_timeline(hours, counts, measures, int(n_undated))
+
+
+# One cube per dataset version and filter selection, shared by all sessions
+@st.cache_resource(max_entries=16)
+def load_database_cube(filter_key, version, engine=BACKEND):
+    con = connect(get_database(DATA_PATH, engine), engine)
+    try:
+        return query_cube(con, filter_key)
+    finally:
+        con.close()
+
+
+def get_database_cube(filter_key=None):
+    filter_key = get_filter_key() if filter_key is None else filter_key
+    with span('query_cube'):
+        return load_database_cube(filter_key, get_file_version(DATA_PATH))
+
+
+@st.cache_resource(max_entries=16)
+def load_database_contingency(filter_key, version, engine=BACKEND):
+    con = connect(get_database(DATA_PATH, engine), engine)
+    try:
+        return query_contingency(con, filter_key)
+    finally:
+        con.close()
+
+
+def get_database_contingency(filter_key=None):
+    filter_key = get_filter_key() if filter_key is None else filter_key
+    with span('query_contingency'):
+        return load_database_contingency(filter_key, get_file_version(DATA_PATH))
+
+
+@st.cache_resource(max_entries=16)
+def load_database_timeline(filter_key, version, engine=BACKEND):
+    con = connect(get_database(DATA_PATH, engine), engine)
+    try:
+        return query_timeline(con, filter_key)
+    finally:
+        con.close()
+
+
+def get_database_timeline(filter_key=None):
+    filter_key = get_filter_key() if filter_key is None else filter_key
+    with span('query_timeline'):
+        return load_database_timeline(filter_key, get_file_version(DATA_PATH))
+
+
+# Parity check: every cube cell, every pair count, every timeline bucket and every report chart computed through
+# the database against the pandas path
+
+PARITY_FILTERS = [(), ((COL_GENDER, ('Female',)),), ((COL_AGE, ('18-24', '25-34')), (ROLE_FILTER, ('DJ',)))]
+
+
+def same_values(a, b):
+    if isinstance(a, float) and isinstance(b, (int, float)):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same_values(a[key], b[key]) for key in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(same_values(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def same_timeline(a, b):
+    return (a.start, a.undated) == (b.start, b.undated) and np.array_equal(a.responses, b.responses) \
+        and np.array_equal(a.counts, b.counts) and np.allclose(a.sums, b.sums, rtol=1e-12, atol=0)
+
+
+def check_parity(path=DATA_PATH, engine='sqlite', filter_keys=PARITY_FILTERS):
+    from src.report import CHARTS, enumerate_tasks
+    from src.analytics import yapping_histogram, score_histogram, cube_score_counts
+
+    mismatches = []
+    df = read_dataset(path, DATABASE_COLUMNS + [COL_TIMESTAMP])
+    con = connect(get_database(path, engine), engine)
+    try:
+        for filter_key in filter_keys:
+            rows = df[select_rows(df, filter_key)] if filter_key else df
+            expected, actual = build_cube(rows), query_cube(con, filter_key)
+            expected_tables, actual_tables = build_contingency(rows), query_contingency(con, filter_key)
+
+            for cuboid, cells in expected.cuboids.items():
+                for name, array in cells.items():
+                    if not np.allclose(array, actual.cuboids[cuboid][name], rtol=1e-12, atol=0):
+                        mismatches.append((filter_key, f'cube {cuboid} {name}'))
+            if not np.array_equal(expected_tables.counts, actual_tables.counts):
+                mismatches.append((filter_key, 'pair counts'))
+            expected_timeline, actual_timeline = build_timeline(rows), query_timeline(con, filter_key)
+            if not same_timeline(expected_timeline, actual_timeline):
+                mismatches.append((filter_key, 'timeline'))
+
+            # The histogram is binned from respondents per score, which the database cube carries as cells
+            scores = score_yapping_factor(rows[COL_TALK_FREQUENCY], rows[COL_TALK_DURATION])
+            expected_bins, actual_bins = yapping_histogram(scores), score_histogram(cube_score_counts(actual))
+            if not all(same_values(expected_bins[key].tolist(), actual_bins[key].tolist())
+                       for key in ('centers', 'counts')):
+                mismatches.append((filter_key, 'yapping histogram'))
+
+            for page, heading, chart, selections in enumerate_tasks():
+                # Charts of per-respondent scores and of the answers' text do not read the cube
+                if chart in ('yapping_histogram', 'term_ranking'):
+                    continue
+                contexts = [{'cube': expected, 'contingency': expected_tables, 'timeline': expected_timeline},
+                            {'cube': actual, 'contingency': actual_tables, 'timeline': actual_timeline}]
+                figures = [json.loads(CHARTS[chart](ctx, *selections).to_json())['data'] for ctx in contexts]
+                if not same_values(*figures):
+                    mismatches.append((filter_key, f'{page}: {heading}'))
+    finally:
+        con.close()
+    return mismatches
+
+
+# Usage: python -m src.database [--engine sqlite|duckdb] [--data survey.csv]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check that the database backend gives the same chart data as pandas.")
+    parser.add_argument('--engine', default='sqlite', choices=['sqlite', 'duckdb'], help="embedded database engine")
+    parser.add_argument('--data', default=DATA_PATH, help="survey CSV to check")
+    args = parser.parse_args()
+
+    mismatches = check_parity(args.data, args.engine)
+    for filter_key, item in mismatches:
+        print(f"MISMATCH {item} (filters: {filter_key or 'none'})")
+    print(f"{len(mismatches)} mismatches with {args.engine} for {len(PARITY_FILTERS)} filter selections")
+    if mismatches:
+        sys.exit(1)
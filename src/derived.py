@@ -0,0 +1,66 @@
+import numpy as np
+import streamlit as st
+from src.utils import BACKEND, INCREMENTAL, STREAMING, load_data, COL_TALK_FREQUENCY, COL_TALK_DURATION
+from src.scoring import score_yapping_factor
+from src.filters import get_filter_mask, select_rows
+from src.analytics import yapping_histogram, score_counts, score_histogram, cube_score_counts
+from src.ingest import IncrementalCache
+from src.profiling import timed
+
+
+# Derived per-respondent columns are computed once per process and kept beside the shared dataset,
+# row-aligned with it, instead of being added to a copy of it
+def load_yapping_factor():
+    if INCREMENTAL:
+        return live_scores.get()
+    return load_static_yapping_factor()
+
+
+@st.cache_resource
+def load_static_yapping_factor():
+    df = load_data([COL_TALK_FREQUENCY, COL_TALK_DURATION])
+    return score_rows(df)
+
+
+def score_rows(df):
+    scores = score_yapping_factor(df[COL_TALK_FREQUENCY], df[COL_TALK_DURATION])
+    scores.flags.writeable = False
+    return scores
+
+
+def append_scores(scores, new_scores):
+    scores = np.concatenate([scores, new_scores])
+    scores.flags.writeable = False
+    return scores
+
+
+# Scores of the live dataset, extended with the scores of appended rows only
+live_scores = IncrementalCache(lambda key, rows: score_rows(rows), append_scores, max_entries=1)
+
+# Respondents per distinct score for each filter selection, enough to bin the histogram
+live_score_counts = IncrementalCache(
+    lambda filter_key, rows: score_counts(score_rows(rows[select_rows(rows, filter_key)] if filter_key else rows)),
+    lambda counts, new_counts: counts.add(new_counts, fill_value=0).astype(np.int64))
+
+
+# Yapping Factor histogram per filter selection, binned like the plotly histogram it replaces
+@timed
+def load_yapping_histogram(filter_key, nbins=20):
+    if BACKEND != 'csv':
+        from src.database import get_database_cube
+        return score_histogram(cube_score_counts(get_database_cube(filter_key)), nbins)
+    if STREAMING:
+        from src.streaming import get_streamed_aggregates
+        return score_histogram(get_streamed_aggregates(filter_key).score_counts, nbins)
+    if INCREMENTAL:
+        return score_histogram(live_score_counts.get(filter_key), nbins)
+    return load_static_yapping_histogram(filter_key, nbins)
+
+
+@st.cache_data(max_entries=16)
+def load_static_yapping_histogram(filter_key, nbins=20):
+    scores = load_yapping_factor()
+    mask = get_filter_mask(filter_key)
+    if mask is not None:
+        scores = scores[mask]
+    return yapping_histogram(scores, nbins)
@@ -0,0 +1,93 @@
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+from src.utils import get_dataset_version
+from src.filters import get_filter_key
+from src.profiling import span
+
+# Memory budget for cached figures, by their serialized size, shared by all sessions
+# (DANCEFLOOR_FIGURE_CACHE_MB=0 to disable)
+FIGURE_CACHE_BYTES = int(float(os.environ.get('DANCEFLOOR_FIGURE_CACHE_MB', '64')) * 1e6)
+
+
+class FigureCache:
+    # Values keyed by (page, chart, dataset version, filter state, widget selections), each with its size in bytes
+    # (the length of a payload unless given). The least recently used are evicted once the sizes exceed the budget.
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size=None):
+        size = len(value) if size is None else size
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            if size > self.budget:
+                return
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.budget:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self.entries), 'bytes': self.size, 'budget': self.budget}
+
+
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache(FIGURE_CACHE_BYTES)
+
+
+# Figure for a chart on a page, built by build() only when this page, chart, dataset, filter selection and
+# widget selections have not been drawn before. The figure itself is kept, so a hit costs no parsing or validation;
+# it is shared by all sessions and must not be changed after it is built.
+def cached_figure(page, chart, selections, build):
+    with span(f'figure:{chart}') as attrs:
+        cache = get_figure_cache()
+        key = (page, chart, get_dataset_version(), get_filter_key(), tuple(selections))
+        entry = cache.get(key)
+        attrs['cache'] = 'miss' if entry is None else 'hit'
+        if entry is None:
+            with span('build'):
+                fig = build()
+            # Sized once by its serialized length, which is what the budget counts
+            with span('serialize'):
+                entry = (fig, len(fig.to_json()))
+            cache.put(key, entry, entry[1])
+        fig, attrs['bytes'] = entry
+        return fig
+
+
+# Draw a cached figure full width
+def plot_figure(page, chart, selections, build):
+    fig = cached_figure(page, chart, selections, build)
+    with span(f'plotly_chart:{chart}'):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def render_figure_cache_report():
+    stats = get_figure_cache().stats()
+    st.sidebar.caption(f"Figure cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, "
+                       f"{stats['entries']} figures in {stats['bytes'] / 1e6:.2f} of {stats['budget'] / 1e6:.0f} MB")
@@ -0,0 +1,447 @@
+import plotly.express as px
+from src.utils import ROLES, IMPACT_DJ, TALK_FREQUENCY, TALK_DURATION, TALK_PERCEPTION
+from src.scoring import YAPPING_FACTOR
+from src import analytics
+
+# One Plotly figure per dashboard chart, built from the analytics functions. Used by the pages and by the
+# static report, so neither depends on the other. Pages import this module inside app() to keep plotly
+# out of the startup path.
+
+
+# Demographics
+
+def age_chart(cube):
+    age_counts = analytics.age_distribution(cube)
+    fig_age = px.bar(x=age_counts.index, y=age_counts.values)
+    fig_age.update_layout(
+        xaxis_title="Age Group",
+        yaxis_title="Number of Participants",
+        hovermode="x"
+    )
+    fig_age.update_traces(
+        hovertemplate="Age Group: %{x}<br>Participants: %{y}"
+    )
+    return fig_age
+
+
+def gender_chart(cube):
+    gender_counts = analytics.gender_distribution(cube)
+    fig_gender = px.pie(
+        values=gender_counts.values,
+        names=gender_counts.index,
+        title=f"Total: {analytics.total_participants(cube)}"
+    )
+    fig_gender.update_traces(
+        textposition='inside',
+        textinfo='percent',
+        hovertemplate="Gender: %{label}<br>Participants: %{value}<br>Percentage: %{percent}"
+    )
+    return fig_gender
+
+
+def attendance_chart(cube):
+    attendance_counts = analytics.attendance_distribution(cube)
+    fig_attendance = px.pie(
+        values=attendance_counts.values,
+        names=attendance_counts.index,
+        title=f"Total: {analytics.total_participants(cube)}"
+    )
+    fig_attendance.update_traces(
+        textposition='inside',
+        textinfo='percent',
+        hovertemplate="Frequency: %{label}<br>Participants: %{value}<br>Percentage: %{percent}"
+    )
+    return fig_attendance
+
+
+def experience_chart(cube):
+    experience_counts = analytics.experience_distribution(cube)
+    fig_experience = px.bar(x=experience_counts.index, y=experience_counts.values)
+    fig_experience.update_layout(
+        xaxis_title="Years of Experience",
+        yaxis_title="Number of Participants",
+        hovermode="x"
+    )
+    fig_experience.update_traces(
+        hovertemplate="Experience: %{x} years<br>Participants: %{y}"
+    )
+    return fig_experience
+
+
+def roles_chart(cube):
+    role_counts = analytics.role_distribution(cube)
+    fig_roles = px.bar(x=role_counts.index, y=role_counts.values)
+    fig_roles.update_layout(
+        xaxis_title="Role",
+        yaxis_title="Number of Participants",
+        hovermode="x"
+    )
+    fig_roles.update_traces(
+        hovertemplate="Role: %{x}<br>Participants: %{y}"
+    )
+    return fig_roles
+
+
+# Talking behaviour
+
+def talk_frequency_chart(cube):
+    freq_counts = analytics.talk_frequency_distribution(cube)
+    fig_freq = px.bar(x=freq_counts.index, y=freq_counts.values, category_orders={"x": TALK_FREQUENCY})
+    fig_freq.update_layout(
+        xaxis_title="How often people talk",
+        yaxis_title="Number of Participants",
+        hovermode="x"
+    )
+    fig_freq.update_traces(
+        hovertemplate="Frequency: %{x}<br>Participants: %{y}"
+    )
+    return fig_freq
+
+
+def talk_duration_chart(cube):
+    duration_counts = analytics.talk_duration_distribution(cube)
+    fig_duration = px.bar(x=duration_counts.index, y=duration_counts.values, category_orders={"x": TALK_DURATION})
+    fig_duration.update_layout(
+        xaxis_title="How long conversations last",
+        yaxis_title="Number of Participants",
+        hovermode="x"
+    )
+    fig_duration.update_traces(
+        hovertemplate="Duration: %{x}<br>Participants: %{y}"
+    )
+    return fig_duration
+
+
+def talk_perception_chart(cube):
+    perception_counts = analytics.talk_perception_distribution(cube)
+    fig_perception = px.bar(x=perception_counts.index, y=perception_counts.values,
+                            category_orders={"x": TALK_PERCEPTION})
+    fig_perception.update_layout(
+        xaxis_title="How acceptable talking is perceived",
+        yaxis_title="Number of Participants",
+        hovermode="x"
+    )
+    fig_perception.update_traces(
+        hovertemplate="Perception: %{x}<br>Participants: %{y}"
+    )
+    return fig_perception
+
+
+# Impact analysis
+
+def impact_pie(cube, impact_column):
+    counts = analytics.impact_distribution(cube, impact_column)
+    fig = px.pie(
+        values=counts.values,
+        names=counts.index
+    )
+    fig.update_traces(
+        textposition='inside',
+        textinfo='percent',
+        hovertemplate="Impact: %{label}<br>Participants: %{value}<br>Percentage: %{percent}"
+    )
+    return fig
+
+
+def impact_role_heatmap(cube, impact_type, impact_column):
+    heatmap_data, count_data = analytics.impact_by_role(cube, impact_column)
+
+    # Create a text matrix for annotations
+    text_matrix = [[f"{heatmap_data.iloc[i, j]:.1f}%" for j in range(heatmap_data.shape[1])] for i in range(heatmap_data.shape[0])]
+
+    fig_heatmap = px.imshow(heatmap_data,
+                            labels=dict(x="Role", y="Perceived Impact", color="Percentage"),
+                            x=ROLES,
+                            y=IMPACT_DJ,  # This assumes all impact columns have the same categories
+                            color_continuous_scale="YlOrRd",
+                            text_auto=False)  # Disable automatic text
+
+    # Add percentages as text annotations
+    for i in range(len(heatmap_data.index)):
+        for j in range(len(heatmap_data.columns)):
+            fig_heatmap.add_annotation(
+                x=j,
+                y=i,
+                text=text_matrix[i][j],
+                showarrow=False,
+                font=dict(color="black" if heatmap_data.iloc[i, j] < 50 else "white")
+            )
+
+    # Update hover template to include counts
+    fig_heatmap.update_traces(
+        hovertemplate="Role: %{x}<br>Perceived Impact: %{y}<br>Percentage: %{z:.1f}%<br>Count: %{text}<extra></extra>",
+        text=count_data.values
+    )
+
+    fig_heatmap.update_layout(xaxis_title="Role", yaxis_title=f"Perceived Impact on {impact_type}")
+    return fig_heatmap
+
+
+def impact_breakdown_chart(cube, demographic_factor, demographic_column, impact_type, impact_column):
+    # Percentage and count of each impact answer per breakdown level, in long format for Plotly
+    impact_melted = analytics.impact_breakdown(cube, demographic_column, impact_column)
+
+    # Create the grouped bar chart
+    fig = px.bar(impact_melted,
+                 x=demographic_column,
+                 y='Percentage',
+                 color='Impact',
+                 barmode='group',
+                 title=f'Impact on {impact_type} by {demographic_factor}',
+                 labels={demographic_column: demographic_factor},
+                 color_discrete_map={'Yes, positively': '#26A69A',
+                                     'No effect': '#FFA726',
+                                     'Yes, negatively': '#EF5350'},
+                 text='Percentage',
+                 hover_data=['Count'])
+
+    # Customize the layout
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='white',
+        legend_title_text='Impact',
+        xaxis_title=demographic_factor,
+        yaxis_title='Percentage',
+        yaxis_range=[0, 100]
+    )
+
+    # Add gridlines
+    fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='rgba(255,255,255,0.1)')
+
+    # Update traces to show percentages on bars and customize hover template
+    fig.update_traces(
+        texttemplate='%{text:.1f}%',
+        textposition='inside',
+        hovertemplate='%{x}<br>%{y:.1f}% (%{customdata[0]} responses)<extra></extra>'
+    )
+    return fig
+
+
+# Quiet importance
+
+def quiet_heatmap_chart(cube):
+    # Counts and percentages for all values from 1 to 5 on both axes, likelihood on the y axis
+    heatmap_data, heatmap_percentages = analytics.quiet_heatmap(cube)
+
+    # Create the heatmap
+    fig = px.imshow(heatmap_data,
+                    labels=dict(x="Importance of Quiet Environment", y="Likelihood of Intervention", color="Count"),
+                    x=heatmap_data.columns,
+                    y=heatmap_data.index,
+                    color_continuous_scale="YlOrRd",
+                    aspect="auto")
+
+    # Update layout
+    fig.update_layout(
+        title="Heatmap: Quiet Environment Importance vs Intervention Likelihood",
+        xaxis_title="Importance of Quiet Environment",
+        yaxis_title="Likelihood of Intervention",
+        xaxis=dict(tickmode='linear', tick0=1, dtick=1),
+        yaxis=dict(tickmode='linear', tick0=1, dtick=1)
+    )
+
+    # Add text annotations with the count of every cell
+    for y in heatmap_data.index:
+        for x in heatmap_data.columns:
+            count = heatmap_data.loc[y, x]
+            fig.add_annotation(
+                x=x, y=y,
+                text=f"{count}<br>",
+                showarrow=False,
+                font=dict(color="black" if count < heatmap_data.max().max() / 2 else "white")
+            )
+
+    # Update hover template
+    fig.update_traces(
+        hovertemplate="Importance: %{x}<br>Likelihood: %{y}<br>Count: %{z}<br>Percentage: %{text:.1f}%<extra></extra>",
+        text=heatmap_percentages.values
+    )
+    return fig
+
+
+def likelihood_chart(cube, demographic_factor, demographic_column):
+    # Prepare data for the grouped bar chart: average intervention likelihood per importance level (as answered)
+    grouped_data = analytics.likelihood_by_importance(cube, demographic_column)
+    lower, upper = analytics.likelihood_intervals(cube, demographic_column)
+
+    # Create the grouped bar chart
+    fig = px.bar(grouped_data,
+                 barmode='group',
+                 labels={'value': 'Average Likelihood of Intervention',
+                         'index': 'Importance of Quiet Environment'},
+                 title=f'Average Likelihood of Intervention by Quiet Environment Importance and {demographic_factor} '
+                       f'(error bars: {analytics.BOOTSTRAP_CONFIDENCE:.0%} bootstrap confidence interval)')
+
+    # Bootstrap interval of every bar, one trace per demographic group
+    for trace, level in zip(fig.data, grouped_data.columns):
+        trace.error_y = dict(type='data', array=upper[level] - grouped_data[level],
+                             arrayminus=grouped_data[level] - lower[level])
+        trace.customdata = list(zip(lower[level], upper[level]))
+
+    # Update layout for better readability
+    fig.update_layout(
+        xaxis_title='Importance of Quiet Environment',
+        yaxis_title='Average Likelihood of Intervention',
+        legend_title=demographic_factor,
+        xaxis={'tickmode': 'linear', 'tick0': 1, 'dtick': 1}
+    )
+
+    # Update hover template
+    fig.update_traces(
+        hovertemplate="Importance: %{x}<br>Average Likelihood: %{y:.2f}<br>"
+                      "Confidence interval: %{customdata[0]:.2f} - %{customdata[1]:.2f}<br>"
+                      "%{fullData.name}<extra></extra>"
+    )
+    return fig
+
+
+# Yapping factor
+
+def yapping_histogram_chart(bins):
+    # Bins come from analytics.yapping_histogram; only one bar per bin is sent
+    fig_hist = px.bar(x=bins['centers'], y=bins['counts'])
+    fig_hist.update_traces(width=bins['size'])
+    fig_hist.update_layout(
+        title_text='Distribution of Yapping Factor',
+        xaxis_title="Yapping Factor",
+        yaxis_title="Number of Participants"
+    )
+    fig_hist.update_traces(
+        hovertemplate="Yapping Factor: %{x:.2f}<br>Count: %{y}"
+    )
+    return fig_hist
+
+
+def yapping_breakdown_chart(cube, secondary_var, primary_var=YAPPING_FACTOR, analysis_type="Yapping Factor"):
+    if primary_var == YAPPING_FACTOR:
+        data = analytics.yapping_by_group(cube, secondary_var).reset_index()
+        intervals = analytics.yapping_intervals(cube, secondary_var).reset_index(drop=True)
+        data = data.join(intervals)
+        fig = px.bar(data, x=secondary_var, y=primary_var,
+                     error_y=data['Upper'] - data[primary_var], error_y_minus=data[primary_var] - data['Lower'],
+                     custom_data=['Lower', 'Upper'],
+                     title=f"Average {analysis_type} by {secondary_var} "
+                           f"(error bars: {analytics.BOOTSTRAP_CONFIDENCE:.0%} bootstrap confidence interval)")
+        fig.update_traces(
+            hovertemplate=f"{secondary_var}: %{{x}}<br>{analysis_type}: %{{y:.2f}}<br>"
+                          f"Confidence interval: %{{customdata[0]:.2f}} - %{{customdata[1]:.2f}}"
+        )
+    else:
+        data = analytics.answers_by_group(cube, secondary_var, primary_var)
+        fig = px.bar(data, x=secondary_var, y='count', color=primary_var,
+                     title=f"{analysis_type} Distribution by {secondary_var}")
+        fig.update_traces(
+            hovertemplate=f"{secondary_var}: %{{x}}<br>{primary_var}: %{{color}}<br>Count: %{{y}}"
+        )
+
+    # Update layout
+    fig.update_layout(xaxis_title=secondary_var, yaxis_title=analysis_type if primary_var == YAPPING_FACTOR else "Count")
+    return fig
+
+
+def sensitivity_chart(summary, secondary_var, analysis_type="Yapping Factor"):
+    fig_sensitivity = px.bar(summary.reset_index(names=secondary_var), x=secondary_var, y='Baseline mean',
+                             error_y=summary['Max mean'] - summary['Baseline mean'],
+                             error_y_minus=summary['Baseline mean'] - summary['Min mean'],
+                             title=f"Average {analysis_type} by {secondary_var} (bars: min-max across variants)")
+    fig_sensitivity.update_layout(xaxis_title=secondary_var, yaxis_title=analysis_type)
+    return fig_sensitivity
+
+
+# Talking factors
+
+def factor_prevalence_chart(prevalence, slice_label):
+    fig = px.bar(prevalence.reset_index(), x='Percentage', y='Factor', orientation='h', text='Percentage',
+                 hover_data=['Count'], title=f"Factors contributing to increased talking ({slice_label})")
+    fig.update_layout(
+        xaxis_title="Share of respondents (%)",
+        yaxis_title="",
+        yaxis={'categoryorder': 'total ascending'}
+    )
+    fig.update_traces(
+        texttemplate='%{text:.1f}%',
+        hovertemplate="%{y}<br>%{x:.1f}% (%{customdata[0]} respondents)<extra></extra>"
+    )
+    return fig
+
+
+def factor_cooccurrence_chart(matrix, measure, slice_label):
+    percentage = measure != "Respondents"
+    fig = px.imshow(matrix,
+                    labels=dict(x="Co-occurring factor", y="Factor", color=measure),
+                    color_continuous_scale="YlOrRd",
+                    text_auto='.1f' if percentage else True,
+                    aspect="auto",
+                    title=f"Factors ticked together ({slice_label})")
+    fig.update_traces(
+        hovertemplate="Factor: %{y}<br>Co-occurring factor: %{x}<br>" + measure
+                      + (": %{z:.1f}%" if percentage else ": %{z}") + "<extra></extra>"
+    )
+    fig.update_layout(xaxis_title="", yaxis_title="")
+    return fig
+
+
+# Associations
+
+def association_heatmap(matrix, order_label):
+    fig = px.imshow(matrix,
+                    labels=dict(x="", y="", color="Cramér's V"),
+                    color_continuous_scale="YlOrRd",
+                    zmin=0, zmax=1,
+                    text_auto='.2f',
+                    aspect="auto",
+                    title=f"Association between survey answers, Cramér's V ({order_label.lower()})")
+    fig.update_traces(hovertemplate="%{y}<br>%{x}<br>Cramér's V: %{z:.3f}<extra></extra>")
+    fig.update_layout(height=800, xaxis={'tickangle': -45})
+    return fig
+
+
+# Open answers
+
+def term_ranking_chart(ranking, scope):
+    fig = px.bar(ranking, x='Answers', y='Term', orientation='h', hover_data=['Mentions'],
+                 title=f"Most used words ({scope})")
+    fig.update_layout(xaxis_title="Answers using the word", yaxis_title="",
+                      yaxis={'categoryorder': 'total ascending'}, height=max(400, 22 * len(ranking)))
+    fig.update_traces(hovertemplate="%{y}<br>%{x} answers, %{customdata[0]} mentions<extra></extra>")
+    return fig
+
+
+def term_breakdown_chart(breakdown, query, factor):
+    data = breakdown.reset_index()
+    column = breakdown.index.name
+    fig = px.bar(data, x=column, y='Percentage', text='Percentage', hover_data=['Matching', 'Answering'],
+                 title=f'Participants whose answers match "{query}" by {factor}')
+    fig.update_layout(xaxis_title=factor, yaxis_title="Share of participants who answered (%)")
+    fig.update_traces(
+        texttemplate='%{text:.1f}%',
+        hovertemplate="%{x}<br>%{y:.1f}% (%{customdata[0]} of %{customdata[1]} participants)<extra></extra>"
+    )
+    return fig
+
+
+# Trends over time
+
+def responses_chart(trends, period):
+    data = trends.drop_duplicates('Start')
+    fig = px.bar(data, x='Start', y='Responses', custom_data=['Period'], title=f"Responses per {period.lower()}")
+    fig.update_layout(xaxis_title="", yaxis_title="Responses")
+    fig.update_traces(hovertemplate="%{customdata[0]}<br>Responses: %{y}<extra></extra>")
+    return fig
+
+
+def trend_chart(trends, period):
+    fig = px.line(trends, x='Start', y='Mean', color='Measure', markers=True, custom_data=['Period', 'Answers'],
+                  title=f"Trends by {period.lower()}")
+    fig.update_layout(xaxis_title="", yaxis_title="Mean (0-100)", yaxis_range=[0, 100], legend_title_text="")
+    fig.update_traces(hovertemplate="%{customdata[0]}<br>%{y:.1f} (%{customdata[1]} answers)")
+    return fig
+
+
+def rolling_trend_chart(trends, window_label):
+    fig = px.line(trends, x='Time', y='Mean', color='Measure', custom_data=['Answers'],
+                  title=f"Rolling average over the last {window_label}")
+    fig.update_layout(xaxis_title="", yaxis_title="Mean (0-100)", yaxis_range=[0, 100], legend_title_text="")
+    fig.update_traces(hovertemplate="%{x}<br>%{y:.1f} (%{customdata[0]} answers in the window)")
+    return fig
@@ -0,0 +1,141 @@
+import numpy as np
+import streamlit as st
+from src.utils import BACKEND, INCREMENTAL, STREAMING, load_data, COL_AGE, COL_GENDER, COL_ATTENDANCE, \
+    COL_EXPERIENCE, CATEGORICAL_COLUMNS, ROLE_COLUMNS, ROLES, get_order
+from src.aggregations import get_codes
+from src.ingest import IncrementalCache
+
+# Pseudo-column for the multi-hot Role_* flags; a respondent matches if they have any of the selected roles
+ROLE_FILTER = 'Role'
+
+# Filters shown in the sidebar, label -> column
+FILTERS = {
+    "Role": ROLE_FILTER,
+    "Age": COL_AGE,
+    "Gender": COL_GENDER,
+    "Attendance": COL_ATTENDANCE,
+    "Experience": COL_EXPERIENCE,
+}
+
+# Columns the bitmap index is built from
+INDEX_COLUMNS = CATEGORICAL_COLUMNS + ROLE_COLUMNS
+
+# Number of set bits for every byte value
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+class BitmapIndex:
+    # One packed bitset (1 bit per respondent) for every level of every categorical column and every role.
+    # Any conjunction of filters resolves with bitwise OR within a column and AND across columns.
+
+    def __init__(self, bitmaps, n_rows):
+        self.bitmaps = bitmaps
+        self.n_rows = n_rows
+
+    def select(self, selections):
+        mask = np.packbits(np.ones(self.n_rows, dtype=bool))
+        for column, levels in selections:
+            column_mask = np.zeros_like(mask)
+            for level in levels:
+                column_mask |= self.bitmaps[column][level]
+            mask &= column_mask
+        return mask
+
+    def count(self, mask):
+        return int(POPCOUNT[mask].sum())
+
+    def to_boolean(self, mask):
+        return np.unpackbits(mask, count=self.n_rows).view(bool)
+
+    def append(self, other):
+        # Index of these rows followed by the rows of other; only the last, partly filled byte is repacked
+        full, bits = divmod(self.n_rows, 8)
+        bitmaps = {}
+        for column, levels in self.bitmaps.items():
+            bitmaps[column] = {}
+            for level, bitmap in levels.items():
+                joined = np.concatenate([np.unpackbits(bitmap[full:], count=bits),
+                                         np.unpackbits(other.bitmaps[column][level], count=other.n_rows)])
+                bitmaps[column][level] = np.concatenate([bitmap[:full], np.packbits(joined)])
+        return BitmapIndex(bitmaps, self.n_rows + other.n_rows)
+
+
+def build_bitmap_index(df):
+    bitmaps = {}
+    for column in CATEGORICAL_COLUMNS:
+        levels = get_order(column)
+        codes = get_codes(df[column], levels)
+        bitmaps[column] = {level: np.packbits(codes == i) for i, level in enumerate(levels)}
+    bitmaps[ROLE_FILTER] = {role: np.packbits(df[col].to_numpy() == 1) for role, col in zip(ROLES, ROLE_COLUMNS)}
+    return BitmapIndex(bitmaps, len(df))
+
+
+def load_bitmap_index():
+    if INCREMENTAL:
+        return live_bitmap_index.get()
+    return load_static_bitmap_index()
+
+
+@st.cache_resource
+def load_static_bitmap_index():
+    return build_bitmap_index(load_data(INDEX_COLUMNS))
+
+
+# Index of the live dataset, extended with the bitsets of appended rows
+live_bitmap_index = IncrementalCache(lambda key, rows: build_bitmap_index(rows), BitmapIndex.append, max_entries=1)
+
+
+# Rows of df matching a filter selection, for row sets the process-wide index does not cover
+def select_rows(df, filter_key):
+    index = build_bitmap_index(df)
+    return index.to_boolean(index.select(filter_key))
+
+
+def get_options(column):
+    return ROLES if column == ROLE_FILTER else get_order(column)
+
+
+# Current sidebar selection as a hashable key, empty when nothing is filtered
+def get_filter_key():
+    selections = []
+    for column in FILTERS.values():
+        levels = st.session_state.get(f'filter:{column}')
+        if levels:
+            selections.append((column, tuple(levels)))
+    return tuple(selections)
+
+
+def get_filter_mask(filter_key=None):
+    filter_key = get_filter_key() if filter_key is None else filter_key
+    if not filter_key:
+        return None
+    index = load_bitmap_index()
+    return index.to_boolean(index.select(filter_key))
+
+
+def clear_filters():
+    for column in FILTERS.values():
+        st.session_state[f'filter:{column}'] = []
+
+
+def render_filter_sidebar():
+    st.sidebar.title("Filters")
+    for label, column in FILTERS.items():
+        st.sidebar.multiselect(label, get_options(column), key=f'filter:{column}')
+
+    # Number of matching participants, None when nothing is filtered
+    filter_key = get_filter_key()
+    if not filter_key:
+        return None
+    if BACKEND != 'csv':
+        from src.database import get_database_cube
+        matching, total = int(get_database_cube(filter_key).total()), int(get_database_cube(()).total())
+    elif STREAMING:
+        from src.streaming import get_streamed_aggregates
+        matching, total = get_streamed_aggregates(filter_key).n_rows, get_streamed_aggregates(()).n_rows
+    else:
+        index = load_bitmap_index()
+        matching, total = index.count(index.select(filter_key)), index.n_rows
+    st.sidebar.caption(f"Showing {matching} of {total} participants")
+    st.sidebar.button("Clear filters", on_click=clear_filters)
+    return matching
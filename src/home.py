@@ -10,7 +10,11 @@ def app():
         ("💬 Talking Behavior", "Analyze dancefloor conversation frequency, duration, and perception."),
         ("🎭 Impact Analysis", "Explore how talking affects the overall experience, DJ performance, and event atmosphere."),
         ("🤫 Quiet Importance", "Understand the relationship between the importance of a quiet environment and likelihood of intervention."),
-        ("🗣️ Yapping Factor", "Deep dive into **Yapping Factor** analysis.")
+        ("🗣️ Yapping Factor", "Deep dive into **Yapping Factor** analysis."),
+        ("🧩 Talking Factors", "See which factors participants blame for more talking, and which they name together."),
+        ("🔗 Associations", "Find out which answers go together, with a chi-square test and Cramér's V for every pair of questions."),
+        ("📝 Open Answers", "Search what participants wrote in their own words, and see the terms they use most."),
+        ("📈 Trends Over Time", "Follow how the answers changed by day, week or event while the survey was open.")
     ]
 
     for title, description in sections:
@@ -0,0 +1,243 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from src.utils import DATA_PATH, COL_TIMESTAMP, read_validated_csv, read_fingerprinted, get_content_version
+from src.aggregations import get_codes
+from src.validation import read_rejections, append_quarantine, add_summaries
+from src.profiling import span
+
+# Append-aware ingestion of the survey export (DANCEFLOOR_INCREMENTAL=1). Form responses are appended to the
+# CSV, so a refresh parses only the bytes written since the last load and folds a partial result over just the
+# rows in those bytes into every cached aggregate. The byte offset alone decides what is new: late submissions
+# and out-of-order exports are kept whatever their Timestamp, as a full reload would keep them.
+
+# Bytes before the load offset that must be unchanged for a larger file to count as appended to
+TAIL_CHECK_BYTES = 1 << 16
+
+
+class DatasetState:
+    # Rows loaded at one point in time. A full reload starts a new epoch; within an epoch later states only
+    # ever add rows after the ones of earlier states, so anything computed from an earlier state can be merged.
+
+    def __init__(self, epoch, frame, version, watermark, appended=0):
+        self.epoch = epoch
+        self.frame = frame
+        self.version = version
+        self.watermark = watermark
+        self.appended = appended
+        self.loaded_at = time.time()
+
+    @property
+    def n_rows(self):
+        return len(self.frame)
+
+
+class GrowingFrame:
+    # Columns held in arrays with spare capacity, so appending rows copies just those rows (the arrays grow
+    # geometrically when full). Frames handed out are read-only views of the first rows, which later appends
+    # never write to. Categorical columns are stored as codes.
+
+    def __init__(self, df):
+        self.dtypes = df.dtypes.to_dict()
+        self.arrays = {}
+        self.n_rows = 0
+        self.append(df)
+
+    def append(self, df):
+        n_rows = self.n_rows + len(df)
+        for col, dtype in self.dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                values = get_codes(df[col], dtype.categories)
+            else:
+                values = df[col].to_numpy()
+            array = self.arrays.get(col)
+            if array is None or len(array) < n_rows or not np.can_cast(values.dtype, array.dtype, 'same_kind'):
+                dtype = values.dtype if array is None else np.result_type(array.dtype, values.dtype)
+                grown = np.empty(n_rows + n_rows // 4 + 1024, dtype=dtype)
+                if array is not None:
+                    grown[:self.n_rows] = array[:self.n_rows]
+                array = self.arrays[col] = grown
+            array[self.n_rows:n_rows] = values
+        self.n_rows = n_rows
+
+    def frame(self):
+        columns = {}
+        for col, dtype in self.dtypes.items():
+            values = self.arrays[col][:self.n_rows]
+            values.flags.writeable = False
+            if isinstance(dtype, pd.CategoricalDtype):
+                values = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+            columns[col] = values
+        return pd.DataFrame(columns, copy=False)
+
+
+class LiveDataset:
+    # The survey export as last seen: where parsing stopped (byte offset, the bytes just before it and a running
+    # hash of everything parsed) and the typed rows parsed so far
+
+    def __init__(self, path):
+        self.path = path
+        self.state = None
+        self.rows = None
+        self.header = b''
+        self.offset = 0
+        self.tail = b''
+        self.sha = None
+        # Summary of the rows rejected by validation so far (see src.validation)
+        self.rejected = None
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        with self.lock:
+            size = os.path.getsize(self.path)
+            if self.state is None or not self.is_appended(size):
+                self.reload()
+            elif size > self.offset:
+                self.append(size)
+            return self.state
+
+    def is_appended(self, size):
+        # A file that shrank or changed before the offset was rewritten, not appended to
+        if size < self.offset:
+            return False
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset - len(self.tail))
+            return f.read(len(self.tail)) == self.tail
+
+    def reload(self):
+        with span('ingest:reload'):
+            with open(self.path, 'rb') as f:
+                data = f.read()
+                mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+            end = record_end(data)
+            self.header = data[:data.find(b'\n') + 1]
+            self.offset = end
+            self.tail = data[max(end - TAIL_CHECK_BYTES, 0):end]
+            self.sha = hashlib.sha256(data[:end])
+
+            # Only the complete records up to the offset are parsed, so a response still being written is left
+            # to the next append. They are served by the typed snapshot when it was made from the same bytes.
+            fingerprint = {'mtime_ns': mtime_ns, 'sha256': self.sha.hexdigest()}
+            self.rows = GrowingFrame(read_fingerprinted(self.path, fingerprint, io.BytesIO(data[:end])))
+            frame = self.rows.frame()
+            epoch = self.state.epoch + 1 if self.state is not None else 0
+            self.state = DatasetState(epoch, frame, get_content_version(self.sha.hexdigest()), get_watermark(frame),
+                                      appended=len(frame))
+            self.rejected = read_rejections(self.path, self.state.version)
+
+    def append(self, size):
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        # A response still being written is picked up by the next refresh
+        end = record_end(chunk)
+        if not end:
+            return
+
+        with span('ingest:append', bytes=end) as attrs:
+            rows, rejections = read_validated_csv(io.BytesIO(self.header + chunk[:end]))
+            append_quarantine(rejections, self.path)
+            if self.rejected is not None:
+                self.rejected = add_summaries(self.rejected, rejections.summary())
+            attrs['rows'] = len(rows)
+
+            self.offset += end
+            self.tail = (self.tail + chunk[:end])[-TAIL_CHECK_BYTES:]
+            self.sha.update(chunk[:end])
+
+            frame = self.state.frame
+            if len(rows):
+                self.rows.append(rows)
+                frame = self.rows.frame()
+            # The latest Timestamp so far, whatever order the rows came in
+            watermark = pd.Series([self.state.watermark, get_watermark(rows)]).max()
+            self.state = DatasetState(self.state.epoch, frame, get_content_version(self.sha.hexdigest()), watermark,
+                                      appended=len(rows))
+
+
+# Offset just past the last complete record of CSV bytes that start at a record boundary. Free-text answers
+# may span lines, so only a newline after an even number of quotes ends a record.
+def record_end(data):
+    end = data.rfind(b'\n') + 1
+    while end and data.count(b'"', 0, end) % 2:
+        end = data.rfind(b'\n', 0, end - 1) + 1
+    return end
+
+
+def get_watermark(df):
+    return df[COL_TIMESTAMP].max() if len(df) else pd.NaT
+
+
+@st.cache_resource
+def get_live_dataset(path=DATA_PATH):
+    return LiveDataset(path)
+
+
+# Every script run works on the state it started with, so a refresh triggered by another session halfway
+# through a page cannot mix rows of two states (Streamlit runs each session's script in its own thread)
+pinned = threading.local()
+
+
+def refresh_dataset():
+    with span('ingest'):
+        pinned.state = get_live_dataset().refresh()
+    return pinned.state
+
+
+def get_dataset_state():
+    state = getattr(pinned, 'state', None)
+    return state if state is not None else refresh_dataset()
+
+
+def load_live_data(columns=None):
+    frame = get_dataset_state().frame
+    return frame if columns is None else frame[list(columns)]
+
+
+class IncrementalCache:
+    # Values computed from the live rows, one per key. build(key, rows) computes a partial result over some
+    # rows and merge(old, new) combines the results of consecutive rows, so a value cached for an earlier state
+    # of the same epoch is brought up to date from the appended rows alone.
+
+    def __init__(self, build, merge, max_entries=16):
+        self.build = build
+        self.merge = merge
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key=None):
+        state = get_dataset_state()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != state.epoch:
+                value = self.build(key, state.frame)
+            elif entry[1] > state.n_rows:
+                # Already advanced past this run's state by another session
+                return self.build(key, state.frame)
+            elif entry[1] < state.n_rows:
+                with span('ingest:merge', rows=state.n_rows - entry[1]):
+                    value = self.merge(entry[2], self.build(key, state.frame.iloc[entry[1]:]))
+            else:
+                value = entry[2]
+
+            self.entries[key] = (state.epoch, state.n_rows, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return value
+
+
+def render_ingest_report():
+    state = get_dataset_state()
+    loaded = time.strftime('%H:%M:%S', time.localtime(state.loaded_at))
+    watermark = state.watermark.strftime('%Y-%m-%d %H:%M:%S') if not pd.isna(state.watermark) else 'none'
+    st.sidebar.caption(f"Live data: {state.n_rows} responses up to {watermark}, "
+                       f"{state.appended} added by the refresh at {loaded}")
@@ -0,0 +1,74 @@
+import re
+
+import numpy as np
+import streamlit as st
+from src.utils import COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE, COL_TALK_PERCEPTION, TEXT_COLUMNS
+from src.filters import get_filter_key
+from src.text_index import TEXT_LABELS, load_text_index, term_ranking, term_breakdown
+from src.figure_cache import plot_figure
+
+# Columns matching participants can be broken down by, in the order the selectbox lists them
+BREAKDOWN_FACTORS = {
+    "Age": COL_AGE,
+    "Gender": COL_GENDER,
+    "Attendance Frequency": COL_ATTENDANCE,
+    "Experience": COL_EXPERIENCE,
+    "Perception of Talking": COL_TALK_PERCEPTION
+}
+
+# Quotes shown per page of results, and words in the ranking
+QUOTES_PER_PAGE = 20
+TOP_TERMS = 30
+
+def escape_markdown(text):
+    return re.sub(r'([\\`*_{}\[\]()#+\-.!|>~<$])', r'\\\1', text)
+
+def app():
+    from src import figures
+
+    st.header("What Participants Wrote")
+    index = load_text_index()
+
+    questions = st.multiselect("Questions:", TEXT_COLUMNS, default=TEXT_COLUMNS, format_func=TEXT_LABELS.get)
+    query = st.text_input("Search the answers:", help='Answers must contain every word; put a phrase in "quotes".')
+    answers = index.answer_mask(questions, get_filter_key())
+    matches = np.zeros_like(answers)
+    matches[index.search(query)] = True
+    matches &= answers
+    match_ids = np.flatnonzero(matches)
+    n_participants = len(np.unique(index.answer_rows[match_ids]))
+    st.write(f"{len(match_ids)} of {int(answers.sum())} answers from {n_participants} participants"
+             + (" match." if query.strip() else "."))
+
+    scope = f'answers matching "{query}"' if query.strip() else "all answers"
+    st.subheader("Most used words")
+    plot_figure('open_answers', 'ranking', [tuple(questions), query],
+                lambda: figures.term_ranking_chart(term_ranking(index, matches, TOP_TERMS), scope))
+
+    if query.strip():
+        st.subheader("Who writes this")
+        factor = st.selectbox("Break down by:", list(BREAKDOWN_FACTORS))
+        plot_figure('open_answers', 'breakdown', [tuple(questions), query, factor],
+                    lambda: figures.term_breakdown_chart(term_breakdown(index, answers, matches,
+                                                                        BREAKDOWN_FACTORS[factor]), query, factor))
+
+    st.subheader("Answers")
+    n_pages = max(-(-len(match_ids) // QUOTES_PER_PAGE), 1)
+    page = st.number_input(f"Page (of {n_pages}):", min_value=1, max_value=n_pages, value=1)
+    for answer in match_ids[(page - 1) * QUOTES_PER_PAGE:page * QUOTES_PER_PAGE]:
+        st.caption(TEXT_LABELS[TEXT_COLUMNS[index.answer_columns[answer]]])
+        st.markdown(f"> {escape_markdown(index.texts[answer].strip())}")
+
+    # Add an explanation for people without analytical background
+    st.markdown("""
+    ### What am I seeing?
+
+    These are the participants' own words from the four open questions of the survey.
+
+    1. **Search**: Type words to find answers containing all of them, or put words in "quotes" to find that exact phrase. Capitals and punctuation are ignored.
+    2. **Most used words**: How many answers use each word, leaving out common words like "the" or "and". With a search, it shows the words used in the matching answers.
+    3. **Who writes this**: Of the participants in each group who answered the selected questions, the share whose answers match the search.
+    4. **Answers**: The matching answers themselves, a page at a time.
+
+    The sidebar filters apply as well.
+    """)
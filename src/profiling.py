@@ -0,0 +1,162 @@
+import datetime
+import functools
+import io
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-rerun timing spans around data loading, aggregations, figure construction and chart rendering.
+# Spans are only recorded while a rerun is being profiled, so instrumented code costs next to nothing otherwise.
+
+# JSON-lines file every profiled rerun is appended to (DANCEFLOOR_PERF_LOG=path to enable)
+PERF_LOG = os.environ.get('DANCEFLOOR_PERF_LOG', '')
+
+# Streamlit runs every session's script in its own thread, so the current rerun is thread-local
+current = threading.local()
+log_lock = threading.Lock()
+
+
+class Rerun:
+    # Spans of one script run, in the order they started, with their nesting depth
+
+    def __init__(self, label, session=None):
+        self.label = label
+        self.session = session
+        self.started = time.time()
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+        self.total = None
+
+    def finish(self):
+        self.total = time.perf_counter() - self.origin
+
+    def to_records(self):
+        # Self time is a span's duration minus that of the spans directly inside it
+        records = [{'name': span['name'], 'depth': span['depth'], 'start_ms': span['start'] * 1000,
+                    'ms': span['seconds'] * 1000, 'self_ms': span['seconds'] * 1000, **span['attrs']}
+                   for span in self.spans]
+        stack = []
+        for record in records:
+            while stack and stack[-1]['depth'] >= record['depth']:
+                stack.pop()
+            if stack:
+                stack[-1]['self_ms'] -= record['ms']
+            stack.append(record)
+        return records
+
+    def to_json(self):
+        return {'time': datetime.datetime.fromtimestamp(self.started).isoformat(timespec='milliseconds'),
+                'session': self.session, 'page': self.label, 'total_ms': (self.total or 0) * 1000,
+                'spans': self.to_records()}
+
+
+def start_rerun(label, session=None):
+    current.rerun = Rerun(label, session)
+    return current.rerun
+
+
+def finish_rerun():
+    rerun = getattr(current, 'rerun', None)
+    current.rerun = None
+    if rerun is None:
+        return None
+    rerun.finish()
+    if PERF_LOG:
+        write_log(rerun, PERF_LOG)
+    return rerun
+
+
+def write_log(rerun, path):
+    line = json.dumps(rerun.to_json(), default=str)
+    with log_lock:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+# Time the block as a span of the current rerun. The yielded dict holds the span's attributes,
+# so the block can add to them (cache hit or miss, payload size, ...).
+@contextmanager
+def span(name, **attrs):
+    rerun = getattr(current, 'rerun', None)
+    if rerun is None:
+        yield attrs
+        return
+
+    record = {'name': name, 'depth': rerun.depth, 'attrs': attrs}
+    rerun.spans.append(record)
+    rerun.depth += 1
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        record['start'] = start - rerun.origin
+        record['seconds'] = time.perf_counter() - start
+        rerun.depth -= 1
+
+
+# Decorator recording every call of a function as a span named module.function
+def timed(func):
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+# cProfile statistics of a profile, as the binary file pstats and snakeviz read, plus a text summary
+def dump_profile(profile, top=25):
+    import marshal
+    import pstats
+
+    stats = pstats.Stats(profile)
+    text = io.StringIO()
+    stats.stream = text
+    stats.sort_stats('cumulative').print_stats(top)
+    return marshal.dumps(stats.stats), text.getvalue()
+
+
+# Opt-in sidebar switches, read before the page runs
+def render_profiling_controls():
+    import streamlit as st
+
+    panel = st.sidebar.checkbox("Show performance panel", key='debug:panel')
+    profile = panel and st.sidebar.checkbox("Capture a cProfile of each rerun", key='debug:cprofile')
+    return panel, profile
+
+
+def render_performance_panel(rerun, profile=None, cache_stats=None):
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander("Performance", expanded=True):
+        st.caption(f"Rerun of {rerun.label}: {rerun.total * 1000:.1f} ms")
+        records = rerun.to_records()
+        if records:
+            table = pd.DataFrame(records)
+            table['name'] = ['  ' * depth + name for depth, name in zip(table['depth'], table['name'])]
+            columns = ['name', 'ms', 'self_ms'] + [col for col in ('cache', 'bytes', 'rows') if col in table]
+            st.dataframe(table[columns].style.format(precision=1, na_rep=''), hide_index=True,
+                         use_container_width=True)
+
+            figures = [record for record in records if 'cache' in record]
+            if figures:
+                hits = sum(record['cache'] == 'hit' for record in figures)
+                payload = sum(record.get('bytes', 0) for record in figures)
+                st.caption(f"Figures this rerun: {hits}/{len(figures)} cache hits, "
+                           f"{payload / 1e3:.1f} kB of figure JSON")
+        if cache_stats:
+            lookups = cache_stats['hits'] + cache_stats['misses']
+            rate = cache_stats['hits'] / lookups if lookups else 0
+            st.caption(f"Figure cache since start: {rate:.0%} hit rate over {lookups} lookups")
+
+        if profile is not None:
+            data, summary = dump_profile(profile)
+            st.download_button("Download cProfile (.prof)", data, file_name=f'{rerun.label}.prof',
+                               mime='application/octet-stream')
+            st.code(summary, language=None)
@@ -0,0 +1,180 @@
+import argparse
+import html
+import os
+import time
+from multiprocessing import Pool
+
+from src.utils import DATA_PATH, COL_TALK_FREQUENCY, COL_TALK_DURATION, TEXT_COLUMNS, read_dataset, get_order
+from src.scoring import score_yapping_factor, frequency_map_variants, YAPPING_FACTOR
+from src import analytics, figures
+from src.impact_analysis import IMPACT_TYPES, BREAKDOWN_FACTORS
+from src.quiet_importance import DEMOGRAPHIC_FACTORS
+from src.yapping_factor import BREAKDOWN_VARIABLES, SENSITIVITY_WEIGHT_RANGE, SENSITIVITY_COPIES, \
+    SENSITIVITY_SPREAD
+from src.talking_factors import SLICE_FACTORS, COOCCURRENCE_MEASURES, describe_slice
+from src.associations import ASSOCIATION_ORDERS
+from src.text_index import TEXT_LABELS, TEXT_INDEX_COLUMNS, build_text_index, term_ranking
+from src.open_answers import TOP_TERMS
+from src.timeline import TIMELINE_COLUMNS, PERIODS, build_timeline, resample_timeline, rolling_timeline
+from src.trends import ROLLING_WINDOWS
+
+# Static HTML report with every chart of every page, under every radio/selectbox option, for the whole dataset.
+# Charts are rendered in parallel by worker processes that each hold the cube, and plotly.js is embedded once.
+
+# Figure for a chart, from the worker context and the chart's selections
+CHARTS = {
+    'age': lambda ctx: figures.age_chart(ctx['cube']),
+    'gender': lambda ctx: figures.gender_chart(ctx['cube']),
+    'attendance': lambda ctx: figures.attendance_chart(ctx['cube']),
+    'experience': lambda ctx: figures.experience_chart(ctx['cube']),
+    'roles': lambda ctx: figures.roles_chart(ctx['cube']),
+    'frequency': lambda ctx: figures.talk_frequency_chart(ctx['cube']),
+    'duration': lambda ctx: figures.talk_duration_chart(ctx['cube']),
+    'perception': lambda ctx: figures.talk_perception_chart(ctx['cube']),
+    'impact_pie': lambda ctx, impact_type: figures.impact_pie(ctx['cube'], IMPACT_TYPES[impact_type]),
+    'impact_heatmap': lambda ctx, impact_type: figures.impact_role_heatmap(ctx['cube'], impact_type,
+                                                                           IMPACT_TYPES[impact_type]),
+    'impact_breakdown': lambda ctx, factor, impact_type: figures.impact_breakdown_chart(
+        ctx['cube'], factor, BREAKDOWN_FACTORS[factor], impact_type, IMPACT_TYPES[impact_type]),
+    'quiet_heatmap': lambda ctx: figures.quiet_heatmap_chart(ctx['cube']),
+    'quiet_grouped': lambda ctx, factor: figures.likelihood_chart(ctx['cube'], factor, DEMOGRAPHIC_FACTORS[factor]),
+    'yapping_histogram': lambda ctx: figures.yapping_histogram_chart(analytics.yapping_histogram(ctx['scores'])),
+    'yapping_breakdown': lambda ctx, column: figures.yapping_breakdown_chart(ctx['cube'], column),
+    'yapping_sensitivity': lambda ctx, column: figures.sensitivity_chart(analytics.yapping_sensitivity(
+        ctx['cube'], column, SENSITIVITY_WEIGHT_RANGE, list(frequency_map_variants), SENSITIVITY_COPIES,
+        SENSITIVITY_SPREAD)[0], column),
+    'factor_prevalence': lambda ctx, factor, level: figures.factor_prevalence_chart(analytics.factor_prevalence(
+        ctx['cube'], SLICE_FACTORS[factor], None if level is None else [level]), describe_slice(factor, level)),
+    'factor_cooccurrence': lambda ctx, factor, level, measure: figures.factor_cooccurrence_chart(
+        analytics.factor_cooccurrence(ctx['cube'], SLICE_FACTORS[factor], None if level is None else [level],
+                                      COOCCURRENCE_MEASURES[measure]), measure, describe_slice(factor, level)),
+    'association_matrix': lambda ctx, order: figures.association_heatmap(analytics.association_matrix(
+        analytics.pairwise_association(ctx['contingency']), ASSOCIATION_ORDERS[order]), order),
+    'term_ranking': lambda ctx, questions: figures.term_ranking_chart(term_ranking(
+        ctx['text_index'], ctx['text_index'].answer_mask(questions), TOP_TERMS), "all answers"),
+    'trend_responses': lambda ctx, period: figures.responses_chart(resample_timeline(ctx['timeline'], period), period),
+    'trend_resampled': lambda ctx, period: figures.trend_chart(resample_timeline(ctx['timeline'], period), period),
+    'trend_rolling': lambda ctx, window: figures.rolling_trend_chart(rolling_timeline(ctx['timeline'],
+                                                                                      ROLLING_WINDOWS[window]), window),
+}
+
+
+# Every (page, heading, chart, selections) the dashboard can show, in page order
+def enumerate_tasks():
+    tasks = [
+        ("Demographics", "Age Distribution", 'age', ()),
+        ("Demographics", "Gender Distribution", 'gender', ()),
+        ("Demographics", "Attendance Frequency", 'attendance', ()),
+        ("Demographics", "Years of Experience", 'experience', ()),
+        ("Demographics", "Roles in Rave Scene", 'roles', ()),
+        ("Talking Behavior", "Conversation Frequency", 'frequency', ()),
+        ("Talking Behavior", "Conversation Duration", 'duration', ()),
+        ("Talking Behavior", "Perception of Talking on Dancefloor", 'perception', ()),
+    ]
+    tasks += [("Impact Analysis", f"Impact on {impact_type}", 'impact_pie', (impact_type,))
+              for impact_type in IMPACT_TYPES]
+    tasks += [("Impact Analysis", f"Impact on {impact_type} by Role", 'impact_heatmap', (impact_type,))
+              for impact_type in IMPACT_TYPES]
+    tasks += [("Impact Analysis", f"Impact on {impact_type} by {factor}", 'impact_breakdown', (factor, impact_type))
+              for factor in BREAKDOWN_FACTORS for impact_type in IMPACT_TYPES]
+    tasks.append(("Quiet Importance", "Quiet Environment Importance vs Intervention Likelihood", 'quiet_heatmap', ()))
+    tasks += [("Quiet Importance", f"Intervention Likelihood by Quiet Environment Importance and {factor}",
+               'quiet_grouped', (factor,)) for factor in DEMOGRAPHIC_FACTORS]
+    tasks.append(("Yapping Factor", "Distribution of Yapping Factor", 'yapping_histogram', ()))
+    columns = [column for options in BREAKDOWN_VARIABLES.values() for column in options]
+    tasks += [("Yapping Factor", f"Yapping Factor by {column}", 'yapping_breakdown', (column,)) for column in columns]
+    tasks += [("Yapping Factor", f"Yapping Factor sensitivity by {column}", 'yapping_sensitivity', (column,))
+              for column in columns]
+    slices = [(factor, level) for factor, column in SLICE_FACTORS.items()
+              for level in ([None] if column is None else get_order(column))]
+    for factor, level in slices:
+        tasks.append(("Talking Factors", f"Factor prevalence ({describe_slice(factor, level)})", 'factor_prevalence',
+                      (factor, level)))
+        tasks += [("Talking Factors", f"Factor co-occurrence, {measure} ({describe_slice(factor, level)})",
+                   'factor_cooccurrence', (factor, level, measure)) for measure in COOCCURRENCE_MEASURES]
+    tasks += [("Associations", f"Association matrix ({order})", 'association_matrix', (order,))
+              for order in ASSOCIATION_ORDERS]
+    tasks.append(("Open Answers", "Most used words", 'term_ranking', (TEXT_COLUMNS,)))
+    tasks += [("Open Answers", f"Most used words ({TEXT_LABELS[col]})", 'term_ranking', ([col],))
+              for col in TEXT_COLUMNS]
+    for period in PERIODS:
+        tasks += [("Trends Over Time", f"Responses per {period.lower()}", 'trend_responses', (period,)),
+                  ("Trends Over Time", f"Trends by {period.lower()}", 'trend_resampled', (period,))]
+    tasks += [("Trends Over Time", f"Rolling average over the last {window}", 'trend_rolling', (window,))
+              for window in ROLLING_WINDOWS]
+    return tasks
+
+
+# Cube, per-respondent scores, pair counts, text index and timeline of the whole dataset, built once per process
+context = None
+
+
+def load_context(path=DATA_PATH):
+    df = read_dataset(path, [COL_TALK_FREQUENCY, COL_TALK_DURATION])
+    return {'cube': analytics.build_dataset_cube(path),
+            'scores': score_yapping_factor(df[COL_TALK_FREQUENCY], df[COL_TALK_DURATION]),
+            'contingency': analytics.build_dataset_contingency(path),
+            'text_index': build_text_index(read_dataset(path, TEXT_INDEX_COLUMNS)),
+            'timeline': build_timeline(read_dataset(path, TIMELINE_COLUMNS))}
+
+
+def init_worker(path):
+    # Forked workers inherit the parent's context, spawned ones build their own
+    global context
+    if context is None:
+        context = load_context(path)
+
+
+def render_chart(task):
+    index, (page, heading, chart, selections) = task
+    fig = CHARTS[chart](context, *selections)
+    return fig.to_html(full_html=False, include_plotlyjs=False, div_id=f'chart-{index}')
+
+
+def render_charts(tasks, workers, path=DATA_PATH):
+    global context
+    context = load_context(path)
+    if workers == 1:
+        return [render_chart(task) for task in enumerate(tasks)]
+
+    # Charts differ a lot in cost, so they are handed out one at a time
+    with Pool(workers, initializer=init_worker, initargs=(path,)) as pool:
+        return pool.map(render_chart, enumerate(tasks), chunksize=1)
+
+
+def build_html(tasks, charts, title="Rave Data Analysis Report"):
+    from plotly.offline import get_plotlyjs
+
+    parts = ['<!DOCTYPE html>', '<html>', '<head>', '<meta charset="utf-8">', f'<title>{html.escape(title)}</title>',
+             f'<script type="text/javascript">{get_plotlyjs()}</script>', '</head>', '<body>',
+             f'<h1>{html.escape(title)}</h1>']
+    page = None
+    for (task_page, heading, _, _), chart in zip(tasks, charts):
+        if task_page != page:
+            page = task_page
+            parts.append(f'<h2>{html.escape(page)}</h2>')
+        parts += [f'<h3>{html.escape(heading)}</h3>', chart]
+    parts += ['</body>', '</html>']
+    return '\n'.join(parts)
+
+
+def write_report(output, workers, path=DATA_PATH):
+    tasks = enumerate_tasks()
+    charts = render_charts(tasks, workers, path)
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(build_html(tasks, charts))
+    return len(tasks)
+
+
+# Usage: python -m src.report [--output report.html] [--workers N]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render every dashboard chart under every option into one HTML file.")
+    parser.add_argument('--output', default='report.html', help="HTML file to write")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (1 renders in-process)")
+    parser.add_argument('--data', default=DATA_PATH, help="survey CSV to report on")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    n_charts = write_report(args.output, args.workers, args.data)
+    print(f"Wrote {n_charts} charts to {args.output} with {args.workers} worker(s) "
+          f"in {time.perf_counter() - start:.2f} s")
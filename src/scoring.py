@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from src.utils import TALK_FREQUENCY, TALK_DURATION
+from src.aggregations import get_codes
+
+YAPPING_FACTOR = 'YAPPING_FACTOR'
+
+# Mapping for scores
+frequency_map = {'Never': 0, 'Rarely': 1, 'Sometimes': 2, 'Often': 4, 'Always': 6}
+duration_map = {'Just a few words': 1, '1-5 minutes': 3, '>5 minutes': 5}
+
+# Weights for frequency and duration
+frequency_weight = 0.7
+duration_weight = 0.3
+
+# Alternative score mappings explored by the sensitivity analysis
+frequency_map_variants = {
+    'Default': frequency_map,
+    'Linear': {'Never': 0, 'Rarely': 1, 'Sometimes': 2, 'Often': 3, 'Always': 4},
+    'Steep': {'Never': 0, 'Rarely': 1, 'Sometimes': 3, 'Often': 6, 'Always': 10},
+}
+duration_map_variants = {
+    'Default': duration_map,
+    'Linear': {'Just a few words': 1, '1-5 minutes': 2, '>5 minutes': 3},
+    'Steep': {'Just a few words': 1, '1-5 minutes': 4, '>5 minutes': 10},
+}
+
+def get_score_matrix(maps, levels):
+    # One row of scores per mapping, columns in the order of levels
+    return np.array([[m[level] for level in levels] if isinstance(m, dict) else m for m in maps], dtype=float)
+
+def build_score_tables(frequency_scores, duration_scores, frequency_weights, duration_weights):
+    # Normalized frequency x duration score table for every variant at once, shape (variants, 5, 3)
+    frequency_weights = np.asarray(frequency_weights, dtype=float)
+    duration_weights = np.asarray(duration_weights, dtype=float)
+    max_factor = (frequency_scores.max(axis=1) * frequency_weights) + (duration_scores.max(axis=1) * duration_weights)
+
+    tables = (frequency_scores[:, :, None] * frequency_weights[:, None, None]) + \
+             (duration_scores[:, None, :] * duration_weights[:, None, None])
+    tables[:, TALK_FREQUENCY.index('Never'), :] = 0
+    return (tables / max_factor[:, None, None]) * 100
+
+def build_score_table(frequency_map, duration_map, frequency_weight, duration_weight):
+    # Normalized score for every frequency x duration combination, rows/columns in TALK_FREQUENCY/TALK_DURATION order
+    table = build_score_tables(get_score_matrix([frequency_map], TALK_FREQUENCY),
+                               get_score_matrix([duration_map], TALK_DURATION),
+                               [frequency_weight], [duration_weight])[0]
+
+    # Pad with a NaN row and column so the -1 code of missing/unknown answers looks up NaN
+    return np.pad(table, ((0, 1), (0, 1)), constant_values=np.nan)
+
+def build_variant_grid(frequency_weights, frequency_maps, duration_maps):
+    # Cartesian product of frequency weights and score mappings; the duration weight is 1 - frequency weight
+    frequency_weights = np.asarray(frequency_weights, dtype=float)
+    frequency_scores = get_score_matrix(frequency_maps, TALK_FREQUENCY)
+    duration_scores = get_score_matrix(duration_maps, TALK_DURATION)
+
+    w, f, d = np.meshgrid(np.arange(len(frequency_weights)), np.arange(len(frequency_scores)),
+                          np.arange(len(duration_scores)), indexing='ij')
+    w, f, d = w.ravel(), f.ravel(), d.ravel()
+    return build_score_tables(frequency_scores[f], duration_scores[d], frequency_weights[w], 1 - frequency_weights[w])
+
+def perturb_maps(maps, levels, copies, spread, seed=0):
+    # Add randomly jittered copies of each mapping, every score scaled by up to +/- spread
+    scores = get_score_matrix(maps, levels)
+    rng = np.random.default_rng(seed)
+    noise = rng.uniform(1 - spread, 1 + spread, size=(copies, *scores.shape))
+    return np.concatenate([scores, (scores[None] * noise).reshape(-1, len(levels))])
+
+# Precomputed 5x3 score table for the default maps and weights
+score_table = build_score_table(frequency_map, duration_map, frequency_weight, duration_weight)
+
+def score_yapping_factor(frequency, duration, table=score_table):
+    # Score whole columns at once by indexing the table with categorical codes
+    return table[get_codes(frequency, TALK_FREQUENCY), get_codes(duration, TALK_DURATION)]
+
+def sensitivity_sweep(frequency, duration, groups, tables):
+    # Mean score per group for every variant, shape (variants, groups)
+    # Respondents are reduced to group x frequency x duration cell counts once, so each variant costs
+    # a single contraction with its score table instead of a pass over the rows
+    groups = groups if isinstance(groups.dtype, pd.CategoricalDtype) else pd.Series(pd.Categorical(groups))
+    categories = groups.cat.categories
+    g = groups.cat.codes.to_numpy().astype(np.int64)
+    f = get_codes(frequency, TALK_FREQUENCY).astype(np.int64)
+    d = get_codes(duration, TALK_DURATION).astype(np.int64)
+
+    valid = (g >= 0) & (f >= 0) & (d >= 0)
+    cells = np.bincount(((g * len(TALK_FREQUENCY) + f) * len(TALK_DURATION) + d)[valid],
+                        minlength=len(categories) * len(TALK_FREQUENCY) * len(TALK_DURATION))
+    cells = cells.reshape(len(categories), len(TALK_FREQUENCY), len(TALK_DURATION))
+    return pd.DataFrame(sweep_cells(cells, tables), columns=categories)
+
+def sweep_cells(cells, tables):
+    # Mean score per group for every variant from group x frequency x duration counts
+    cells = np.asarray(cells, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.einsum('gfd,vfd->vg', cells, tables) / cells.sum(axis=(1, 2))
+
+def summarize_sensitivity(means, baseline):
+    # How each group's mean score and rank (1 = biggest yappers) move across the variant grid
+    ranks = means.rank(axis=1, ascending=False, method='min')
+    baseline_rank = baseline.rank(ascending=False, method='min')
+    return pd.DataFrame({
+        'Baseline mean': baseline,
+        'Min mean': means.min(),
+        'Max mean': means.max(),
+        'Std of mean': means.std(),
+        'Baseline rank': baseline_rank,
+        'Best rank': ranks.min(),
+        'Worst rank': ranks.max(),
+        'Rank unchanged (%)': ranks.eq(baseline_rank).mean() * 100,
+    })
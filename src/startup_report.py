@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+# Imported by main.py before any page renders
+BASE_IMPORTS = ['streamlit', 'src.filters', 'src.figure_cache', 'src.validation', 'src.profiling', 'src.ingest']
+
+# Imported when a page is selected
+PAGE_MODULES = ['src.home', 'src.demographics', 'src.talking_behaviour', 'src.impact_analysis',
+                'src.quiet_importance', 'src.yapping_factor', 'src.talking_factors', 'src.associations',
+                'src.open_answers', 'src.trends']
+
+# Imported lazily inside app() the first time a chart is drawn
+DEFERRED_IMPORTS = ['src.figures']
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(code, *flags):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *flags, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stderr
+
+
+# Best-of-n wall time of a bare interpreter start
+def measure_interpreter(runs=5):
+    return min(run_python('pass')[0] for _ in range(runs))
+
+
+# Per-module (self, cumulative) import time in seconds, as reported by python -X importtime
+def measure_imports(modules, already_imported=()):
+    code = ''.join(f'import {module}\n' for module in already_imported)
+    code += 'import sys; sys.stderr.write("--- start ---\\n")\n'
+    code += ''.join(f'import {module}\n' for module in modules)
+    _, stderr = run_python(code, '-X', 'importtime')
+
+    entries = []
+    for line in stderr.split('--- start ---\n', 1)[-1].splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append({'module': name.strip(), 'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+                        'self': int(self_us) / 1e6, 'cumulative': int(cumulative_us) / 1e6})
+    return entries
+
+
+def summarize(entries):
+    # Self time rolled up per top-level package, plus the total
+    packages = defaultdict(float)
+    for entry in entries:
+        packages[entry['module'].split('.')[0]] += entry['self']
+    return {'total': sum(packages.values()),
+            'packages': dict(sorted(packages.items(), key=lambda item: item[1], reverse=True))}
+
+
+def build_report():
+    base = measure_imports(BASE_IMPORTS)
+    return {
+        'interpreter': measure_interpreter(),
+        'base': summarize(base),
+        'pages': {module: summarize(measure_imports([module], BASE_IMPORTS)) for module in PAGE_MODULES},
+        'deferred': summarize(measure_imports(DEFERRED_IMPORTS, BASE_IMPORTS)),
+    }
+
+
+def print_report(report, top=10):
+    print(f"Interpreter startup: {report['interpreter'] * 1000:8.1f} ms")
+    print(f"Base imports ({', '.join(BASE_IMPORTS)}): {report['base']['total'] * 1000:8.1f} ms")
+    for package, seconds in list(report['base']['packages'].items())[:top]:
+        print(f"    {package:<30}{seconds * 1000:8.1f} ms")
+
+    print("Page modules (on top of the base imports):")
+    for module, summary in report['pages'].items():
+        print(f"    {module:<30}{summary['total'] * 1000:8.1f} ms")
+
+    print(f"Deferred imports ({', '.join(DEFERRED_IMPORTS)}): {report['deferred']['total'] * 1000:8.1f} ms")
+    for package, seconds in list(report['deferred']['packages'].items())[:top]:
+        print(f"    {package:<30}{seconds * 1000:8.1f} ms")
+
+
+# Usage: python -m src.startup_report [--json]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Break dashboard startup time down per module.")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--top', type=int, default=10, help="number of packages listed per section")
+    args = parser.parse_args()
+
+    report = build_report()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.top)
@@ -0,0 +1,81 @@
+import numpy as np
+import streamlit as st
+from src.utils import DATA_PATH, CHUNK_ROWS, COL_TALK_FREQUENCY, COL_TALK_DURATION, read_validated_csv, \
+    read_validated_csv_chunks, get_dataset_version
+from src.scoring import score_yapping_factor
+from src.analytics import score_counts
+from src.cube import build_cube, CUBE_COLUMNS
+from src.filters import INDEX_COLUMNS, get_filter_key, select_rows
+from src.contingency import ASSOCIATION_COLUMNS, build_contingency
+from src.validation import write_quarantine
+from src.profiling import span
+
+# Out-of-core aggregation (DANCEFLOOR_STREAMING=1). The export is read in fixed-size chunks typed by the schema
+# registry, every chunk is reduced to partial aggregates, and only the merged partials are kept, so memory
+# depends on the chunk size and not on the length of the export.
+
+# Columns the partials are computed from: the cube's, the associated questions' and the ones the sidebar
+# filters select on
+STREAM_COLUMNS = list(dict.fromkeys(CUBE_COLUMNS + ASSOCIATION_COLUMNS + INDEX_COLUMNS))
+
+
+class StreamedAggregates:
+    # Everything the pages read for one filter selection: the cube's counts and sums (including the role and
+    # talking factor co-occurrence tables), the respondents per distinct Yapping Factor score and the pair counts
+    # of all associated questions. Partials of disjoint sets of rows merge into the partials of their union.
+    # The unfiltered pass also carries the summary of the rows rejected by validation (see src.validation).
+
+    def __init__(self, cube, score_counts, contingency, rejected=None):
+        self.cube = cube
+        self.score_counts = score_counts
+        self.contingency = contingency
+        self.rejected = rejected
+
+    @property
+    def n_rows(self):
+        return int(self.cube.total())
+
+    def merge(self, other):
+        return StreamedAggregates(self.cube.merge(other.cube),
+                                  self.score_counts.add(other.score_counts, fill_value=0).astype(np.int64),
+                                  self.contingency.merge(other.contingency))
+
+
+def aggregate_rows(df):
+    scores = score_yapping_factor(df[COL_TALK_FREQUENCY], df[COL_TALK_DURATION])
+    return StreamedAggregates(build_cube(df), score_counts(scores), build_contingency(df))
+
+
+def stream_aggregates(path=DATA_PATH, filter_key=(), chunk_rows=CHUNK_ROWS):
+    # Rejections do not depend on the filters, so only the unfiltered pass collects them. It reads every column,
+    # as the quarantine file lists the rejected rows as written.
+    columns = STREAM_COLUMNS if filter_key else None
+    aggregates, rejections = None, None
+    for chunk, partial_rejections in read_validated_csv_chunks(path, columns, chunk_rows):
+        if filter_key:
+            chunk = chunk[select_rows(chunk, filter_key)]
+        else:
+            rejections = partial_rejections if rejections is None else rejections.merge(partial_rejections)
+        partial = aggregate_rows(chunk)
+        aggregates = partial if aggregates is None else aggregates.merge(partial)
+
+    # An export without responses yields no chunks
+    if aggregates is None:
+        df, rejections = read_validated_csv(path, columns)
+        aggregates = aggregate_rows(df)
+    if not filter_key:
+        write_quarantine(rejections, path)
+        aggregates.rejected = rejections.summary()
+    return aggregates
+
+
+# One pass over the export per dataset version and filter selection
+@st.cache_resource(max_entries=16)
+def load_streamed_aggregates(filter_key, version):
+    return stream_aggregates(DATA_PATH, filter_key)
+
+
+def get_streamed_aggregates(filter_key=None):
+    filter_key = get_filter_key() if filter_key is None else filter_key
+    with span('stream_aggregates'):
+        return load_streamed_aggregates(filter_key, get_dataset_version())
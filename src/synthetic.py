@@ -0,0 +1,152 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from src.utils import COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE, COL_PRIMARY_ROLE, COL_TALK_FREQUENCY, \
+    COL_TALK_REASON, COL_TALK_DURATION, COL_TALK_PERCEPTION, COL_COVID_CHANGE, COL_TALKING_FACTORS, \
+    COL_QUIET_IMPORTANCE, COL_LIKELIHOOD_INTERVENE, COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ, COL_IMPACT_ATMOSPHERE, \
+    COL_TIMESTAMP, COL_ADDRESS_TALKING, COL_TIME_OF_NIGHT, COL_OWN_CHANGE, COL_ANYTHING_ELSE, COL_NUMBER_OF_ROLES, \
+    AGE_ORDER, GENDER_ORDER, ATTENDANCE_ORDER, EXPERIENCE_ORDER, ROLES, ROLE_COLUMNS, TALK_FREQUENCY, TALK_REASON, \
+    TALK_DURATION, TALK_PERCEPTION, COVID_CHANGE, TALKING_FACTORS, IMPACT_EXPERIENCE, IMPACT_DJ, IMPACT_ATMOSPHERE, \
+    LIKERT_LEVELS, EXPORT_HEADERS, make_temp_file
+
+# Seeded synthetic survey responses in the layout of data/Dancefloor_taliking.csv, at any number of rows.
+# Answers are drawn independently per column with shares close to the real survey, so every page has
+# data in every level; they are not meant to reproduce the correlations of the real answers.
+
+COL_TALKING_FACTORS_EXPORT = EXPORT_HEADERS[COL_TALKING_FACTORS]
+COL_CATEGORIZED_ROLES = 'Categorized_Roles'
+
+# Share of each level (same order as utils), then the share of unanswered rows
+ANSWER_WEIGHTS = {
+    COL_AGE: (AGE_ORDER, [0.25, 0.61, 0.14], 0.0),
+    COL_GENDER: (GENDER_ORDER, [0.65, 0.28, 0.04, 0.03], 0.0),
+    COL_ATTENDANCE: (ATTENDANCE_ORDER, [0.38, 0.47, 0.15], 0.0),
+    COL_EXPERIENCE: (EXPERIENCE_ORDER, [0.39, 0.27, 0.34], 0.0),
+    COL_TALK_FREQUENCY: (TALK_FREQUENCY, [0.05, 0.47, 0.39, 0.07, 0.02], 0.0),
+    COL_TALK_REASON: (TALK_REASON, [0.19, 0.2, 0.5, 0.11], 0.0),
+    COL_TALK_DURATION: (TALK_DURATION, [0.73, 0.24, 0.03], 0.0),
+    COL_TALK_PERCEPTION: (TALK_PERCEPTION, [0.06, 0.17, 0.11, 0.55, 0.11], 0.0),
+    COL_COVID_CHANGE: (COVID_CHANGE, [0.25, 0.04, 0.18, 0.53], 0.04),
+    COL_QUIET_IMPORTANCE: (LIKERT_LEVELS, [0.04, 0.08, 0.22, 0.48, 0.18], 0.0),
+    COL_LIKELIHOOD_INTERVENE: (LIKERT_LEVELS, [0.38, 0.27, 0.15, 0.13, 0.07], 0.0),
+    COL_IMPACT_EXPERIENCE: (IMPACT_EXPERIENCE, [0.08, 0.72, 0.2], 0.01),
+    COL_IMPACT_DJ: (IMPACT_DJ, [0.03, 0.6, 0.37], 0.02),
+    COL_IMPACT_ATMOSPHERE: (IMPACT_ATMOSPHERE, [0.07, 0.82, 0.11], 0.01),
+}
+
+# Chance that each talking factor is ticked
+FACTOR_RATES = [0.6, 0.55, 0.15, 0.45, 0.4]
+
+# Chance of each role; every respondent in the survey is an attendee
+ROLE_RATES = [1.0, 0.13, 0.03, 0.14, 0.07, 0.06]
+
+# Free-text answers are drawn from a few typical replies, with the share left empty
+TEXT_ANSWERS = {
+    COL_ADDRESS_TALKING: (["Dedicated places for talking", "Signs at the entrance", "Awareness team",
+                           "Ask people politely to move to the side", "Phone-free and talk-free policy"], 0.32),
+    COL_TIME_OF_NIGHT: (["More talking early in the night", "More talking at the end of the night",
+                         "Less talking during peak time", "No difference"], 0.4),
+    COL_OWN_CHANGE: (["No", "Yes, I talk less than I used to", "Yes, I talk more since I know more people"], 0.39),
+    COL_ANYTHING_ELSE: (["Respect the music and the DJ", "Take conversations off the dancefloor",
+                         "Talking is part of the fun"], 0.63),
+}
+
+# Responses are spread over the four weeks the survey was open, whatever their number
+START_TIME = pd.Timestamp('2024-07-23 23:56:53')
+SURVEY_SECONDS = 28 * 24 * 3600
+
+CSV_COLUMNS = ['', COL_TIMESTAMP, COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE, COL_PRIMARY_ROLE,
+               COL_TALK_FREQUENCY, COL_TALK_REASON, COL_TALK_DURATION, COL_TALK_PERCEPTION, COL_COVID_CHANGE,
+               COL_TALKING_FACTORS_EXPORT, COL_QUIET_IMPORTANCE, COL_LIKELIHOOD_INTERVENE, COL_IMPACT_EXPERIENCE,
+               COL_IMPACT_DJ, COL_IMPACT_ATMOSPHERE, COL_ADDRESS_TALKING, COL_TIME_OF_NIGHT, COL_OWN_CHANGE,
+               COL_ANYTHING_ELSE, COL_CATEGORIZED_ROLES] + ROLE_COLUMNS + [COL_NUMBER_OF_ROLES]
+
+
+def draw_answers(rng, n_rows, levels, weights, missing):
+    # Codes into levels, -1 for unanswered
+    p = np.append(np.asarray(weights) / sum(weights) * (1 - missing), missing)
+    codes = rng.choice(len(levels) + 1, size=n_rows, p=p)
+    codes[codes == len(levels)] = -1
+    return pd.Categorical.from_codes(codes, categories=levels)
+
+
+# Every subset of options as one category, comma-joined in option order, indexed by its bitmask
+def draw_multi_select(rng, n_rows, options, rates, separator):
+    flags = rng.random((n_rows, len(options))) < np.asarray(rates)
+    masks = flags @ (1 << np.arange(len(options)))
+    subsets = [[option for bit, option in enumerate(options) if mask >> bit & 1] for mask in range(1 << len(options))]
+    return flags, masks, [separator.join(subset) for subset in subsets]
+
+
+def format_timestamps(seconds):
+    # Seconds since START_TIME in the export's format, e.g. 7/24/2024 0:11:06 (no zero padding on month, day
+    # and hour). Days and times of day are formatted once each and looked up, which is far faster than strftime.
+    days, time_of_day = np.divmod(seconds + (START_TIME - START_TIME.normalize()).seconds, 86400)
+    dates = START_TIME.normalize() + pd.to_timedelta(np.arange(days.max() + 1), unit='D')
+    date_labels = np.array([f'{d.month}/{d.day}/{d.year} ' for d in dates], dtype=object)
+    hours, rest = np.divmod(np.arange(86400), 3600)
+    time_labels = np.array([f'{h}:{r // 60:02d}:{r % 60:02d}' for h, r in zip(hours, rest)], dtype=object)
+    return date_labels[days] + time_labels[time_of_day]
+
+
+# Rows start..start+n_rows of a survey with total responses (n_rows when not given)
+def generate_survey(n_rows, seed=0, start=0, total=None):
+    rng = np.random.default_rng(seed)
+    rows = np.arange(start, start + n_rows)
+    columns = {'': rows}
+
+    # Row i lands in the i-th equal slice of the survey window, so timestamps never decrease
+    offsets = (rows + rng.random(n_rows)) * (SURVEY_SECONDS / (total or n_rows))
+    columns[COL_TIMESTAMP] = format_timestamps(offsets.astype(np.int64))
+
+    for col, (levels, weights, missing) in ANSWER_WEIGHTS.items():
+        columns[col] = draw_answers(rng, n_rows, levels, weights, missing)
+
+    _, factor_masks, factor_labels = draw_multi_select(rng, n_rows, TALKING_FACTORS, FACTOR_RATES, ', ')
+    # Nobody in the survey left the factors empty; an empty pick counts as the first factor alone
+    factor_masks[factor_masks == 0] = 1
+    columns[COL_TALKING_FACTORS_EXPORT] = pd.Categorical.from_codes(factor_masks, categories=factor_labels)
+
+    role_flags, role_masks, role_labels = draw_multi_select(rng, n_rows, ROLES, ROLE_RATES, ', ')
+    columns[COL_PRIMARY_ROLE] = pd.Categorical.from_codes(role_masks, categories=role_labels)
+    categorized = [str(subset.split(', ')) if subset else '[]' for subset in role_labels]
+    columns[COL_CATEGORIZED_ROLES] = pd.Categorical.from_codes(role_masks, categories=categorized)
+    for col, flags in zip(ROLE_COLUMNS, role_flags.T):
+        columns[col] = flags.astype(np.int8)
+    columns[COL_NUMBER_OF_ROLES] = role_flags.sum(axis=1).astype(np.int8)
+
+    for col, (answers, missing) in TEXT_ANSWERS.items():
+        columns[col] = draw_answers(rng, n_rows, answers, [1] * len(answers), missing)
+
+    return pd.DataFrame(columns)[CSV_COLUMNS]
+
+
+# Write n_rows synthetic responses to a CSV, a chunk at a time so memory stays flat at any size.
+# The same seed and chunk size always give the same file.
+def write_survey(path, n_rows, seed=0, chunk_rows=10**6):
+    seeds = np.random.SeedSequence(seed).spawn(max(-(-n_rows // chunk_rows), 1))
+    tmp_path = make_temp_file(path)
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            for i, chunk_seed in enumerate(seeds):
+                start = i * chunk_rows
+                chunk = generate_survey(min(chunk_rows, n_rows - start), chunk_seed, start, n_rows)
+                chunk.to_csv(f, index=False, header=i == 0)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+# Usage: python -m src.synthetic --rows 100000 [--seed 0] [--output data/synthetic.csv]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write seeded synthetic survey responses in the dataset layout.")
+    parser.add_argument('--rows', type=int, required=True, help="number of responses")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--output', help="CSV to write (default data/synthetic_<rows>.csv)")
+    args = parser.parse_args()
+
+    print(write_survey(args.output or os.path.join('data', f'synthetic_{args.rows}.csv'), args.rows, args.seed))
@@ -0,0 +1,69 @@
+import streamlit as st
+from src.utils import COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE, get_order
+from src import analytics
+from src.cube import load_cube
+from src.figure_cache import plot_figure
+
+# Demographic slices in the order the selectbox lists them, with the column behind each
+SLICE_FACTORS = {
+    "All participants": None,
+    "Age": COL_AGE,
+    "Gender": COL_GENDER,
+    "Attendance Frequency": COL_ATTENDANCE,
+    "Experience": COL_EXPERIENCE
+}
+
+# How the co-occurrence matrix is shown, with the normalization behind each
+COOCCURRENCE_MEASURES = {
+    "Respondents": None,
+    "Share of respondents (%)": 'respondents',
+    "Share of the row factor's respondents (%)": 'row'
+}
+
+def describe_slice(slice_factor, slice_level):
+    return "all participants" if slice_level is None else f"{slice_factor}: {slice_level}"
+
+def app():
+    from src import figures
+
+    st.header("Factors Behind Increased Talking")
+    cube = load_cube()
+
+    # Demographic slice
+    slice_factor = st.selectbox("Slice by:", list(SLICE_FACTORS))
+    slice_column = SLICE_FACTORS[slice_factor]
+    slice_level = None
+    if slice_column is not None:
+        slice_level = st.radio(f"Select {slice_factor.lower()}:", get_order(slice_column), horizontal=True)
+    slice_label = describe_slice(slice_factor, slice_level)
+    levels = None if slice_level is None else [slice_level]
+
+    prevalence = analytics.factor_prevalence(cube, slice_column, levels)
+    answered = analytics.factor_pattern_counts(cube, slice_column, levels).sum()
+    st.write(f"{answered} participants in this slice answered the question.")
+
+    st.subheader("How often each factor is named")
+    plot_figure('talking_factors', 'prevalence', [slice_factor, slice_level],
+                lambda: figures.factor_prevalence_chart(prevalence, slice_label))
+
+    st.subheader("Which factors are named together")
+    measure = st.radio("Show co-occurrence as:", list(COOCCURRENCE_MEASURES), horizontal=True)
+    plot_figure('talking_factors', 'cooccurrence', [slice_factor, slice_level, measure],
+                lambda: figures.factor_cooccurrence_chart(
+                    analytics.factor_cooccurrence(cube, slice_column, levels, COOCCURRENCE_MEASURES[measure]),
+                    measure, slice_label))
+
+    # Add an explanation for people without analytical background
+    st.markdown("""
+    ### What am I seeing?
+
+    Participants could tick several factors they think contribute to increased talking on the dancefloor.
+
+    1. **Prevalence**: The share of participants who named each factor. Shares add up to more than 100% because participants could pick more than one.
+    2. **Co-occurrence**: Every cell counts the participants who named both the row factor and the column factor; the diagonal is the number who named the factor at all.
+       - *Share of respondents* divides by everyone in the slice who answered.
+       - *Share of the row factor's respondents* reads as "of those who named the row factor, how many also named the column factor".
+    3. **Slice by**: Restrict both charts to one age group, gender, attendance frequency or experience level. The sidebar filters apply as well.
+
+    Free-text answers that match none of the listed factors count as answered, without any factor.
+    """)
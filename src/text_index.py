@@ -0,0 +1,278 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from src.utils import DATA_PATH, INCREMENTAL, STREAMING, CHUNK_ROWS, COL_ADDRESS_TALKING, COL_TIME_OF_NIGHT, \
+    COL_OWN_CHANGE, COL_ANYTHING_ELSE, TEXT_COLUMNS, load_data, read_csv, read_csv_chunks, get_dataset_version
+from src.aggregations import get_codes
+from src.filters import INDEX_COLUMNS, select_rows
+from src.ingest import IncrementalCache
+from src.profiling import span
+
+# Short names of the free-text questions
+TEXT_LABELS = {
+    COL_ADDRESS_TALKING: "Best way to address excessive talking",
+    COL_TIME_OF_NIGHT: "Differences by time of night",
+    COL_OWN_CHANGE: "Change in own talking",
+    COL_ANYTHING_ELSE: "Anything else",
+}
+
+# Columns the index keeps besides the answers, for the sidebar filters and the per-term breakdowns
+TEXT_INDEX_COLUMNS = TEXT_COLUMNS + INDEX_COLUMNS
+
+# A term is a run of letters and digits, with inner apostrophes (don't, dj's)
+TOKEN_PATTERN = r"[^\W_]+(?:'[^\W_]+)*"
+
+# Token id written after every answer, so no phrase matches across two answers
+SEPARATOR = -1
+
+# Filter selections whose matching rows every index keeps, least recently used dropped first
+MASK_CACHE_ENTRIES = 16
+
+# Words left out of the term rankings (they can still be searched for)
+STOPWORDS = frozenset("""
+a about after all also am an and any are as at be because been before being but by can could did do does doing
+don't during each even for from get got had has have having he her here him his how i i'm if in into is it it's
+its just like me more most much my no not now of on one only or other our out over really so some such than
+that the their them then there these they this those through to too up us very was we were what when where
+which while who why will with would yes you your
+""".split())
+
+
+class TextIndex:
+    # Free-text answers tokenized once. Every non-empty answer gets an id (by row, then question); the term ids of
+    # its tokens are stored one after another in tokens, each answer followed by SEPARATOR, and every term keeps
+    # the sorted positions it occurs at (postings) and the sorted ids of the answers it occurs in. Searches,
+    # rankings and breakdowns only read these integer arrays; the strings are read to show quotes.
+
+    def __init__(self, terms, tokens, answer_starts, posting_offsets, postings, answer_rows, answer_columns, texts,
+                 rows):
+        self.terms = terms
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.tokens = tokens
+        self.answer_starts = answer_starts
+        self.posting_offsets = posting_offsets
+        self.postings = postings
+        self.answer_rows = answer_rows
+        self.answer_columns = answer_columns
+        self.texts = texts
+        self.rows = rows
+        self.masks = OrderedDict()
+        self.masks_lock = threading.Lock()
+
+        # Answer of every token position, and every (term, answer) pair once, grouped by term
+        self.token_answers = np.repeat(np.arange(self.n_answers, dtype=np.int32), np.diff(answer_starts))
+        posting_terms = np.repeat(np.arange(len(terms), dtype=np.int32), np.diff(posting_offsets))
+        posting_answers = self.token_answers[postings]
+        first = np.ones(len(postings), dtype=bool)
+        first[1:] = (posting_answers[1:] != posting_answers[:-1]) | (posting_terms[1:] != posting_terms[:-1])
+        self.document_terms = posting_terms[first]
+        self.document_answers = posting_answers[first]
+        self.document_offsets = np.concatenate([[0], np.cumsum(np.bincount(self.document_terms,
+                                                                           minlength=len(terms)))])
+
+    @property
+    def n_answers(self):
+        return len(self.answer_starts) - 1
+
+    @property
+    def n_rows(self):
+        return len(self.rows)
+
+    def term_answers(self, term_id):
+        return self.document_answers[self.document_offsets[term_id]:self.document_offsets[term_id + 1]]
+
+    def match_phrase(self, term_ids):
+        # Answers containing the terms as consecutive tokens. Candidates are the positions of the rarest term,
+        # checked against the tokens around them.
+        anchor = min(range(len(term_ids)), key=lambda i: self.posting_offsets[term_ids[i] + 1]
+                     - self.posting_offsets[term_ids[i]])
+        positions = self.postings[self.posting_offsets[term_ids[anchor]]:self.posting_offsets[term_ids[anchor] + 1]]
+        starts = positions - anchor
+        starts = starts[(starts >= 0) & (starts + len(term_ids) <= len(self.tokens))]
+        for i, term_id in enumerate(term_ids):
+            if i != anchor:
+                starts = starts[self.tokens[starts + i] == term_id]
+        return np.unique(self.token_answers[starts])
+
+    def search(self, query):
+        # Ids of the answers containing every keyword and every quoted phrase of the query
+        answers = None
+        for phrase in parse_query(query):
+            term_ids = [self.vocabulary.get(term) for term in phrase]
+            if None in term_ids:
+                return np.array([], dtype=np.int32)
+            matches = self.term_answers(term_ids[0]) if len(term_ids) == 1 else self.match_phrase(term_ids)
+            answers = matches if answers is None else np.intersect1d(answers, matches, assume_unique=True)
+        return answers if answers is not None else np.arange(self.n_answers, dtype=np.int32)
+
+    def select(self, filter_key):
+        # Rows matching a sidebar filter selection, kept for the MASK_CACHE_ENTRIES selections used last. The
+        # index is shared by all sessions, so the cache is only touched under its lock.
+        with self.masks_lock:
+            mask = self.masks.get(filter_key)
+            if mask is not None:
+                self.masks.move_to_end(filter_key)
+                return mask
+        mask = select_rows(self.rows, filter_key) if filter_key else np.ones(self.n_rows, bool)
+        mask.flags.writeable = False
+        with self.masks_lock:
+            self.masks[filter_key] = mask
+            self.masks.move_to_end(filter_key)
+            while len(self.masks) > MASK_CACHE_ENTRIES:
+                self.masks.popitem(last=False)
+        return mask
+
+    def answer_mask(self, columns, filter_key=()):
+        # Answers to the given questions from rows matching the filters
+        wanted = np.isin(self.answer_columns, [TEXT_COLUMNS.index(col) for col in columns])
+        return wanted & self.select(filter_key)[self.answer_rows]
+
+    def term_counts(self, answers):
+        # Answers using each term and its number of uses, over the answers selected by a boolean mask
+        n_terms = len(self.terms)
+        documents = np.bincount(self.document_terms[answers[self.document_answers]], minlength=n_terms)
+        used = answers[self.token_answers] & (self.tokens >= 0)
+        mentions = np.bincount(self.tokens[used], minlength=n_terms)
+        return pd.DataFrame({'Term': self.terms, 'Answers': documents, 'Mentions': mentions})
+
+    def append(self, other):
+        # Index of these answers followed by the answers of other, whose terms are mapped into this vocabulary.
+        # Postings of old and new positions are interleaved per term without sorting.
+        vocabulary = dict(self.vocabulary)
+        for term in other.terms:
+            vocabulary.setdefault(term, len(vocabulary))
+        terms = list(vocabulary)
+        mapping = np.array([vocabulary[term] for term in other.terms], dtype=np.int32)
+        other_tokens = np.full(len(other.tokens), SEPARATOR, dtype=np.int32)
+        used = other.tokens >= 0
+        other_tokens[used] = mapping[other.tokens[used]]
+
+        old_counts = np.zeros(len(terms), dtype=np.int64)
+        old_counts[:len(self.terms)] = np.diff(self.posting_offsets)
+        new_counts = np.zeros(len(terms), dtype=np.int64)
+        new_counts[mapping] = np.diff(other.posting_offsets)
+        posting_offsets = np.concatenate([[0], np.cumsum(old_counts + new_counts)])
+
+        postings = np.empty(posting_offsets[-1], dtype=np.int32)
+        old_terms = np.repeat(np.arange(len(self.terms)), old_counts[:len(self.terms)])
+        postings[posting_offsets[old_terms] + np.arange(len(self.postings)) - self.posting_offsets[old_terms]] = \
+            self.postings
+        other_terms = np.repeat(np.arange(len(other.terms)), np.diff(other.posting_offsets))
+        merged_terms = mapping[other_terms]
+        postings[posting_offsets[merged_terms] + old_counts[merged_terms] + np.arange(len(other.postings))
+                 - other.posting_offsets[other_terms]] = other.postings + len(self.tokens)
+
+        return TextIndex(terms, np.concatenate([self.tokens, other_tokens]),
+                         np.concatenate([self.answer_starts[:-1], other.answer_starts + len(self.tokens)]),
+                         posting_offsets, postings,
+                         np.concatenate([self.answer_rows, other.answer_rows + self.n_rows]),
+                         np.concatenate([self.answer_columns, other.answer_columns]),
+                         np.concatenate([self.texts, other.texts]),
+                         pd.concat([self.rows, other.rows], ignore_index=True))
+
+
+def tokenize(texts):
+    # Terms of every text (lower-cased), as one flat array and the number of terms per text
+    terms = pd.Series(texts, dtype=object).str.lower().str.replace('’', "'", regex=False) \
+        .str.findall(TOKEN_PATTERN)
+    return np.array([term for text_terms in terms for term in text_terms], dtype=object), terms.str.len().to_numpy()
+
+
+# Keywords and quoted phrases of a search query, each as a list of terms
+def parse_query(query):
+    phrases = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        # A word that splits into several terms (e.g. "after-party") is matched as a phrase too
+        terms = list(tokenize([phrase or word])[0])
+        if terms:
+            phrases.append(terms)
+    return phrases
+
+
+def build_text_index(df):
+    texts = df[TEXT_COLUMNS].to_numpy(dtype=object)
+    answer_rows, answer_columns = np.nonzero(pd.notna(texts))
+
+    # Answers repeat a lot ("No", "Dedicated places for talking"), so every distinct text is checked and tokenized
+    # once and its term ids copied to each answer giving it. Blank texts are not answers.
+    codes, uniques = pd.factorize(texts[answer_rows, answer_columns])
+    answered = pd.Series(uniques, dtype=object).str.strip().ne('').to_numpy()[codes]
+    answer_rows, answer_columns, codes = answer_rows[answered], answer_columns[answered], codes[answered]
+    flat_terms, lengths = tokenize(uniques)
+    term_ids, terms = pd.factorize(flat_terms)
+    term_ids = term_ids.astype(np.int32)
+    unique_starts = np.concatenate([[0], np.cumsum(lengths)])[:-1]
+
+    spans = lengths[codes] + 1
+    answer_starts = np.concatenate([[0], np.cumsum(spans)])
+    offsets = np.arange(answer_starts[-1]) - np.repeat(answer_starts[:-1], spans)
+    separators = offsets == np.repeat(spans - 1, spans)
+    tokens = np.full(answer_starts[-1], SEPARATOR, dtype=np.int32)
+    tokens[~separators] = term_ids[(np.repeat(unique_starts[codes], spans) + offsets)[~separators]]
+
+    # Positions of every term in term order; the separators sort first. A stable sort of 16-bit keys is a radix
+    # sort, so smaller vocabularies are sorted as such.
+    keys = tokens.astype(np.int16) if len(terms) < np.iinfo(np.int16).max else tokens
+    order = np.argsort(keys, kind='stable').astype(np.int32)
+    postings = order[len(codes):]
+    posting_offsets = np.concatenate([[0], np.cumsum(np.bincount(tokens[postings], minlength=len(terms)))])
+
+    return TextIndex(list(terms), tokens, answer_starts, posting_offsets, postings, answer_rows.astype(np.int32),
+                     answer_columns.astype(np.int8), uniques[codes], df[INDEX_COLUMNS].reset_index(drop=True))
+
+
+# Most used terms over the answers selected by a boolean mask, by the number of answers using them
+def term_ranking(index, answers, top=30):
+    counts = index.term_counts(answers)
+    counts = counts[(counts['Answers'] > 0) & ~counts['Term'].isin(STOPWORDS)]
+    return counts.sort_values(['Answers', 'Mentions', 'Term'], ascending=[False, False, True]).head(top) \
+        .reset_index(drop=True)
+
+
+# Respondents per level of a categorical column among those with a selected answer, and among those whose
+# selected answers match
+def term_breakdown(index, answers, matches, column):
+    levels = index.rows[column].cat.categories
+    codes = get_codes(index.rows[column], levels)
+    answering = np.unique(index.answer_rows[answers])
+    matching = np.unique(index.answer_rows[matches])
+    answering, matching = [np.bincount(codes[rows][codes[rows] >= 0], minlength=len(levels))
+                           for rows in (answering, matching)]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share = np.where(answering > 0, matching / answering * 100, 0.0)
+    return pd.DataFrame({'Answering': answering, 'Matching': matching, 'Percentage': share},
+                        index=pd.Index(levels, name=column))
+
+
+# One index per process, built when the page is first opened
+@st.cache_resource
+def load_static_text_index():
+    return build_text_index(load_data(TEXT_INDEX_COLUMNS))
+
+
+# Index of the live dataset, extended with the answers of appended rows
+live_text_index = IncrementalCache(lambda key, rows: build_text_index(rows), TextIndex.append, max_entries=1)
+
+
+# Streaming mode indexes the export a chunk at a time, without ever holding its other columns
+@st.cache_resource(max_entries=1)
+def load_streamed_text_index(version, chunk_rows=CHUNK_ROWS):
+    index = None
+    for chunk in read_csv_chunks(DATA_PATH, TEXT_INDEX_COLUMNS, chunk_rows):
+        partial = build_text_index(chunk)
+        index = partial if index is None else index.append(partial)
+    # An export without responses yields no chunks
+    return index if index is not None else build_text_index(read_csv(DATA_PATH, TEXT_INDEX_COLUMNS))
+
+
+def load_text_index():
+    with span('load_text_index'):
+        if STREAMING:
+            return load_streamed_text_index(get_dataset_version())
+        if INCREMENTAL:
+            return live_text_index.get()
+        return load_static_text_index()
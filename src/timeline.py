@@ -0,0 +1,240 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from src.utils import DATA_PATH, BACKEND, INCREMENTAL, STREAMING, CHUNK_ROWS, COL_TIMESTAMP, COL_TALK_FREQUENCY, \
+    COL_TALK_DURATION, COL_TALK_PERCEPTION, COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ, COL_IMPACT_ATMOSPHERE, load_data, \
+    read_csv, read_csv_chunks, get_dataset_version, get_order
+from src.aggregations import get_codes
+from src.scoring import score_yapping_factor
+from src.filters import INDEX_COLUMNS, get_filter_key, get_filter_mask, select_rows
+from src.ingest import IncrementalCache
+from src.profiling import span
+
+# Trends over the response Timestamps. Responses are counted into hour buckets, and every trend measure keeps the
+# number of answers and their sum per hour. Running totals of those give the mean over any span of hours as the
+# difference of two entries, so rolling windows and day, week or event periods of any size are answered without
+# going back to the responses.
+
+YAPPING_MEASURE = "Yapping Factor"
+
+# Share measures: the percentage of a question's answers that are one of the listed answers
+SHARE_MEASURES = {
+    "Talk perception: unacceptable (%)": (COL_TALK_PERCEPTION, ['Somewhat unacceptable', 'Completely unacceptable']),
+    "Impact on own experience: negative (%)": (COL_IMPACT_EXPERIENCE, ['Yes, negatively']),
+    "Impact on DJ: negative (%)": (COL_IMPACT_DJ, ['Yes, negatively']),
+    "Impact on atmosphere: negative (%)": (COL_IMPACT_ATMOSPHERE, ['Yes, negatively']),
+}
+
+# Trend measures, all on a 0-100 scale
+TREND_MEASURES = [YAPPING_MEASURE] + list(SHARE_MEASURES)
+
+# Columns the timeline is built from
+TIMELINE_COLUMNS = [COL_TIMESTAMP, COL_TALK_FREQUENCY, COL_TALK_DURATION] + \
+    [col for col, _ in SHARE_MEASURES.values()]
+
+# Periods the trends are resampled to. Hour 0 of the epoch is a Thursday 00:00, so weeks are shifted to start on
+# Mondays. Events are runs of responses with no gap of more than EVENT_GAP_HOURS between two of them, as when the
+# survey was shared after a party.
+PERIODS = ['Day', 'Week', 'Event']
+PERIOD_HOURS = {'Day': 24, 'Week': 7 * 24}
+PERIOD_OFFSETS = {'Day': 0, 'Week': 4 * 24}
+EVENT_GAP_HOURS = 48
+
+
+class Timeline:
+    # Responses per hour from the first hour with a response (start, in hours since the epoch; None when no
+    # response has a timestamp) to the last, and the answers and answer sums of every trend measure per hour.
+    # Undated responses are only counted. Timelines of disjoint sets of rows merge hour by hour.
+
+    def __init__(self, start, responses, counts, sums, undated=0):
+        self.start = start
+        self.responses = responses
+        self.counts = counts
+        self.sums = sums
+        self.undated = undated
+
+        # Running totals with a leading zero, so hours i..j-1 add up to total[j] - total[i]
+        self.total_responses = np.concatenate([[0], np.cumsum(responses)])
+        self.total_counts = np.pad(np.cumsum(counts, axis=1), ((0, 0), (1, 0)))
+        self.total_sums = np.pad(np.cumsum(sums, axis=1), ((0, 0), (1, 0)))
+
+    @property
+    def n_hours(self):
+        return len(self.responses)
+
+    @property
+    def end(self):
+        return self.start + self.n_hours
+
+    def between(self, first, last):
+        # Responses, answers per measure and mean per measure between hour offsets first and last (exclusive)
+        responses = self.total_responses[last] - self.total_responses[first]
+        counts = self.total_counts[:, last] - self.total_counts[:, first]
+        sums = self.total_sums[:, last] - self.total_sums[:, first]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return responses, counts, np.where(counts > 0, sums / np.where(counts > 0, counts, 1), np.nan)
+
+    def merge(self, other):
+        if other.start is None or self.start is None:
+            dated = self if other.start is None else other
+            return Timeline(dated.start, dated.responses, dated.counts, dated.sums, self.undated + other.undated)
+        start, end = min(self.start, other.start), max(self.end, other.end)
+        responses = np.zeros(end - start, dtype=np.int64)
+        counts = np.zeros((len(TREND_MEASURES), end - start), dtype=np.int64)
+        sums = np.zeros((len(TREND_MEASURES), end - start))
+        for timeline in (self, other):
+            hours = slice(timeline.start - start, timeline.end - start)
+            responses[hours] += timeline.responses
+            counts[:, hours] += timeline.counts
+            sums[:, hours] += timeline.sums
+        return Timeline(start, responses, counts, sums, self.undated + other.undated)
+
+
+# Hours since the epoch of every timestamp, -1 where it is missing
+def get_hours(timestamps):
+    values = timestamps.to_numpy(dtype='datetime64[ns]')
+    return np.where(np.isnat(values), -1, values.astype('datetime64[h]').astype(np.int64))
+
+
+# 100 for the counted answers of a share measure, 0 for its other answers and NaN where unanswered, by answer code
+def share_values(column, answers, codes):
+    levels = get_order(column)
+    hits = np.isin(codes, [levels.index(answer) for answer in answers]) * 100.0
+    return np.where(codes >= 0, hits, np.nan)
+
+
+# Timeline of responses at the given hours (>= 0), each standing for weights responses (one when None). Every
+# measure is given as (hours, values, weights) of its own, values NaN where the question was not answered.
+def count_timeline(hours, weights, measures, undated=0):
+    if not len(hours):
+        return Timeline(None, np.zeros(0, dtype=np.int64), np.zeros((len(TREND_MEASURES), 0), dtype=np.int64),
+                        np.zeros((len(TREND_MEASURES), 0)), undated)
+    start = int(hours.min())
+    n_hours = int(hours.max()) - start + 1
+    responses = np.bincount(hours - start, weights=weights, minlength=n_hours).round().astype(np.int64)
+    counts = np.zeros((len(measures), n_hours), dtype=np.int64)
+    sums = np.zeros((len(measures), n_hours))
+    for i, (measure_hours, values, measure_weights) in enumerate(measures):
+        valid = ~np.isnan(values)
+        offsets = measure_hours[valid] - start
+        if measure_weights is None:
+            counts[i] = np.bincount(offsets, minlength=n_hours)
+            sums[i] = np.bincount(offsets, weights=values[valid], minlength=n_hours)
+        else:
+            counts[i] = np.bincount(offsets, weights=measure_weights[valid], minlength=n_hours).round()
+            sums[i] = np.bincount(offsets, weights=values[valid] * measure_weights[valid], minlength=n_hours)
+    return Timeline(start, responses, counts, sums, undated)
+
+
+def build_timeline(df):
+    hours = get_hours(df[COL_TIMESTAMP])
+    dated = hours >= 0
+    hours = hours[dated]
+    values = [score_yapping_factor(df[COL_TALK_FREQUENCY], df[COL_TALK_DURATION])]
+    values += [share_values(col, answers, get_codes(df[col], get_order(col)))
+               for col, answers in SHARE_MEASURES.values()]
+    return count_timeline(hours, None, [(hours, measure[dated], None) for measure in values],
+                          int((~dated).sum()))
+
+
+# First and end hours (since the epoch) of every period. Day and week periods cover the timeline; events are
+# found in the reference timeline, so they stay the same under the sidebar filters, and end after their last
+# response.
+def period_bounds(period, timeline, reference=None):
+    if period == 'Event':
+        reference = timeline if reference is None else reference
+        hours = reference.start + np.flatnonzero(reference.responses) if reference.start is not None else []
+        if not len(hours):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        gaps = np.flatnonzero(np.diff(hours) > EVENT_GAP_HOURS)
+        return np.concatenate([[hours[0]], hours[gaps + 1]]), np.concatenate([hours[gaps], [hours[-1]]]) + 1
+    if timeline.start is None:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    size, offset = PERIOD_HOURS[period], PERIOD_OFFSETS[period]
+    starts = np.arange(timeline.start - (timeline.start - offset) % size, timeline.end, size)
+    return starts, starts + size
+
+
+def to_datetimes(hours):
+    return pd.to_datetime(np.asarray(hours, dtype=np.int64), unit='h')
+
+
+def describe_period(period, i, start, end):
+    if period == 'Day':
+        return f"{start:%b %d, %Y}"
+    if period == 'Week':
+        return f"Week of {start:%b %d, %Y}"
+    if start.date() == end.date():
+        return f"Event {i + 1} ({start:%b %d, %Y})"
+    return f"Event {i + 1} ({start:%b %d} - {end:%b %d, %Y})"
+
+
+# Mean of every measure per period with responses, as a long table; events are found in reference (see
+# period_bounds)
+def resample_timeline(timeline, period, reference=None):
+    rows = []
+    if timeline.start is not None:
+        starts, ends = period_bounds(period, timeline, reference)
+        responses, counts, means = timeline.between(np.clip(starts - timeline.start, 0, timeline.n_hours),
+                                                    np.clip(ends - timeline.start, 0, timeline.n_hours))
+        first, last = to_datetimes(starts), to_datetimes(ends - 1)
+        for i in np.flatnonzero(responses):
+            label = describe_period(period, i, first[i], last[i])
+            rows += [(first[i], last[i], label, int(responses[i]), measure, means[m, i], int(counts[m, i]))
+                     for m, measure in enumerate(TREND_MEASURES)]
+    return pd.DataFrame(rows, columns=['Start', 'End', 'Period', 'Responses', 'Measure', 'Mean', 'Answers'])
+
+
+# Mean of every measure over the window hours up to the end of every hour, as a long table; NaN where the window
+# holds no answers
+def rolling_timeline(timeline, window):
+    if timeline.start is None:
+        return pd.DataFrame(columns=['Time', 'Measure', 'Mean', 'Answers'])
+    last = np.arange(1, timeline.n_hours + 1)
+    _, counts, means = timeline.between(np.maximum(last - window, 0), last)
+    return pd.DataFrame({'Time': np.tile(to_datetimes(timeline.start + last), len(TREND_MEASURES)),
+                         'Measure': np.repeat(TREND_MEASURES, timeline.n_hours),
+                         'Mean': means.ravel(), 'Answers': counts.ravel()})
+
+
+# One timeline per dataset and filter selection, shared read-only by all sessions
+@st.cache_resource(max_entries=16)
+def build_filtered_timeline(filter_key):
+    df = load_data(TIMELINE_COLUMNS)
+    mask = get_filter_mask(filter_key)
+    return build_timeline(df if mask is None else df[mask])
+
+
+# Timelines of the live dataset per filter selection, merged with the timeline of the rows appended since
+live_timelines = IncrementalCache(lambda filter_key, rows: build_timeline(rows[select_rows(rows, filter_key)]
+                                                                          if filter_key else rows), Timeline.merge)
+
+
+# Streaming mode counts the export a chunk at a time
+def stream_timeline(path=DATA_PATH, filter_key=(), chunk_rows=CHUNK_ROWS):
+    columns = list(dict.fromkeys(TIMELINE_COLUMNS + INDEX_COLUMNS))
+    timeline = None
+    for chunk in read_csv_chunks(path, columns, chunk_rows):
+        partial = build_timeline(chunk[select_rows(chunk, filter_key)] if filter_key else chunk)
+        timeline = partial if timeline is None else timeline.merge(partial)
+    # An export without responses yields no chunks
+    return timeline if timeline is not None else build_timeline(read_csv(path, columns))
+
+
+@st.cache_resource(max_entries=16)
+def load_streamed_timeline(filter_key, version):
+    return stream_timeline(DATA_PATH, filter_key)
+
+
+# Timeline for the current sidebar filters, or for the selection in filter_key
+def load_timeline(filter_key=None):
+    filter_key = get_filter_key() if filter_key is None else filter_key
+    with span('load_timeline'):
+        if BACKEND != 'csv':
+            from src.database import get_database_timeline
+            return get_database_timeline(filter_key)
+        if STREAMING:
+            return load_streamed_timeline(filter_key, get_dataset_version())
+        if INCREMENTAL:
+            return live_timelines.get(filter_key)
+        return build_filtered_timeline(filter_key)
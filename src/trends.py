@@ -0,0 +1,52 @@
+import streamlit as st
+from src.timeline import TREND_MEASURES, PERIODS, EVENT_GAP_HOURS, load_timeline, resample_timeline, \
+    rolling_timeline, to_datetimes
+from src.figure_cache import plot_figure
+
+# Rolling windows offered by the slider, label -> hours
+ROLLING_WINDOWS = {"6 hours": 6, "12 hours": 12, "day": 24, "3 days": 3 * 24, "week": 7 * 24, "2 weeks": 14 * 24}
+DEFAULT_WINDOW = "day"
+
+def app():
+    from src import figures
+
+    st.header("Trends Over Time")
+    timeline = load_timeline()
+    if timeline.start is None:
+        st.info("None of the selected responses has a timestamp.")
+        return
+
+    first, last = to_datetimes([timeline.start, timeline.end - 1])
+    undated = f" {timeline.undated} without a valid timestamp are left out." if timeline.undated else ""
+    st.write(f"{int(timeline.total_responses[-1])} responses from {first:%b %d, %Y} to {last:%b %d, %Y}.{undated}")
+    measures = st.multiselect("Measures:", TREND_MEASURES, default=TREND_MEASURES[:2])
+
+    st.subheader("By day, week or event")
+    period = st.radio("Group responses by:", PERIODS, horizontal=True)
+    # Events are found among all responses, so the sidebar filters do not move them
+    trends = resample_timeline(timeline, period, load_timeline(()))
+    plot_figure('trends', 'responses', [period], lambda: figures.responses_chart(trends, period))
+    plot_figure('trends', 'resampled', [period, tuple(measures)],
+                lambda: figures.trend_chart(trends[trends['Measure'].isin(measures)], period))
+
+    st.subheader("Rolling average")
+    window = st.select_slider("Window:", list(ROLLING_WINDOWS), value=DEFAULT_WINDOW)
+
+    def build_rolling():
+        rolling = rolling_timeline(timeline, ROLLING_WINDOWS[window])
+        return figures.rolling_trend_chart(rolling[rolling['Measure'].isin(measures)], window)
+
+    plot_figure('trends', 'rolling', [window, tuple(measures)], build_rolling)
+
+    # Add an explanation for people without analytical background
+    st.markdown(f"""
+    ### What am I seeing?
+
+    How the answers changed over the weeks the survey was open, using the time each response was submitted.
+
+    1. **Measures**: The Yapping Factor (0-100) is the average score of the responses. The other measures are the percentage of answers to a question that find talking unacceptable, or say it has a negative effect.
+    2. **By day, week or event**: Responses grouped by the day or week they were submitted. An event is a burst of responses with no break of more than {EVENT_GAP_HOURS // 24} days, as when the survey was shared after a party.
+    3. **Rolling average**: At every hour, the average over the responses submitted in the window before it. A longer window gives a smoother line; where the window holds no responses the line stops.
+
+    Periods with few responses can swing a lot, so check the number of responses before reading too much into a change. The sidebar filters apply as well.
+    """)
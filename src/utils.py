@@ -1,5 +1,40 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
 import streamlit as st
 import pandas as pd
+from src.profiling import span
+from src.aggregations import parse_multi_select
+
+# Data locations
+DATA_PATH = os.path.join('data', 'Dancefloor_taliking.csv')
+# Snapshots, databases and quarantine files (DANCEFLOOR_CACHE_DIR to keep them elsewhere)
+CACHE_DIR = os.environ.get('DANCEFLOOR_CACHE_DIR', os.path.join('data', '.cache'))
+SNAPSHOT_META_KEY = b'dancefloor_source'
+REJECTIONS_META_KEY = b'dancefloor_rejections'
+
+# Serve one read-only frame per process instead of a pickled copy per caller (DANCEFLOOR_SHARED_DATA=0 to disable)
+SHARED_DATA = os.environ.get('DANCEFLOOR_SHARED_DATA', '1') != '0'
+if SHARED_DATA:
+    # Column selections and row subsets of the shared frame stay views until someone writes to them
+    pd.set_option('mode.copy_on_write', True)
+
+# Where page aggregations run: 'csv' loads the CSV into pandas (the default), 'sqlite' or 'duckdb' push them
+# into an embedded database built from it (see src.database)
+BACKEND = os.environ.get('DANCEFLOOR_BACKEND', 'csv')
+
+# Aggregate the CSV chunk by chunk without ever holding it whole (DANCEFLOOR_STREAMING=1, see src.streaming),
+# CHUNK_ROWS rows at a time
+STREAMING = os.environ.get('DANCEFLOOR_STREAMING', '0') == '1' and BACKEND == 'csv'
+CHUNK_ROWS = int(os.environ.get('DANCEFLOOR_CHUNK_ROWS', '100000'))
+
+# Follow responses appended to the CSV instead of loading it once (DANCEFLOOR_INCREMENTAL=1, see src.ingest).
+# Streaming mode and the database backends never hold the rows, so they take precedence.
+INCREMENTAL = os.environ.get('DANCEFLOOR_INCREMENTAL', '0') == '1' and not STREAMING and BACKEND == 'csv'
 
 # Define column names
 COL_AGE = "How old are you?"
@@ -23,6 +58,20 @@ COL_IMPACT_EXPERIENCE = "Do you think talking on the dancefloor affects your own
 COL_IMPACT_DJ = "Do you think talking on the dancefloor affects DJ's performance?"
 COL_IMPACT_ATMOSPHERE = "Do you think talking on the dancefloor affects overall event atmosphere?"
 
+COL_TIMESTAMP = "Timestamp"
+COL_ADDRESS_TALKING = "In your opinion, what's the best way to address excessive talking on the dancefloor?"
+COL_TIME_OF_NIGHT = "Have you noticed any differences in talking behavior based on the time of night or duration of the event?"
+COL_OWN_CHANGE = "Has your own talking behavior on the dancefloor changed over time? If yes, why?"
+COL_ANYTHING_ELSE = "Is there anything else you'd like to share about dancefloor etiquette or your experiences with talking at raves?"
+COL_NUMBER_OF_ROLES = "Number_of_Roles"
+
+# Format of the Timestamp column, e.g. 7/24/2024 0:11:06
+TIMESTAMP_FORMAT = '%m/%d/%Y %H:%M:%S'
+
+# Headers as the survey export writes them, where they differ from the names used in code.
+# The export cuts the closing parenthesis off the talking factors question.
+EXPORT_HEADERS = {COL_TALKING_FACTORS: COL_TALKING_FACTORS.rstrip(')')}
+
 # Define custom orders
 AGE_ORDER = ['18-24', '25-34', '35-44+']
 GENDER_ORDER = ['Male', 'Female', 'Non-binary', 'Prefer not to say']
@@ -46,44 +95,341 @@ IMPACT_EXPERIENCE = ['Yes, positively', 'Yes, negatively', 'No effect']
 IMPACT_DJ = ['Yes, positively', 'Yes, negatively', 'No effect']
 IMPACT_ATMOSPHERE = ['Yes, positively', 'Yes, negatively', 'No effect']
 
-# Load the data
+# Role flag columns (multi-hot, one per role)
+ROLE_COLUMNS = [f'Role_{role}' for role in ROLES]
+ROLE_LEVELS = [0, 1]
+
+# Talking factor flag columns (multi-hot, one per factor), parsed from the comma-joined answers on load,
+# and the bit pattern of each answer (bit i set for TALKING_FACTORS[i], -1 when unanswered)
+FACTOR_COLUMNS = [f'Factor_{factor}' for factor in TALKING_FACTORS]
+COL_FACTOR_PATTERN = 'Factor_Pattern'
+FACTOR_PATTERNS = list(range(1 << len(TALKING_FACTORS)))
+
+# Likert scale columns (1-5)
+LIKERT_COLUMNS = [COL_QUIET_IMPORTANCE, COL_LIKELIHOOD_INTERVENE]
+LIKERT_LEVELS = [1, 2, 3, 4, 5]
+
+# Free-text answer columns
+TEXT_COLUMNS = [COL_ADDRESS_TALKING, COL_TIME_OF_NIGHT, COL_OWN_CHANGE, COL_ANYTHING_ELSE]
+
+# Answer order for every categorical column
+COLUMN_ORDERS = {
+    COL_AGE: AGE_ORDER,
+    COL_GENDER: GENDER_ORDER,
+    COL_ATTENDANCE: ATTENDANCE_ORDER,
+    COL_EXPERIENCE: EXPERIENCE_ORDER,
+    COL_TALK_FREQUENCY: TALK_FREQUENCY,
+    COL_TALK_DURATION: TALK_DURATION,
+    COL_TALK_PERCEPTION: TALK_PERCEPTION,
+    COL_COVID_CHANGE: COVID_CHANGE,
+    COL_IMPACT_EXPERIENCE: IMPACT_EXPERIENCE,
+    COL_IMPACT_DJ: IMPACT_DJ,
+    COL_IMPACT_ATMOSPHERE: IMPACT_ATMOSPHERE,
+}
+
+# Columns converted to ordered categoricals on load
+CATEGORICAL_COLUMNS = list(COLUMN_ORDERS)
+
+# Schema registry: dtype applied by read_csv for every typed column
+COLUMN_SCHEMA = {col: pd.CategoricalDtype(order, ordered=True) for col, order in COLUMN_ORDERS.items()}
+COLUMN_SCHEMA.update({col: 'int8' for col in LIKERT_COLUMNS + ROLE_COLUMNS + [COL_NUMBER_OF_ROLES]})
+
+# Values accepted in every integer column, each a run of consecutive integers; rows with any other value are
+# rejected on load (see src.validation)
+NUMERIC_LEVELS = {col: LIKERT_LEVELS for col in LIKERT_COLUMNS}
+NUMERIC_LEVELS.update({col: ROLE_LEVELS for col in ROLE_COLUMNS})
+NUMERIC_LEVELS[COL_NUMBER_OF_ROLES] = list(range(len(ROLES) + 1))
+
+# Blank integer answers are typed as this value. It is off every scale, so they land in the missing slot of the
+# cube and are left out of its sums and means.
+MISSING_INTEGER = -1
+
+# Columns derived while loading, not present in the CSV
+DERIVED_SCHEMA = {col: 'uint8' for col in FACTOR_COLUMNS}
+DERIVED_SCHEMA[COL_FACTOR_PATTERN] = 'int8'
+
+
+# Load the data, optionally restricted to the columns a page needs
+def load_data(columns=None):
+    with span('load_data', columns=len(columns) if columns is not None else 'all'):
+        if INCREMENTAL:
+            from src.ingest import load_live_data
+            return load_live_data(columns)
+        if SHARED_DATA:
+            return load_shared_data(columns)
+        return load_copied_data(columns)
+
+
 @st.cache_data
-def load_data():
-    df = pd.read_csv('data/Dancefloor_taliking.csv')
+def load_copied_data(columns=None):
+    return read_dataset(DATA_PATH, columns)
 
-    # Convert categorical columns to ordered categories
-    for col in [COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE, COL_TALK_FREQUENCY,
-                COL_TALK_DURATION, COL_TALK_PERCEPTION, COL_COVID_CHANGE,
-                COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ, COL_IMPACT_ATMOSPHERE]:
-        df[col] = pd.Categorical(df[col], categories=get_order(col), ordered=True)
 
+# Bytes held by each shared frame, keyed by its column selection
+shared_frame_bytes = {}
+
+
+# One immutable frame per column selection, shared by every session in the process.
+# Derived columns must be kept in their own cached layer, never added to this frame.
+@st.cache_resource
+def load_shared_data(columns=None):
+    df = read_dataset(DATA_PATH, columns)
+    # Measured before freezing: pandas cannot take the deep size of read-only object (text) columns
+    shared_frame_bytes[tuple(columns) if columns is not None else None] = int(df.memory_usage(deep=True).sum())
+    return freeze(df)
+
+
+def freeze(df):
+    # Rebuild the frame on read-only arrays so in-place writes raise instead of changing the shared copy
+    columns = {}
+    for col in df.columns:
+        values = df[col].array
+        if isinstance(values, pd.Categorical):
+            codes = values.codes.copy()
+            codes.flags.writeable = False
+            columns[col] = pd.Categorical.from_codes(codes, dtype=values.dtype)
+        else:
+            array = df[col].to_numpy(copy=True)
+            array.flags.writeable = False
+            columns[col] = array
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+# Sessions seen recently, session id -> last rerun time
+active_sessions = {}
+active_sessions_lock = threading.Lock()
+
+
+def register_session(session_id, window=600):
+    now = time.time()
+    with active_sessions_lock:
+        active_sessions[session_id] = now
+        for expired in [key for key, seen in active_sessions.items() if now - seen > window]:
+            del active_sessions[expired]
+        return len(active_sessions)
+
+
+# Memory held once by the shared frames, and what per-session copies of them would have cost on top
+def get_shared_memory_report(sessions):
+    shared = sum(shared_frame_bytes.values())
+    return {'shared_bytes': shared, 'sessions': sessions, 'saved_bytes': shared * max(sessions - 1, 0)}
+
+
+def render_shared_memory_report():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    # The live dataset of incremental mode is reported by src.ingest, the other modes hold no dataset
+    if not SHARED_DATA or INCREMENTAL or STREAMING or BACKEND != 'csv':
+        return
+    ctx = get_script_run_ctx()
+    report = get_shared_memory_report(register_session(ctx.session_id) if ctx else 1)
+    st.sidebar.caption(f"Shared dataset: {report['shared_bytes'] / 1e6:.2f} MB held once for {report['sessions']} "
+                       f"active session(s), ~{report['saved_bytes'] / 1e6:.2f} MB saved vs per-session copies")
+
+
+def read_dataset(path, columns=None):
+    return read_fingerprinted(path, file_fingerprint(path), path, columns)
+
+
+# read_dataset for CSV content already read from path: source holds the content (a path or file object) and
+# fingerprint its mtime_ns and sha256
+def read_fingerprinted(path, fingerprint, source, columns=None):
+    # Serve the typed Parquet snapshot when it still matches the CSV and schema, otherwise rebuild it
+    fingerprint = dict(fingerprint, schema=schema_fingerprint())
+    snapshot_path = get_snapshot_path(path)
+
+    df = read_snapshot(snapshot_path, fingerprint, columns)
+    if df is None:
+        from src.validation import write_quarantine
+
+        # Rows failing validation are set aside once per CSV version, their counts kept with the snapshot
+        df, rejections = read_validated_csv(source)
+        write_quarantine(rejections, path)
+        write_snapshot(df, snapshot_path, fingerprint, rejections.summary())
+        if columns is not None:
+            df = df[list(columns)]
     return df
 
 
+def read_csv(path, columns=None):
+    return read_validated_csv(path, columns)[0]
+
+
+# The valid rows of the CSV, and the Rejections of the others
+def read_validated_csv(path, columns=None):
+    return finish_csv_frame(pd.read_csv(path, **get_csv_options(columns)), columns)
+
+
+# The frames of read_csv, chunk_rows rows at a time
+def read_csv_chunks(path, columns=None, chunk_rows=CHUNK_ROWS):
+    for df, _ in read_validated_csv_chunks(path, columns, chunk_rows):
+        yield df
+
+
+def read_validated_csv_chunks(path, columns=None, chunk_rows=CHUNK_ROWS):
+    with pd.read_csv(path, chunksize=chunk_rows, **get_csv_options(columns)) as reader:
+        for chunk in reader:
+            yield finish_csv_frame(chunk, columns)
+
+
+def get_csv_options(columns=None):
+    # Unused columns are never materialized, but every typed column is read so that a row is accepted or rejected
+    # the same way whichever columns are asked for
+    source_columns = None
+    if columns is not None:
+        source_columns = [col for col in columns if col not in DERIVED_SCHEMA]
+        if any(col in DERIVED_SCHEMA for col in columns) and COL_TALKING_FACTORS not in source_columns:
+            source_columns.append(COL_TALKING_FACTORS)
+        source_columns += [col for col in COLUMN_SCHEMA if col not in source_columns]
+    usecols = [EXPORT_HEADERS.get(col, col) for col in source_columns] if source_columns is not None else None
+    return {'usecols': usecols, 'dtype': get_dtypes(source_columns)}
+
+
+# Validate the parsed answers, type them by the schema registry, parse the timestamps and derive the talking
+# factor columns
+def finish_csv_frame(df, columns=None):
+    from src.validation import validate_rows
+
+    df = df.rename(columns={header: col for col, header in EXPORT_HEADERS.items()})
+    df, rejections = validate_rows(df)
+    if COL_TIMESTAMP in df:
+        df = df.assign(**{COL_TIMESTAMP: parse_timestamps(df[COL_TIMESTAMP])})
+    if COL_TALKING_FACTORS in df:
+        df = add_factor_columns(df)
+    return (df if columns is None else df[list(columns)]), rejections
+
+
+# Parse the comma-joined talking factors once into multi-hot flags and a bit pattern per respondent
+def add_factor_columns(df):
+    patterns = parse_multi_select(df[COL_TALKING_FACTORS], TALKING_FACTORS)
+    flags = (patterns[:, None] >> np.arange(len(TALKING_FACTORS))) & 1
+    flags[patterns < 0] = 0
+    columns = {col: flags[:, i].astype(np.uint8) for i, col in enumerate(FACTOR_COLUMNS)}
+    columns[COL_FACTOR_PATTERN] = patterns
+    return pd.concat([df, pd.DataFrame(columns, index=df.index)], axis=1)
+
+
+def get_dtypes(columns=None):
+    # Keyed by the CSV headers. Answers are parsed as the labels written, integers included (an integer dtype would
+    # fail on a missing value and silently wrap large ones), and typed by validate_rows
+    return {EXPORT_HEADERS.get(col, col): 'category' for col in COLUMN_SCHEMA if columns is None or col in columns}
+
+
+# Identify a CSV by modification time and content hash
+def file_fingerprint(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return {'mtime_ns': os.stat(path).st_mtime_ns, 'sha256': sha.hexdigest()}
+
+
+# Short id of the dataset this process serves, from the CSV content and the schema it is typed with
+def get_dataset_version(path=DATA_PATH):
+    if INCREMENTAL and path == DATA_PATH:
+        from src.ingest import get_dataset_state
+        return get_dataset_state().version
+    return get_file_version(path)
+
+
+@st.cache_resource
+def get_file_version(path):
+    return get_content_version(file_fingerprint(path)['sha256'])
+
+
+def get_content_version(sha256):
+    return hashlib.sha256(f"{sha256}:{schema_fingerprint()}".encode()).hexdigest()[:16]
+
+
+# Cache file of an export: its name plus a short hash of its absolute path, so exports with the same file name
+# in different directories never share one
+def get_cache_path(path, suffix):
+    name = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8]
+    return os.path.join(CACHE_DIR, f'{name}.{digest}{suffix}')
+
+
+def get_snapshot_path(path):
+    return get_cache_path(path, '.parquet')
+
+
+def schema_fingerprint():
+    schema = sorted((col, repr(dtype)) for col, dtype in {**COLUMN_SCHEMA, **DERIVED_SCHEMA}.items())
+    rules = sorted(NUMERIC_LEVELS.items())
+    return hashlib.sha256(repr((schema, sorted(EXPORT_HEADERS.items()), rules, MISSING_INTEGER,
+                                TIMESTAMP_FORMAT)).encode()).hexdigest()
+
+
+def read_snapshot(snapshot_path, fingerprint, columns=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    try:
+        metadata = pq.read_schema(snapshot_path, memory_map=True).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    if json.loads(metadata.get(SNAPSHOT_META_KEY, b'{}')) != fingerprint:
+        return None
+
+    # Memory-map the snapshot; pandas metadata restores the categorical dtypes and orders
+    columns = list(columns) if columns is not None else None
+    return pq.read_table(snapshot_path, columns=columns, memory_map=True).to_pandas()
+
+
+def write_snapshot(df, snapshot_path, fingerprint, rejected=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SNAPSHOT_META_KEY] = json.dumps(fingerprint).encode()
+    if rejected is not None:
+        metadata[REJECTIONS_META_KEY] = json.dumps(rejected).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    # Write to a temporary file first so concurrent readers never see a partial snapshot
+    tmp_path = None
+    try:
+        tmp_path = make_temp_file(snapshot_path)
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, snapshot_path)
+    except OSError:
+        # A read-only data directory just means every load parses the CSV
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# A new empty file in the directory of path, to write path under before os.replace moves it into place. The name
+# is unique per call, so sessions writing the same file in one process or in several never share it. Unlike
+# tempfile.mkstemp (always 0600) the file gets the umask's permissions, so other users can read what replaces path.
+def make_temp_file(path):
+    import secrets
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    while True:
+        tmp_path = f'{path}.{secrets.token_hex(8)}.tmp'
+        try:
+            with open(tmp_path, 'xb'):
+                return tmp_path
+        except FileExistsError:
+            continue
+
+
+# Timestamps in TIMESTAMP_FORMAT as datetimes, NaT where missing or malformed. Arrow parses the fixed format
+# about 20x faster than pd.to_datetime does.
+def parse_timestamps(values):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    parsed = pc.strptime(pa.array(values.to_numpy(dtype=object), type=pa.string(), from_pandas=True),
+                         format=TIMESTAMP_FORMAT, unit='s', error_is_null=True)
+    return pd.Series(parsed.to_numpy(zero_copy_only=False).astype('datetime64[ns]'), index=values.index,
+                     name=values.name)
+
+
 # Helper function to get the appropriate order for a given column
 def get_order(column):
-    if column == COL_EXPERIENCE:
-        return EXPERIENCE_ORDER
-    elif column == COL_AGE:
-        return AGE_ORDER
-    elif column == COL_GENDER:
-        return GENDER_ORDER
-    elif column == COL_ATTENDANCE:
-        return ATTENDANCE_ORDER
-    elif column == COL_TALK_FREQUENCY:
-        return TALK_FREQUENCY
-    elif column == COL_TALK_DURATION:
-        return TALK_DURATION
-    elif column == COL_TALK_PERCEPTION:
-        return TALK_PERCEPTION
-    elif column == COL_COVID_CHANGE:
-        return COVID_CHANGE
-    elif column == COL_IMPACT_EXPERIENCE:
-        return IMPACT_EXPERIENCE
-    elif column == COL_IMPACT_DJ:
-        return IMPACT_DJ
-    elif column == COL_IMPACT_ATMOSPHERE:
-        return IMPACT_ATMOSPHERE
-    else:
+    if column not in COLUMN_ORDERS:
         raise ValueError('No column')
-
+    return COLUMN_ORDERS[column]
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from src.utils import DATA_PATH, CHUNK_ROWS, INCREMENTAL, STREAMING, SNAPSHOT_META_KEY, REJECTIONS_META_KEY, \
+    EXPORT_HEADERS, COLUMN_ORDERS, COLUMN_SCHEMA, NUMERIC_LEVELS, MISSING_INTEGER, ROLE_COLUMNS, COL_NUMBER_OF_ROLES, \
+    get_snapshot_path, get_content_version, get_dataset_version, read_validated_csv, read_validated_csv_chunks, \
+    get_cache_path, make_temp_file
+
+# Ingest validation. Every parsed chunk of the export is checked against the schema registry before it is typed:
+# categorical answers must be one of the column's levels and integer answers one of NUMERIC_LEVELS, unless left
+# blank, and Number_of_Roles the sum of the Role_* flags. Rows failing any check are left out of every page and
+# written with their reasons to a quarantine CSV beside the snapshot. Answers are parsed as labels and checked once
+# per distinct label, so validation is a few passes over the small integer codes of each column.
+
+# Column of the quarantine file saying why each row was rejected
+COL_REJECTION_REASONS = 'Rejection reasons'
+
+
+class Rejections:
+    # Rows rejected by validate_rows, with their answers as written and the reasons, and the number of rejected
+    # values per column. Rejections of consecutive chunks add up.
+
+    def __init__(self, rows, counts):
+        self.rows = rows
+        self.counts = counts
+
+    def merge(self, other):
+        # Most chunks reject nothing, and their empty frames would only upset the dtypes of the concatenation
+        frames = [rows for rows in (self.rows, other.rows) if len(rows)] or [self.rows]
+        return Rejections(pd.concat(frames, ignore_index=True),
+                          self.counts.add(other.counts, fill_value=0).astype(np.int64))
+
+    def summary(self):
+        # As recorded with the snapshot
+        return {'rows': len(self.rows), 'columns': {col: int(n) for col, n in self.counts.items() if n}}
+
+
+def add_summaries(summary, other):
+    columns = dict(summary['columns'])
+    for col, n in other['columns'].items():
+        columns[col] = columns.get(col, 0) + n
+    return {'rows': summary['rows'] + other['rows'], 'columns': columns}
+
+
+# Categorical answers: the parsed labels are mapped to the levels' codes once, and the rows through their codes
+def check_answers(values, dtype):
+    recode = dtype.categories.get_indexer(values.categories)
+    codes = np.append(recode, -1).astype(np.int8)[values.codes]
+    if (recode >= 0).all():
+        return pd.Categorical.from_codes(codes, dtype=dtype), np.zeros(len(codes), dtype=bool)
+    return pd.Categorical.from_codes(codes, dtype=dtype), np.append(recode < 0, False)[values.codes]
+
+
+# Integer answers, parsed as labels: each distinct label is read as a number once and the rows follow their codes.
+# Blank answers (code -1) are missing, typed as MISSING_INTEGER.
+def check_integers(values, levels):
+    numbers = pd.to_numeric(values.categories, errors='coerce').to_numpy(dtype=float)
+    accepted = np.isin(numbers, levels)
+    rejected = ~np.append(accepted, True)[values.codes]
+    return np.append(np.where(accepted, numbers, 0), MISSING_INTEGER).astype(np.int8)[values.codes], rejected
+
+
+# Valid rows of a frame parsed with get_csv_options, typed by the schema registry, and the Rejections of the rest
+def validate_rows(df):
+    typed, rejected = {}, {}
+    for col in [col for col in COLUMN_SCHEMA if col in df]:
+        if col in COLUMN_ORDERS:
+            typed[col], rejected[col] = check_answers(df[col].array, COLUMN_SCHEMA[col])
+        else:
+            typed[col], rejected[col] = check_integers(df[col].array, NUMERIC_LEVELS[col])
+
+    # A valid role count must match valid role flags; a blank count or flag leaves nothing to compare
+    role_counts = mismatch = None
+    if COL_NUMBER_OF_ROLES in typed and all(col in typed for col in ROLE_COLUMNS):
+        role_counts = sum(typed[col] for col in ROLE_COLUMNS)
+        mismatch = typed[COL_NUMBER_OF_ROLES] != role_counts
+        for col in ROLE_COLUMNS + [COL_NUMBER_OF_ROLES]:
+            mismatch &= ~rejected[col] & (typed[col] != MISSING_INTEGER)
+        rejected[COL_NUMBER_OF_ROLES] = rejected[COL_NUMBER_OF_ROLES] | mismatch
+
+    invalid = np.zeros(len(df), dtype=bool)
+    for mask in rejected.values():
+        invalid |= mask
+    counts = pd.Series({col: int(mask.sum()) for col, mask in rejected.items()}, dtype=np.int64)
+    rows = np.flatnonzero(invalid)
+    quarantined = df.iloc[rows]
+    if len(rows):
+        quarantined = quarantined.assign(**{COL_REJECTION_REASONS: describe_rejections(df, rejected, rows,
+                                                                                       role_counts, mismatch)})
+
+    # Typed columns replace the parsed ones in place, leaving the other columns' blocks as they are
+    df = df.assign(**typed)
+    if len(rows):
+        df = df[~invalid].reset_index(drop=True)
+    return df, Rejections(quarantined.reset_index(drop=True), counts)
+
+
+# One line per rejected row, naming every rejected value. Only the rejected rows are visited.
+def describe_rejections(df, rejected, rows, role_counts, mismatch):
+    reasons = [[] for _ in rows]
+    for col, mask in rejected.items():
+        hits = np.flatnonzero(mask[rows])
+        if not len(hits):
+            continue
+        for i, row, value in zip(hits, rows[hits], df[col].to_numpy()[rows[hits]]):
+            if col == COL_NUMBER_OF_ROLES and mismatch[row]:
+                reasons[i].append(f"{col}: {value} but the Role_* flags add up to {role_counts[row]}")
+            else:
+                reasons[i].append(f"{col}: unexpected value '{value}'")
+    return ['; '.join(reason) for reason in reasons]
+
+
+def get_quarantine_path(path):
+    return get_cache_path(path, '.quarantine.csv')
+
+
+# Rejected rows under the export's own headers, so they can be fixed and appended to the export again
+def export_rows(rows):
+    headers = {col: '' if col.startswith('Unnamed: ') else EXPORT_HEADERS.get(col, col) for col in rows.columns}
+    return rows.rename(columns=headers)
+
+
+# Replace the quarantine file of an export; none is kept when nothing was rejected
+def write_quarantine(rejections, path):
+    quarantine_path = get_quarantine_path(path)
+    tmp_path = None
+    try:
+        if not len(rejections.rows):
+            if os.path.exists(quarantine_path):
+                os.remove(quarantine_path)
+            return
+        tmp_path = make_temp_file(quarantine_path)
+        export_rows(rejections.rows).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, quarantine_path)
+    except OSError:
+        # A read-only data directory only loses the file; the rows are left out all the same
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# Add the rejections of rows appended to an export to its quarantine file
+def append_quarantine(rejections, path):
+    if not len(rejections.rows):
+        return
+    quarantine_path = get_quarantine_path(path)
+    try:
+        export_rows(rejections.rows).to_csv(quarantine_path, mode='a', index=False,
+                                            header=not os.path.exists(quarantine_path))
+    except OSError:
+        pass
+
+
+# Rejection summary recorded with the snapshot of an export, None when the snapshot is not of this version
+def read_rejections(path, version):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    try:
+        metadata = pq.read_schema(get_snapshot_path(path)).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    fingerprint = json.loads(metadata.get(SNAPSHOT_META_KEY, b'{}'))
+    if REJECTIONS_META_KEY not in metadata or get_content_version(fingerprint.get('sha256')) != version:
+        return None
+    return json.loads(metadata[REJECTIONS_META_KEY])
+
+
+@st.cache_resource(max_entries=4)
+def load_rejections(version):
+    return read_rejections(DATA_PATH, version)
+
+
+def get_rejections():
+    if STREAMING:
+        from src.streaming import get_streamed_aggregates
+        return get_streamed_aggregates(()).rejected
+    if INCREMENTAL:
+        from src.ingest import get_live_dataset
+        return get_live_dataset().rejected
+    return load_rejections(get_dataset_version())
+
+
+def render_validation_report():
+    from src.contingency import ASSOCIATION_LABELS
+
+    rejected = get_rejections()
+    if not rejected or not rejected['rows']:
+        return
+    st.sidebar.warning(f"{rejected['rows']} response(s) failed validation and are left out of every page. "
+                       f"They are listed with the reasons in {get_quarantine_path(DATA_PATH)}.")
+    st.sidebar.caption("Rejected values: " + ", ".join(f"{ASSOCIATION_LABELS.get(col, col)} ({n})"
+                                                       for col, n in rejected['columns'].items()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Validate a survey export and write its quarantine file.")
+    parser.add_argument('--data', default=DATA_PATH, help="survey CSV to validate")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="rows validated at a time")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    n_rows, rejections = 0, None
+    for df, partial in read_validated_csv_chunks(args.data, chunk_rows=args.chunk_rows):
+        n_rows += len(df) + len(partial.rows)
+        rejections = partial if rejections is None else rejections.merge(partial)
+    # An export without responses yields no chunks
+    if rejections is None:
+        rejections = read_validated_csv(args.data)[1]
+    write_quarantine(rejections, args.data)
+
+    print(f"Checked {n_rows} rows in {time.perf_counter() - start:.2f} s, rejected {len(rejections.rows)}")
+    for col, n in rejections.summary()['columns'].items():
+        print(f"    {n:>8}  {col}")
+    if len(rejections.rows):
+        print(f"Quarantined rows written to {get_quarantine_path(args.data)}")
@@ -1,33 +1,25 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from src.utils import load_data, COL_TALK_FREQUENCY, COL_TALK_DURATION, COL_AGE, COL_GENDER, COL_ATTENDANCE, \
+from src.utils import COL_TALK_FREQUENCY, COL_TALK_DURATION, COL_AGE, COL_GENDER, COL_ATTENDANCE, \
     COL_EXPERIENCE, COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ, COL_IMPACT_ATMOSPHERE, COL_TALK_PERCEPTION, TALK_FREQUENCY, \
     TALK_DURATION
-
-# Mapping for scores
-frequency_map = {'Never': 0, 'Rarely': 1, 'Sometimes': 2, 'Often': 4, 'Always': 6}
-duration_map = {'Just a few words': 1, '1-5 minutes': 3, '>5 minutes': 5}
-
-# Weights for frequency and duration
-frequency_weight = 0.7
-duration_weight = 0.3
-
-# Calculate maximum possible Yapping Factor
-max_yapping_factor = (max(frequency_map.values()) * frequency_weight) + (max(duration_map.values()) * duration_weight)
-
-def calculate_normalized_yapping_factor(frequency, duration):
-    frequency_score = frequency_map[frequency]
-    duration_score = duration_map[duration]
-
-    yapping_factor = (frequency_score * frequency_weight) + (duration_score * duration_weight)
-    if frequency == 'Never':
-        yapping_factor = 0
-    normalized_factor = (yapping_factor / max_yapping_factor) * 100
-    return normalized_factor
-
-def calculate_yapping_factor(row):
-    return calculate_normalized_yapping_factor(row[COL_TALK_FREQUENCY], row[COL_TALK_DURATION])
+from src.scoring import score_table, frequency_map_variants
+from src import analytics
+from src.cube import load_cube
+from src.filters import get_filter_key
+from src.derived import load_yapping_histogram
+from src.figure_cache import plot_figure
+
+# Breakdown variables offered for each breakdown variable type
+BREAKDOWN_VARIABLES = {
+    "Demographics": [COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE],
+    "Perception of Talking": [COL_TALK_PERCEPTION],
+    "Impact of Talking": [COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ, COL_IMPACT_ATMOSPHERE]
+}
+
+# Starting values of the sensitivity analysis controls
+SENSITIVITY_WEIGHT_RANGE = (0.5, 0.9)
+SENSITIVITY_COPIES = 5
+SENSITIVITY_SPREAD = 0.2
 
 def interpret_yapping_factor(user_yapping):
     if user_yapping == 0:
@@ -46,9 +38,10 @@ def interpret_yapping_factor(user_yapping):
         return "🏆 Maximum Yapper Achievement Unlocked! You're the life of the party... or are you? 🎉"
 
 def app():
+    from src import figures
+
     st.header("Yapping Factor Analysis")
-    df = load_data()
-    df['YAPPING_FACTOR'] = df.apply(calculate_yapping_factor, axis=1)
+    cube = load_cube()
 
     st.write("""
     Welcome to the Yapping Factor Analysis! The Yapping Factor combines talking frequency 
@@ -57,16 +50,12 @@ def app():
 
     # Histogram of Yapping Factor
     st.subheader("Distribution of Yapping Factor")
-    fig_hist = px.histogram(df, x='YAPPING_FACTOR', nbins=20)
-    fig_hist.update_layout(
-        title_text='Distribution of Yapping Factor',
-        xaxis_title="Yapping Factor",
-        yaxis_title="Number of Participants"
-    )
-    fig_hist.update_traces(
-        hovertemplate="Yapping Factor: %{x:.2f}<br>Count: %{y}"
-    )
-    st.plotly_chart(fig_hist, use_container_width=True)
+
+    def build_histogram():
+        # Binned server-side into the same 20-bin layout plotly would pick; only one bar per bin is sent
+        return figures.yapping_histogram_chart(load_yapping_histogram(get_filter_key(), nbins=20))
+
+    plot_figure('yapping_factor', 'histogram', (), build_histogram)
 
     st.subheader("Yapping Factor Breakdown")
     analysis_type = "Yapping Factor"
@@ -82,64 +71,64 @@ def app():
     # Secondary variable selection
     secondary_var_type = st.selectbox(
         "Select breakdown variable type:",
-        ["Demographics", "Perception of Talking", "Impact of Talking"]
+        list(BREAKDOWN_VARIABLES)
     )
 
     # Options for secondary variable based on type
     if secondary_var_type == "Demographics":
         secondary_var = st.radio(
             "Select demographic variable:",
-            [COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE]
+            BREAKDOWN_VARIABLES["Demographics"]
         )
     elif secondary_var_type == "Perception of Talking":
-        secondary_var = COL_TALK_PERCEPTION
+        secondary_var = BREAKDOWN_VARIABLES["Perception of Talking"][0]
     else:  # Impact of Talking
         secondary_var = st.radio(
             "Select impact type:",
-            [COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ, COL_IMPACT_ATMOSPHERE]
+            BREAKDOWN_VARIABLES["Impact of Talking"]
         )
 
-    # Create visualization based on selections
-    if primary_var == "YAPPING_FACTOR":
-        data = df.groupby(secondary_var)[primary_var].mean().reset_index()
-        fig = px.bar(data, x=secondary_var, y=primary_var,
-                     title=f"Average {analysis_type} by {secondary_var}")
-        fig.update_traces(
-            hovertemplate=f"{secondary_var}: %{{x}}<br>{analysis_type}: %{{y:.2f}}"
-        )
-    else:
-        data = df.groupby([secondary_var, primary_var]).size().reset_index(name='count')
-        fig = px.bar(data, x=secondary_var, y='count', color=primary_var,
-                     title=f"{analysis_type} Distribution by {secondary_var}")
-        fig.update_traces(
-            hovertemplate=f"{secondary_var}: %{{x}}<br>{primary_var}: %{{color}}<br>Count: %{{y}}"
-        )
-
-    # Update layout
-    fig.update_layout(xaxis_title=secondary_var, yaxis_title=analysis_type if primary_var == "YAPPING_FACTOR" else "Count")
-
     # Display the plot
-    st.plotly_chart(fig, use_container_width=True)
+    plot_figure('yapping_factor', 'breakdown', [primary_var, secondary_var],
+                lambda: figures.yapping_breakdown_chart(cube, secondary_var, primary_var, analysis_type))
 
     # Additional insights
     st.subheader("Key Insights")
 
     if primary_var == "YAPPING_FACTOR":
-        avg_value = df[primary_var].mean()
-        max_value = df[primary_var].max()
-        min_value = df[primary_var].min()
+        avg_value, max_value, min_value = analytics.yapping_summary(cube)
 
         st.write(f"Average {analysis_type}: {avg_value:.2f}")
         st.write(f"Maximum {analysis_type}: {max_value:.2f}")
         st.write(f"Minimum {analysis_type}: {min_value:.2f}")
 
+    # What-if analysis over alternative weights and score mappings
+    st.subheader("Sensitivity Analysis")
+    if st.checkbox("Explore how robust the breakdown is to the Yapping Factor weights and mappings"):
+        col1, col2 = st.columns(2)
+        with col1:
+            weight_range = st.slider("Frequency weight range (duration weight = 1 - frequency weight):",
+                                     0.05, 0.95, SENSITIVITY_WEIGHT_RANGE, step=0.05)
+            map_names = st.multiselect("Score mappings:", list(frequency_map_variants), default=list(frequency_map_variants))
+        with col2:
+            copies = st.slider("Random jittered copies per mapping:", 0, 20, SENSITIVITY_COPIES)
+            spread = st.slider("Jitter spread (+/- fraction of each score):", 0.0, 0.5, SENSITIVITY_SPREAD, step=0.05)
+
+        summary, n_variants = analytics.yapping_sensitivity(cube, secondary_var, weight_range, map_names, copies, spread)
+        st.write(f"Scored {cube.total()} participants under {n_variants} weight/mapping variants.")
+
+        selections = [secondary_var, weight_range, tuple(map_names), copies, spread]
+        plot_figure('yapping_factor', 'sensitivity', selections,
+                    lambda: figures.sensitivity_chart(summary, secondary_var, analysis_type))
+        st.dataframe(summary.style.format(precision=2), use_container_width=True)
+
     # Allow users to input their own data
     st.header("Calculate Your Own Yapping Factor!")
 
     user_frequency = st.selectbox("Select your talking frequency:", TALK_FREQUENCY)
     user_duration = st.selectbox("Select your typical talking duration:", TALK_DURATION)
 
-    user_yapping = calculate_normalized_yapping_factor(user_frequency, user_duration)
+    user_yapping = score_table[TALK_FREQUENCY.index(user_frequency), TALK_DURATION.index(user_duration)]
     st.write(f"Your Normalized Yapping Factor is: {user_yapping:.2f}")
 
     yapping_interpretation = interpret_yapping_factor(user_yapping)
@@ -161,8 +150,13 @@ def app():
     3. **Yapping Factor Breakdown**:
        - These show how the Yapping Factor relates to other aspects of the rave experience.
        - You can choose what to analyze using the dropdown menu and radio button.
+       - The error bars show a 95% confidence interval, from re-drawing each group's participants 10,000 times. Wide bars mean a group is too small for its average to be trusted.
+
+    4. **Sensitivity Analysis**:
+       - Rescores everyone under many alternative weights and score mappings at once.
+       - The error bars show the lowest and highest group average across all variants, and the table shows how often each group keeps its rank.
 
-    4. **Your Own Yapping Factor**:
+    5. **Your Own Yapping Factor**:
        - You can calculate your personal Yapping Factor based on how often and how long you typically talk at raves.
     
     """)
\ No newline at end of file
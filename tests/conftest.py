@@ -0,0 +1,62 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pandas as pd
+import pytest
+
+# The dashboard runs from the repository root, with data/ and the src package relative to it
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+# Snapshots, databases and quarantine files of the test runs go to a directory of their own, not data/.cache
+CACHE_DIR = tempfile.mkdtemp(prefix='dancefloor-cache-')
+os.environ['DANCEFLOOR_CACHE_DIR'] = CACHE_DIR
+
+from src.utils import DATA_PATH, COLUMN_ORDERS  # noqa: E402
+
+
+# The bundled survey as the pages loaded it before the refactors: the raw CSV with ordered categoricals
+@pytest.fixture(scope='session')
+def survey():
+    df = pd.read_csv(DATA_PATH)
+    for col, order in COLUMN_ORDERS.items():
+        if col in df:
+            df[col] = pd.Categorical(df[col], categories=order, ordered=True)
+    return df
+
+
+@pytest.fixture(scope='session')
+def cube():
+    from src.analytics import build_dataset_cube
+
+    return build_dataset_cube(DATA_PATH)
+
+
+# Benchmarks compare wall time and peak memory against benchmarks/baseline.json, which only means something on the
+# machine that recorded it, so they are marked benchmark and only run with --benchmark. The sizes in
+# benchmark.LARGE_SIZES are also marked large and need --large, which implies --benchmark.
+def pytest_addoption(parser):
+    parser.addoption('--benchmark', action='store_true', help="run the benchmarks against the baseline")
+    parser.addoption('--large', action='store_true', help="also run the benchmarks at the large survey sizes")
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "benchmark: timing benchmark, run only with --benchmark")
+    config.addinivalue_line('markers', "large: benchmark at a large survey size, run only with --large")
+
+
+def pytest_collection_modifyitems(config, items):
+    large = config.getoption('--large')
+    benchmark = large or config.getoption('--benchmark')
+    for item in items:
+        if 'large' in item.keywords and not large:
+            item.add_marker(pytest.mark.skip(reason="large survey size, run with --large"))
+        elif 'benchmark' in item.keywords and not benchmark:
+            item.add_marker(pytest.mark.skip(reason="timing benchmark, run with --benchmark"))
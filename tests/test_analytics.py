@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src import analytics
+from src.utils import COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE, COL_TALK_FREQUENCY, COL_TALK_DURATION, \
+    COL_TALK_PERCEPTION, COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ, COL_IMPACT_ATMOSPHERE, COL_QUIET_IMPORTANCE, \
+    COL_LIKELIHOOD_INTERVENE, ROLES, IMPACT_DJ
+from src.scoring import frequency_map, duration_map, frequency_weight, duration_weight
+
+# Parity of the analytics core with the pandas computations the pages made before it existed (baseline commit
+# 5e8a265), run on the raw survey. Charts added since are checked against the direct pandas computation.
+
+DEMOGRAPHIC_COLUMNS = [COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE]
+IMPACT_COLUMNS = [COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ, COL_IMPACT_ATMOSPHERE]
+BREAKDOWN_COLUMNS = [COL_TALK_FREQUENCY, COL_TALK_DURATION] + DEMOGRAPHIC_COLUMNS
+YAPPING_BREAKDOWNS = DEMOGRAPHIC_COLUMNS + [COL_TALK_PERCEPTION] + IMPACT_COLUMNS
+
+
+# Yapping Factor per respondent, scored row by row as the baseline page did
+def baseline_scores(survey):
+    max_yapping_factor = max(frequency_map.values()) * frequency_weight + max(duration_map.values()) * duration_weight
+
+    def score(row):
+        if row[COL_TALK_FREQUENCY] == 'Never':
+            return 0.0
+        factor = frequency_map[row[COL_TALK_FREQUENCY]] * frequency_weight + \
+            duration_map[row[COL_TALK_DURATION]] * duration_weight
+        return factor / max_yapping_factor * 100
+
+    return survey.apply(score, axis=1)
+
+
+def assert_series(actual, expected):
+    assert list(actual.index) == list(expected.index)
+    np.testing.assert_allclose(actual.to_numpy(dtype=float), expected.to_numpy(dtype=float), rtol=1e-12)
+
+
+def assert_frame(actual, expected):
+    assert list(actual.index) == list(expected.index)
+    assert list(actual.columns) == list(expected.columns)
+    np.testing.assert_allclose(actual.to_numpy(dtype=float), expected.to_numpy(dtype=float), rtol=1e-12)
+
+
+# Demographics
+
+def test_total_participants(survey, cube):
+    assert analytics.total_participants(cube) == len(survey)
+
+
+@pytest.mark.parametrize('function, column', [(analytics.age_distribution, COL_AGE),
+                                              (analytics.experience_distribution, COL_EXPERIENCE)])
+def test_bar_distributions(survey, cube, function, column):
+    assert_series(function(cube), survey[column].value_counts().sort_index())
+
+
+@pytest.mark.parametrize('function, column', [(analytics.gender_distribution, COL_GENDER),
+                                              (analytics.attendance_distribution, COL_ATTENDANCE)])
+def test_pie_distributions(survey, cube, function, column):
+    assert_series(function(cube), survey[column].value_counts())
+
+
+def test_role_distribution(survey, cube):
+    roles = ['Role_Attendee/Raver', 'Role_DJ', 'Role_Producer', 'Role_Event organizer', 'Role_Club staff',
+             'Role_Other']
+    assert_series(analytics.role_distribution(cube), survey[roles].sum().sort_values(ascending=False))
+
+
+# Talking behaviour
+
+@pytest.mark.parametrize('function, column', [(analytics.talk_frequency_distribution, COL_TALK_FREQUENCY),
+                                              (analytics.talk_duration_distribution, COL_TALK_DURATION),
+                                              (analytics.talk_perception_distribution, COL_TALK_PERCEPTION)])
+def test_talk_distributions(survey, cube, function, column):
+    assert_series(function(cube), survey[column].value_counts().sort_index())
+
+
+# Impact analysis
+
+@pytest.mark.parametrize('column', IMPACT_COLUMNS)
+def test_impact_distribution(survey, cube, column):
+    assert_series(analytics.impact_distribution(cube, column), survey[column].value_counts())
+
+
+@pytest.mark.parametrize('column', IMPACT_COLUMNS)
+def test_impact_by_role(survey, cube, column):
+    percentages, counts = [], []
+    for category in IMPACT_DJ:
+        row_percentages, row_counts = [], []
+        for role in ROLES:
+            role_data = survey[survey[f'Role_{role}'] == 1]
+            count = role_data[column].value_counts().get(category, 0)
+            total = len(role_data)
+            row_percentages.append((count / total * 100) if total > 0 else 0)
+            row_counts.append(count)
+        percentages.append(row_percentages)
+        counts.append(row_counts)
+
+    actual_percentages, actual_counts = analytics.impact_by_role(cube, column)
+    assert_frame(actual_percentages, pd.DataFrame(percentages, columns=ROLES, index=IMPACT_DJ))
+    assert_frame(actual_counts, pd.DataFrame(counts, columns=ROLES, index=IMPACT_DJ))
+
+
+@pytest.mark.parametrize('breakdown', BREAKDOWN_COLUMNS)
+@pytest.mark.parametrize('impact', IMPACT_COLUMNS)
+def test_impact_breakdown(survey, cube, breakdown, impact):
+    impact_data = survey.groupby(breakdown, observed=False)[impact].value_counts().unstack(fill_value=0)
+    impact_percentages = (impact_data.div(impact_data.sum(axis=1), axis=0) * 100).reset_index()
+    expected = pd.melt(impact_percentages, id_vars=[breakdown], value_vars=analytics.IMPACT_BREAKDOWN_ORDER,
+                       var_name='Impact', value_name='Percentage')
+    expected['Count'] = pd.melt(impact_data.reset_index(), id_vars=[breakdown],
+                                value_vars=analytics.IMPACT_BREAKDOWN_ORDER, var_name='Impact',
+                                value_name='Count')['Count']
+
+    actual = analytics.impact_breakdown(cube, breakdown, impact)
+    assert actual[breakdown].astype(str).tolist() == expected[breakdown].astype(str).tolist()
+    assert actual['Impact'].tolist() == expected['Impact'].tolist()
+    np.testing.assert_allclose(actual['Percentage'], expected['Percentage'], rtol=1e-12)
+    np.testing.assert_array_equal(actual['Count'], expected['Count'])
+
+
+# Quiet importance
+
+def test_quiet_heatmap(survey, cube):
+    heatmap_data = survey.groupby([COL_QUIET_IMPORTANCE, COL_LIKELIHOOD_INTERVENE]).size().unstack(fill_value=0)
+    for i in range(1, 6):
+        if i not in heatmap_data.index:
+            heatmap_data.loc[i] = 0
+        if i not in heatmap_data.columns:
+            heatmap_data[i] = 0
+    heatmap_data = heatmap_data.sort_index().sort_index(axis=1).T
+
+    counts, percentages = analytics.quiet_heatmap(cube)
+    assert_frame(counts, heatmap_data)
+    assert_frame(percentages, heatmap_data.div(heatmap_data.sum().sum()) * 100)
+
+
+def test_quiet_averages(survey, cube):
+    importance, likelihood = analytics.quiet_averages(cube)
+    assert importance == pytest.approx(survey[COL_QUIET_IMPORTANCE].mean(), rel=1e-12)
+    assert likelihood == pytest.approx(survey[COL_LIKELIHOOD_INTERVENE].mean(), rel=1e-12)
+
+
+@pytest.mark.parametrize('column', DEMOGRAPHIC_COLUMNS)
+def test_likelihood_by_importance(survey, cube, column):
+    expected = survey.groupby([COL_QUIET_IMPORTANCE, column], observed=False)[COL_LIKELIHOOD_INTERVENE] \
+        .mean().unstack()
+    assert_frame(analytics.likelihood_by_importance(cube, column), expected)
+
+
+# Yapping factor
+
+def test_score_counts(survey, cube):
+    expected = baseline_scores(survey).value_counts().sort_index()
+    assert_series(analytics.score_counts(baseline_scores(survey)), expected)
+    assert_series(analytics.cube_score_counts(cube), expected)
+
+
+def test_yapping_histogram(survey):
+    scores = baseline_scores(survey)
+    histogram = analytics.yapping_histogram(scores.to_numpy(), nbins=20)
+    edges = np.asarray(histogram['edges'])
+    np.testing.assert_allclose(np.diff(edges), histogram['size'])
+    assert edges[0] <= scores.min() and scores.max() < edges[-1]
+    # Bars run from the first to the last non-empty bin
+    expected = np.histogram(scores, bins=edges)[0]
+    filled = np.flatnonzero(expected)
+    np.testing.assert_array_equal(histogram['counts'], expected[filled[0]:filled[-1] + 1])
+    np.testing.assert_allclose(histogram['centers'], ((edges[:-1] + edges[1:]) / 2)[filled[0]:filled[-1] + 1])
+
+
+@pytest.mark.parametrize('column', YAPPING_BREAKDOWNS)
+def test_yapping_by_group(survey, cube, column):
+    expected = survey.assign(YAPPING_FACTOR=baseline_scores(survey)) \
+        .groupby(column, observed=False)['YAPPING_FACTOR'].mean()
+    assert_series(analytics.yapping_by_group(cube, column), expected)
+
+
+@pytest.mark.parametrize('answer_column', [COL_TALK_FREQUENCY, COL_TALK_DURATION])
+@pytest.mark.parametrize('column', YAPPING_BREAKDOWNS)
+def test_answers_by_group(survey, cube, column, answer_column):
+    expected = survey.groupby([column, answer_column], observed=False).size().reset_index(name='count')
+    actual = analytics.answers_by_group(cube, column, answer_column)
+    for col in [column, answer_column]:
+        assert actual[col].astype(str).tolist() == expected[col].astype(str).tolist()
+    np.testing.assert_array_equal(actual['count'], expected['count'])
+
+
+def test_yapping_summary(survey, cube):
+    scores = baseline_scores(survey)
+    average, maximum, minimum = analytics.yapping_summary(cube)
+    assert average == pytest.approx(scores.mean(), rel=1e-12)
+    assert maximum == pytest.approx(scores.max(), rel=1e-12)
+    assert minimum == pytest.approx(scores.min(), rel=1e-12)
+
+
+@pytest.mark.parametrize('column', YAPPING_BREAKDOWNS)
+def test_yapping_sensitivity(survey, cube, column):
+    summary, n_variants = analytics.yapping_sensitivity(cube, column, (0.5, 0.9), ['Default', 'Linear'], 2, 0.2)
+    # 9 weights x (2 maps x 3 copies) frequency x (2 maps x 3 copies) duration mappings
+    assert n_variants == 9 * 6 * 6
+    expected = survey.assign(YAPPING_FACTOR=baseline_scores(survey)) \
+        .groupby(column, observed=False)['YAPPING_FACTOR'].mean()
+    assert_series(summary['Baseline mean'], expected)
+    answered = expected.notna()
+    assert (summary['Min mean'][answered] <= expected[answered] + 1e-12).all()
+    assert (expected[answered] <= summary['Max mean'][answered] + 1e-12).all()
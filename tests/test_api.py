@@ -0,0 +1,76 @@
+import json
+import threading
+from http.client import HTTPConnection
+
+import pytest
+from src.utils import DATA_PATH, COL_AGE, COL_GENDER, read_csv
+from src.api import APIServer, BadRequest, parse_query, ENDPOINTS
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = APIServer(('127.0.0.1', 0), workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def get(server):
+    def get(path, **headers):
+        connection = HTTPConnection(*server.server_address, timeout=30)
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+    return get
+
+
+def test_etag_revalidation(get):
+    response, body = get('/participants')
+    etag = response.getheader('ETag')
+    assert response.status == 200 and etag.startswith('"') and response.getheader('Cache-Control') == 'no-cache'
+    assert json.loads(body)['data'] == {'Participants': len(read_csv(DATA_PATH))}
+
+    for header in [etag, f'W/{etag}', f'"stale", {etag}', '*']:
+        response, body = get('/participants', **{'If-None-Match': header})
+        assert (response.status, body, response.getheader('ETag')) == (304, b'', etag)
+    response, _ = get('/participants', **{'If-None-Match': '"stale"'})
+    assert response.status == 200
+
+
+def test_filters(get):
+    response, body = get('/participants?Gender=Female&Gender=Male')
+    assert response.status == 200
+    payload = json.loads(body)
+    assert payload['filters'] == {'Gender': ['Male', 'Female']}
+    assert payload['data']['Participants'] == read_csv(DATA_PATH)[COL_GENDER].isin(['Male', 'Female']).sum()
+
+
+@pytest.mark.parametrize('path, error', [
+    ('/participants?colour=red', "Unknown parameters: colour"),
+    ('/impact/roles', "Expected one 'impact'"),
+    ('/impact/roles?impact=Loudness', "Unknown impact 'Loudness'"),
+    ('/trends?period=Day&period=Week', "Expected one 'period'"),
+    ('/participants?Gender=Robot', "Unknown Gender 'Robot'"),
+])
+def test_bad_requests(get, path, error):
+    response, body = get(path)
+    assert response.status == 400
+    assert json.loads(body)['error'].startswith(error)
+
+
+def test_unknown_endpoint(get):
+    response, _ = get('/nothing')
+    assert response.status == 404
+
+
+def test_parse_query():
+    parameters = ENDPOINTS['/trends'][0]
+    assert parse_query(parameters, 'period=Week&Age=25-34&Gender=Female&Age=18-24') == \
+        ({'period': 'Week'}, ((COL_AGE, ('18-24', '25-34')), (COL_GENDER, ('Female',))))
+    with pytest.raises(BadRequest):
+        parse_query(parameters, 'period=Week&Age=')
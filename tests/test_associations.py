@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import chi2_contingency
+from src import analytics
+from src.contingency import ASSOCIATION_COLUMNS, ASSOCIATION_LABELS
+from src.utils import DATA_PATH, read_dataset
+
+# Associations against chi-square tests from scipy on pandas crosstabs of each pair, run on the raw survey
+
+
+def test_pairwise_association():
+    df = read_dataset(DATA_PATH, ASSOCIATION_COLUMNS)
+    columns = {ASSOCIATION_LABELS[col]: col for col in ASSOCIATION_COLUMNS}
+    pairs = analytics.pairwise_association(analytics.build_dataset_contingency(DATA_PATH))
+    assert len(pairs) == len(ASSOCIATION_COLUMNS) * (len(ASSOCIATION_COLUMNS) - 1) // 2
+    for _, pair in pairs.iterrows():
+        table = pd.crosstab(df[columns[pair['Question']]], df[columns[pair['Other question']]])
+        table = table.loc[table.sum(axis=1) > 0, table.sum() > 0]
+        n = table.to_numpy().sum()
+        assert pair['Respondents'] == n
+        if min(table.shape) < 2:
+            assert np.isnan(pair["Cramér's V"])
+            continue
+        statistic, p_value, dof, _ = chi2_contingency(table, correction=False)
+        assert pair['Chi-square'] == pytest.approx(statistic, rel=1e-9)
+        assert pair['p-value'] == pytest.approx(p_value, rel=1e-6)
+        assert pair['Degrees of freedom'] == dof
+        assert pair["Cramér's V"] == pytest.approx(np.sqrt(statistic / (n * (min(table.shape) - 1))), rel=1e-9)
+
+
+def test_association_matrix():
+    pairs = analytics.pairwise_association(analytics.build_dataset_contingency(DATA_PATH))
+    matrix = analytics.association_matrix(pairs)
+    np.testing.assert_array_equal(matrix.to_numpy(), matrix.to_numpy().T)
+    np.testing.assert_array_equal(np.diag(matrix), 1)
+    for _, pair in pairs.iterrows():
+        np.testing.assert_array_equal(matrix.loc[pair['Question'], pair['Other question']], pair["Cramér's V"])
+
+    ranked = analytics.association_matrix(pairs, order='strength')
+    assert sorted(ranked.index) == sorted(matrix.index)
+    pd.testing.assert_frame_equal(ranked, matrix.loc[ranked.index, ranked.columns])
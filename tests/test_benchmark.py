@@ -0,0 +1,63 @@
+import json
+import os
+
+import pytest
+
+from src.benchmark import SIZES, LARGE_SIZES, benchmark_size, find_regressions
+
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+
+
+@pytest.fixture(scope='module')
+def baseline():
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+# Synthetic surveys are generated once per test run, outside the repository
+@pytest.fixture(scope='module')
+def work_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp('benchmark'))
+
+
+# Every stage runs at the smallest size, without timing anything, and the baseline has an entry for each
+def test_smoke(baseline, work_dir):
+    stages = benchmark_size(SIZES[0], baseline['seed'], repeat=1, work_dir=work_dir)
+    assert list(stages) == list(baseline['sizes'][str(SIZES[0])])
+    assert all(result['peak_bytes'] >= 0 for result in stages.values())
+
+
+# Every stage at every size against the committed baseline, with the defaults of python -m src.benchmark.
+# Timings on a shared machine are noisy, so a size with regressions is run once more and every stage keeps its
+# best time and peak of the two runs.
+@pytest.mark.benchmark
+@pytest.mark.parametrize('n_rows', SIZES + [pytest.param(n_rows, marks=pytest.mark.large) for n_rows in LARGE_SIZES])
+def test_no_regressions(baseline, work_dir, n_rows):
+    stages = benchmark_size(n_rows, baseline['seed'], baseline['repeat'], work_dir)
+    regressions = find_regressions(baseline, {'sizes': {str(n_rows): stages}})
+    if regressions:
+        rerun = benchmark_size(n_rows, baseline['seed'], baseline['repeat'], work_dir)
+        stages = {stage: {metric: min(result[metric], rerun[stage][metric]) for metric in ('seconds', 'peak_bytes')}
+                  for stage, result in stages.items()}
+        regressions = find_regressions(baseline, {'sizes': {str(n_rows): stages}})
+    assert not regressions, '\n'.join(f"{int(size):,} rows {stage} {metric}: {old} -> {new}"
+                                      for size, stage, metric, old, new in regressions)
+
+
+def test_missing_stages_fail():
+    result = {'seconds': 0.1, 'rows_per_second': 10**4, 'peak_bytes': 10**6}
+    baseline = {'sizes': {'1000': {'cube': result}}}
+    current = {'sizes': {'1000': {'cube': result, 'timeline': result}, '10000': {'cube': result}}}
+    assert find_regressions(baseline, current) == [('1000', 'timeline', 'missing', None, 0.1),
+                                                   ('10000', 'cube', 'missing', None, 0.1)]
+
+
+def test_slower_and_hungrier_stages_fail():
+    old = {'seconds': 0.1, 'rows_per_second': 10**4, 'peak_bytes': 10**6}
+    baseline = {'sizes': {'1000': {'cube': old, 'scores': old, 'timeline': old}}}
+    current = {'sizes': {'1000': {
+        'cube': {'seconds': 0.2, 'rows_per_second': 5000, 'peak_bytes': 10**6},
+        'scores': {'seconds': 0.1, 'rows_per_second': 10**4, 'peak_bytes': 2 * 10**6},
+        'timeline': {'seconds': 0.12, 'rows_per_second': 8000, 'peak_bytes': 1.2 * 10**6}}}}
+    assert find_regressions(baseline, current) == [('1000', 'cube', 'seconds', 0.1, 0.2),
+                                                   ('1000', 'scores', 'peak_bytes', 10**6, 2 * 10**6)]
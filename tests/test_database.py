@@ -0,0 +1,31 @@
+import importlib.util
+
+import pytest
+from src.database import check_parity
+from src.utils import DATA_PATH
+
+# The database backend answers with GROUP BY queries. check_parity holds its cube, pair counts, timeline and every
+# report chart to the pandas aggregates, for the bundled survey and a larger synthetic one with unanswered
+# questions, on every engine that is installed.
+
+ENGINES = ['sqlite', pytest.param('duckdb', marks=pytest.mark.skipif(importlib.util.find_spec('duckdb') is None,
+                                                                     reason="duckdb is not installed"))]
+
+
+@pytest.fixture(scope='module')
+def synthetic_survey(tmp_path_factory):
+    from src.synthetic import write_survey
+
+    path = str(tmp_path_factory.mktemp('database') / 'parity_survey.csv')
+    write_survey(path, 5000, seed=3)
+    return path
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_parity_bundled_survey(engine):
+    assert check_parity(DATA_PATH, engine) == []
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_parity_synthetic_survey(synthetic_survey, engine):
+    assert check_parity(synthetic_survey, engine) == []
@@ -0,0 +1,52 @@
+import plotly.graph_objects as go
+
+from src import figure_cache
+from src.figure_cache import FigureCache, cached_figure
+
+
+def test_least_recently_used_are_evicted_by_bytes():
+    cache = FigureCache(100)
+    cache.put('a', b'x' * 40)
+    cache.put('b', b'x' * 40)
+    assert cache.get('a') == b'x' * 40
+    cache.put('c', b'x' * 40)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (b'x' * 40, b'x' * 40)
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'evictions': 1, 'entries': 2, 'bytes': 80, 'budget': 100}
+
+    # Replacing an entry frees its old size; values larger than the budget are never kept
+    cache.put('a', b'x' * 10)
+    assert cache.stats()['bytes'] == 50
+    cache.put('d', b'x' * 101)
+    assert cache.get('d') is None
+    assert cache.stats()['bytes'] == 50
+
+
+def test_sizes_are_given_for_objects():
+    cache = FigureCache(100)
+    cache.put('a', object(), 60)
+    cache.put('b', object(), 60)
+    assert cache.get('a') is None
+    assert cache.stats()['bytes'] == 60
+
+
+def test_cached_figure_is_built_once(monkeypatch):
+    cache = FigureCache(10 ** 6)
+    monkeypatch.setattr(figure_cache, 'get_figure_cache', lambda: cache)
+    monkeypatch.setattr(figure_cache, 'get_dataset_version', lambda: 'v1')
+    monkeypatch.setattr(figure_cache, 'get_filter_key', lambda: ())
+    builds = []
+
+    def build():
+        builds.append(1)
+        return go.Figure(go.Bar(x=['a', 'b'], y=[1, 2]))
+
+    first = cached_figure('page', 'chart', ['x'], build)
+    assert cached_figure('page', 'chart', ['x'], build) is first
+    assert len(builds) == 1
+    assert cache.stats()['bytes'] == len(first.to_json())
+
+    cached_figure('page', 'chart', ['y'], build)
+    monkeypatch.setattr(figure_cache, 'get_dataset_version', lambda: 'v2')
+    cached_figure('page', 'chart', ['x'], build)
+    assert len(builds) == 3
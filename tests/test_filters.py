@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from src.utils import DATA_PATH, COL_AGE, COL_GENDER, COL_ATTENDANCE, ROLE_COLUMNS, ROLES, read_csv
+from src.filters import ROLE_FILTER, build_bitmap_index, select_rows
+
+# Bitmap filters against pandas boolean masks over the bundled survey
+
+SELECTIONS = [
+    (),
+    ((COL_GENDER, ('Female',)),),
+    ((COL_AGE, ('18-24', '25-34')), (COL_GENDER, ('Male', 'Female'))),
+    ((ROLE_FILTER, (ROLES[0], ROLES[-1])), (COL_ATTENDANCE, ('Weekly',))),
+    ((COL_GENDER, ()),),
+]
+
+
+@pytest.fixture(scope='module')
+def df():
+    return read_csv(DATA_PATH)
+
+
+def pandas_mask(df, selections):
+    mask = np.ones(len(df), dtype=bool)
+    for column, levels in selections:
+        if column == ROLE_FILTER:
+            roles = [col for role, col in zip(ROLES, ROLE_COLUMNS) if role in levels]
+            mask &= (df[roles] == 1).any(axis=1).to_numpy()
+        else:
+            mask &= df[column].isin(levels).to_numpy()
+    return mask
+
+
+@pytest.mark.parametrize('selections', SELECTIONS)
+def test_select_rows(df, selections):
+    expected = pandas_mask(df, selections)
+    np.testing.assert_array_equal(select_rows(df, selections), expected)
+    index = build_bitmap_index(df)
+    assert index.count(index.select(selections)) == expected.sum()
+
+
+# Splits that leave the first part on and off a byte boundary
+@pytest.mark.parametrize('split', [1, 8, 61])
+def test_append(df, split):
+    joined = build_bitmap_index(df.iloc[:split]).append(build_bitmap_index(df.iloc[split:]))
+    full = build_bitmap_index(df)
+    assert joined.n_rows == full.n_rows
+    for column, levels in full.bitmaps.items():
+        for level, bitmap in levels.items():
+            np.testing.assert_array_equal(joined.bitmaps[column][level], bitmap)
@@ -0,0 +1,145 @@
+import csv
+import io
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils import DATA_PATH, COL_GENDER, COL_ANYTHING_ELSE, EXPORT_HEADERS, TEXT_COLUMNS, read_csv
+from src import ingest
+from src.ingest import LiveDataset, IncrementalCache, record_end
+from src.cube import live_cubes
+from src.text_index import live_text_index
+from src.timeline import live_timelines
+from src.database import same_timeline
+
+FILTER = ((COL_GENDER, ('Female',)),)
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / 'survey.csv'
+    shutil.copy(DATA_PATH, path)
+    return str(path)
+
+
+@pytest.fixture
+def live(export):
+    live = LiveDataset(export)
+    live.refresh()
+    yield live
+    ingest.pinned.state = None
+
+
+def read_records(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+# CSV bytes of a copy of the last response, with the given Timestamp and changes by export header
+def make_record(path, timestamp, **changes):
+    header, *rows = read_records(path)
+    row = rows[-1][:]
+    row[header.index('Timestamp')] = timestamp
+    for name, value in changes.items():
+        row[header.index(name)] = value
+    text = io.StringIO()
+    csv.writer(text, lineterminator='\n').writerow(row)
+    return text.getvalue().encode()
+
+
+def append_bytes(path, data):
+    with open(path, 'ab') as f:
+        f.write(data)
+
+
+def assert_matches_export(live, path):
+    pd.testing.assert_frame_equal(live.state.frame, read_csv(path))
+
+
+def test_record_end():
+    assert record_end(b'a,b\n1,2\n3,') == 8
+    assert record_end(b'a,b\n1,"two\nlines"\n') == 18
+    assert record_end(b'a,b\n1,"two\nli') == 4
+
+
+def test_appended_rows_are_kept_whatever_their_timestamp(live, export):
+    n_rows, watermark = live.state.n_rows, live.state.watermark
+    append_bytes(export, make_record(export, '9/30/2024 12:00:00') + make_record(export, '7/01/2024 12:00:00'))
+    state = live.refresh()
+    assert (state.epoch, state.n_rows, state.appended) == (0, n_rows + 2, 2)
+    assert state.watermark == pd.Timestamp('2024-09-30 12:00:00') > watermark
+    assert_matches_export(live, export)
+
+
+def test_partial_record_waits_for_the_next_refresh(live, export):
+    n_rows = live.state.n_rows
+    record = make_record(export, '9/30/2024 12:00:00')
+    append_bytes(export, record[:len(record) // 2])
+    assert live.refresh().n_rows == n_rows
+    append_bytes(export, record[len(record) // 2:])
+    assert live.refresh().n_rows == n_rows + 1
+    assert_matches_export(live, export)
+
+
+def test_multiline_answer_split_across_appends(live, export):
+    n_rows = live.state.n_rows
+    header = EXPORT_HEADERS.get(COL_ANYTHING_ELSE, COL_ANYTHING_ELSE)
+    record = make_record(export, '9/30/2024 12:00:00', **{header: 'First line\nsecond line'})
+    split = record.index(b'\n') + 1
+    append_bytes(export, record[:split])
+    assert live.refresh().n_rows == n_rows
+    append_bytes(export, record[split:])
+    state = live.refresh()
+    assert (state.epoch, state.n_rows) == (0, n_rows + 1)
+    assert state.frame[COL_ANYTHING_ELSE].iloc[-1] == 'First line\nsecond line'
+    assert_matches_export(live, export)
+
+
+def test_rewritten_export_is_reloaded(live, export):
+    with open(export, 'rb') as f:
+        data = f.read()
+    # Same size, the last response's Timestamp changed within the bytes checked before the offset
+    with open(export, 'wb') as f:
+        f.write(data.replace(b'8/20/2024 14:01:30', b'8/20/2024 14:01:31', 1))
+    state = live.refresh()
+    assert state.epoch == 1
+    assert_matches_export(live, export)
+
+    # Truncated by its last response
+    with open(export, 'wb') as f:
+        f.write(data[:record_end(data[:-1])])
+    state = live.refresh()
+    assert (state.epoch, state.n_rows) == (2, len(read_csv(DATA_PATH)) - 1)
+    assert_matches_export(live, export)
+
+
+def same_cube(a, b):
+    return all(np.allclose(array, b.cuboids[cuboid][name], rtol=1e-12, atol=0)
+               for cuboid, cells in a.cuboids.items() for name, array in cells.items())
+
+
+def same_text_index(a, b):
+    terms = [np.array(index.terms, dtype=object)[np.maximum(index.tokens, 0)] for index in (a, b)]
+    return np.array_equal(a.tokens < 0, b.tokens < 0) and np.array_equal(*terms) \
+        and np.array_equal(a.answer_rows, b.answer_rows) and np.array_equal(a.answer_columns, b.answer_columns) \
+        and all(np.array_equal(a.search(query), b.search(query)) for query in ['talking', '"the music"', 'dj music'])
+
+
+@pytest.mark.parametrize('cache, key, same', [(live_cubes, (), same_cube), (live_cubes, FILTER, same_cube),
+                                              (live_text_index, None, same_text_index),
+                                              (live_timelines, (), same_timeline),
+                                              (live_timelines, FILTER, same_timeline)])
+def test_incremental_cache_matches_full_build(live, export, cache, key, same):
+    cache = IncrementalCache(cache.build, cache.merge)
+    ingest.pinned.state = live.state
+    cache.get(key)
+
+    header = EXPORT_HEADERS.get(TEXT_COLUMNS[0], TEXT_COLUMNS[0])
+    changes = {EXPORT_HEADERS.get(COL_GENDER, COL_GENDER): 'Female', header: 'Quieter music after midnight'}
+    append_bytes(export, make_record(export, '9/30/2024 12:00:00', **changes)
+                 + make_record(export, '7/01/2024 09:00:00'))
+    ingest.pinned.state = live.refresh()
+    assert ingest.pinned.state.appended == 2
+    assert same(cache.get(key), cache.build(key, ingest.pinned.state.frame))
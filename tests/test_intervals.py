@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from src import analytics
+from src.utils import COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE, COL_TALK_PERCEPTION, \
+    COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ, COL_IMPACT_ATMOSPHERE
+
+# Bootstrap intervals against resampling the respondents themselves, and bracketing the means of the bundled survey
+
+DEMOGRAPHIC_COLUMNS = [COL_AGE, COL_GENDER, COL_ATTENDANCE, COL_EXPERIENCE]
+YAPPING_BREAKDOWNS = DEMOGRAPHIC_COLUMNS + [COL_TALK_PERCEPTION, COL_IMPACT_EXPERIENCE, COL_IMPACT_DJ,
+                                            COL_IMPACT_ATMOSPHERE]
+
+
+def test_bootstrap_mean_intervals():
+    values = np.array([1.0, 2.0, 5.0])
+    counts = np.array([[30, 10, 5], [0, 0, 0]])
+    lower, upper = analytics.bootstrap_mean_intervals(counts, values, n_resamples=20000)
+    assert np.isnan(lower[1]) and np.isnan(upper[1])
+
+    rows = np.repeat(values, counts[0])
+    rng = np.random.default_rng(1)
+    means = rng.choice(rows, size=(20000, len(rows))).mean(axis=1)
+    expected = np.quantile(means, [0.025, 0.975])
+    assert lower[0] == pytest.approx(expected[0], abs=0.05)
+    assert upper[0] == pytest.approx(expected[1], abs=0.05)
+
+
+@pytest.mark.parametrize('column', DEMOGRAPHIC_COLUMNS)
+def test_likelihood_intervals(survey, cube, column):
+    means = analytics.likelihood_by_importance(cube, column)
+    lower, upper = analytics.likelihood_intervals(cube, column, n_resamples=2000)
+    assert lower.shape == upper.shape == means.shape
+    answered = means.notna().to_numpy()
+    assert (lower.notna().to_numpy() == answered).all()
+    assert (lower.to_numpy()[answered] <= means.to_numpy()[answered] + 1e-12).all()
+    assert (means.to_numpy()[answered] <= upper.to_numpy()[answered] + 1e-12).all()
+
+
+@pytest.mark.parametrize('column', YAPPING_BREAKDOWNS)
+def test_yapping_intervals(survey, cube, column):
+    means = analytics.yapping_by_group(cube, column)
+    intervals = analytics.yapping_intervals(cube, column, n_resamples=2000)
+    assert list(intervals.index) == list(means.index)
+    answered = means.notna()
+    assert (intervals['Lower'].notna() == answered).all()
+    assert (intervals['Lower'][answered] <= means[answered] + 1e-12).all()
+    assert (means[answered] <= intervals['Upper'][answered] + 1e-12).all()
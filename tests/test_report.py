@@ -0,0 +1,77 @@
+import ast
+
+import pytest
+from streamlit.testing.v1 import AppTest
+from src import report
+from src.yapping_factor import BREAKDOWN_VARIABLES
+
+# The report against the pages themselves: every option of every radio, selectbox and select slider a page shows,
+# including the ones revealed by another option, must be a selection of one of the page's report charts
+
+
+# Pages of main.py, read without running the app; the home page has no charts
+def read_pages():
+    with open('main.py') as f:
+        tree = ast.parse(f.read())
+    pages = next(ast.literal_eval(node.value) for node in tree.body
+                 if isinstance(node, ast.Assign) and getattr(node.targets[0], 'id', None) == 'PAGES')
+    return {page: module for page, module in pages.items() if page != "Home"}
+
+
+PAGES = read_pages()
+
+# The calculator scores the reader's own answers and draws no chart
+IGNORED_WIDGETS = {"Select your talking frequency:", "Select your typical talking duration:"}
+
+# Widgets whose options pick a group of columns, each charted on its own
+GROUPED_WIDGETS = {"Select breakdown variable type:": BREAKDOWN_VARIABLES}
+
+
+def run_page(module):
+    return AppTest.from_string(f"from {module} import app\napp()", default_timeout=60).run()
+
+
+def get_widgets(at):
+    return [widget for widget in list(at.radio) + list(at.selectbox) + list(at.select_slider)
+            if widget.label not in IGNORED_WIDGETS]
+
+
+# Options of the widgets shown now that are not in seen, and of the widgets each of their options reveals
+def collect_options(at, seen):
+    labels = [widget.label for widget in get_widgets(at) if widget.label not in seen]
+    seen = seen | set(labels)
+    options = set()
+    for label in labels:
+        widget = next((widget for widget in get_widgets(at) if widget.label == label), None)
+        for option in widget.options if widget is not None else []:
+            next(widget for widget in get_widgets(at) if widget.label == label).set_value(option)
+            at.run()
+            assert not at.exception, (label, option)
+            # An option that only reveals other widgets is covered by theirs
+            grouped = GROUPED_WIDGETS.get(label)
+            options |= collect_options(at, seen) or (set(grouped[option]) if grouped else {option})
+    return options
+
+
+def test_every_page_is_reported():
+    assert list(dict.fromkeys(page for page, _, _, _ in report.enumerate_tasks())) == list(PAGES)
+
+
+@pytest.mark.parametrize('page, module', PAGES.items())
+def test_every_option_is_reported(page, module):
+    selections = set()
+    for task_page, _, _, task_selections in report.enumerate_tasks():
+        if task_page == page:
+            for selection in task_selections:
+                selections |= {str(value) for value in selection} if isinstance(selection, list) else {str(selection)}
+    at = run_page(module)
+    assert not at.exception
+    assert collect_options(at, set()) <= selections
+
+
+def test_render_charts():
+    tasks = [task for task in report.enumerate_tasks() if task[0] == "Quiet Importance"]
+    charts = report.render_charts(tasks, workers=1)
+    assert [f'id="chart-{i}"' in chart for i, chart in enumerate(charts)] == [True] * len(tasks)
+    html = report.build_html(tasks, charts)
+    assert html.count('<h2>') == 1 and html.count('<h3>') == len(tasks)
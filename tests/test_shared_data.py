@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+from src.utils import DATA_PATH, COL_GENDER, COL_AGE, COL_ANYTHING_ELSE, read_dataset, freeze, \
+    get_shared_memory_report
+
+
+# A page run that records which frame and derived scores it was served
+def session():
+    import streamlit as st
+    from src.utils import load_data
+    from src.derived import load_yapping_factor
+
+    st.session_state['frame'] = id(load_data())
+    st.session_state['scores'] = id(load_yapping_factor())
+
+
+def test_sessions_share_one_frame():
+    first, second = AppTest.from_function(session).run(), AppTest.from_function(session).run()
+    assert not first.exception and not second.exception
+    assert first.session_state['frame'] == second.session_state['frame']
+    assert first.session_state['scores'] == second.session_state['scores']
+
+    report = get_shared_memory_report(2)
+    assert report['saved_bytes'] == report['shared_bytes'] > 0
+
+
+def test_frozen_frame_is_read_only():
+    df = read_dataset(DATA_PATH)
+    frozen = freeze(df)
+    pd.testing.assert_frame_equal(frozen, df)
+    for column in [COL_GENDER, COL_AGE, COL_ANYTHING_ELSE]:
+        with pytest.raises(ValueError, match='read-only'):
+            frozen.iloc[0, frozen.columns.get_loc(column)] = frozen[column].iloc[1]
+    with pytest.raises(ValueError, match='read-only'):
+        np.asarray(frozen[COL_GENDER].cat.codes)[0] = 0
+    pd.testing.assert_frame_equal(frozen, df)
+
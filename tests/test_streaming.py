@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils import DATA_PATH, COL_GENDER, COL_AGE, COL_TALK_FREQUENCY, COL_TALK_DURATION, read_csv, \
+    read_validated_csv
+from src.scoring import score_yapping_factor
+from src.analytics import score_counts
+from src.cube import build_cube
+from src.contingency import build_contingency
+from src.filters import select_rows
+from src.streaming import stream_aggregates
+from src.validation import get_quarantine_path, COL_REJECTION_REASONS
+
+FILTERS = [(), ((COL_GENDER, ('Female',)),)]
+
+
+# Chunks small enough that the bundled survey is streamed in several, one of them partial
+@pytest.mark.parametrize('chunk_rows', [7, 50])
+@pytest.mark.parametrize('filter_key', FILTERS)
+def test_stream_matches_full_build(filter_key, chunk_rows):
+    df = read_csv(DATA_PATH)
+    rows = df[select_rows(df, filter_key)] if filter_key else df
+    streamed = stream_aggregates(DATA_PATH, filter_key, chunk_rows)
+
+    expected = build_cube(rows)
+    for cuboid, cells in expected.cuboids.items():
+        for name, array in cells.items():
+            assert np.allclose(array, streamed.cube.cuboids[cuboid][name], rtol=1e-12, atol=0), (cuboid, name)
+    assert np.array_equal(build_contingency(rows).counts, streamed.contingency.counts)
+    pd.testing.assert_series_equal(score_counts(score_yapping_factor(rows[COL_TALK_FREQUENCY],
+                                                                     rows[COL_TALK_DURATION])),
+                                   streamed.score_counts, check_dtype=False)
+
+
+# The bundled survey with answers off the schema in three rows of different chunks
+@pytest.fixture
+def invalid_survey(tmp_path):
+    df = pd.read_csv(DATA_PATH, dtype=str, keep_default_na=False)
+    df.loc[[5, 60], COL_GENDER] = 'Robot'
+    df.loc[100, COL_AGE] = '200'
+    path = str(tmp_path / 'invalid_survey.csv')
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_stream_quarantines_rejected_rows(invalid_survey):
+    df, rejections = read_validated_csv(invalid_survey)
+    bundled = read_validated_csv(DATA_PATH)[1].summary()
+    streamed = stream_aggregates(invalid_survey, (), chunk_rows=25)
+
+    assert streamed.n_rows == len(df) == len(read_csv(DATA_PATH)) - 3
+    assert streamed.rejected == rejections.summary()
+    assert streamed.rejected['rows'] == bundled['rows'] + 3
+    assert streamed.rejected['columns'][COL_GENDER] == bundled['columns'].get(COL_GENDER, 0) + 2
+    quarantine = pd.read_csv(get_quarantine_path(invalid_survey))
+    assert quarantine[COL_REJECTION_REASONS].tolist() == rejections.rows[COL_REJECTION_REASONS].tolist()
+
+    # Filtered passes leave the summary and the quarantine file to the unfiltered one
+    os.remove(get_quarantine_path(invalid_survey))
+    assert stream_aggregates(invalid_survey, FILTERS[1], chunk_rows=25).rejected is None
+    assert not os.path.exists(get_quarantine_path(invalid_survey))
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from src import analytics
+from src.aggregations import tokenize_multi_select, parse_multi_select
+from src.utils import COL_TALKING_FACTORS, EXPORT_HEADERS, TALKING_FACTORS
+
+# Talking factors against the comma-joined answers split in pandas, run on the raw survey
+
+
+def test_tokenize_multi_select():
+    options = ['Loud music', 'Friends, old and new', 'Alcohol']
+    assert tokenize_multi_select('Friends, old and new, Alcohol', options) == 0b110
+    assert tokenize_multi_select('Alcohol, Something else, ', options) == 0b100
+    np.testing.assert_array_equal(parse_multi_select(pd.Series(['Loud music', None, 'Loud music, Alcohol']), options),
+                                  [0b001, -1, 0b101])
+
+
+def factor_flags(survey):
+    # The export's factor header lost its closing parenthesis
+    answers = survey[EXPORT_HEADERS[COL_TALKING_FACTORS]]
+    answered = answers.notna()
+    ticked = answers[answered].str.split(', ')
+    return pd.DataFrame({factor: ticked.apply(lambda options: factor in options) for factor in TALKING_FACTORS}), \
+        answered.sum()
+
+
+def test_factor_prevalence(survey, cube):
+    flags, answered = factor_flags(survey)
+    prevalence = analytics.factor_prevalence(cube)
+    np.testing.assert_array_equal(prevalence['Count'], flags.sum().to_numpy())
+    np.testing.assert_allclose(prevalence['Percentage'], flags.sum().to_numpy() / answered * 100, rtol=1e-12)
+
+
+def test_factor_cooccurrence(survey, cube):
+    flags, _ = factor_flags(survey)
+    flags = flags.astype(int)
+    np.testing.assert_array_equal(analytics.factor_cooccurrence(cube).to_numpy(), (flags.T @ flags).to_numpy())
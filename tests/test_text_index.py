@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils import DATA_PATH, COL_GENDER, TEXT_COLUMNS, read_dataset
+from src.text_index import TEXT_INDEX_COLUMNS, build_text_index, tokenize, parse_query
+
+# Searches and term counts against scanning the tokens of every answer in Python, over the bundled survey
+
+QUERIES = ['music', 'DJ', 'dj music', '"the music"', '"talking on the dancefloor" dj', 'after-party', "don't",
+           '"music the"', 'zzzz', '""', '']
+
+
+@pytest.fixture(scope='module')
+def df():
+    return read_dataset(DATA_PATH, TEXT_INDEX_COLUMNS)
+
+
+@pytest.fixture(scope='module')
+def index(df):
+    return build_text_index(df)
+
+
+# Terms of every answer, by row and then question
+@pytest.fixture(scope='module')
+def answers(df):
+    texts = df[TEXT_COLUMNS].to_numpy(dtype=object)
+    return [list(tokenize([text])[0]) for text in texts[pd.notna(texts)]]
+
+
+def contains(terms, phrase):
+    return any(terms[i:i + len(phrase)] == phrase for i in range(len(terms) - len(phrase) + 1))
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_search(index, answers, query):
+    expected = [i for i, terms in enumerate(answers) if all(contains(terms, phrase) for phrase in parse_query(query))]
+    np.testing.assert_array_equal(index.search(query), expected)
+
+
+def test_search_finds_answers(index):
+    assert 0 < len(index.search('"the music"')) < len(index.search('music')) < index.n_answers
+
+
+def test_term_counts(index, answers):
+    mask = index.answer_mask(TEXT_COLUMNS[:2], ((COL_GENDER, ('Female',)),))
+    counts = index.term_counts(mask).set_index('Term')
+    selected = [terms for terms, selected in zip(answers, mask) if selected]
+    for term in ['music', 'the', 'dj', 'talking']:
+        assert counts.loc[term, 'Answers'] == sum(term in terms for terms in selected)
+        assert counts.loc[term, 'Mentions'] == sum(terms.count(term) for terms in selected)
+
+
+@pytest.mark.parametrize('split', [1, 40, 100])
+def test_append_matches_full_build(df, index, split):
+    joined = build_text_index(df.iloc[:split]).append(build_text_index(df.iloc[split:].reset_index(drop=True)))
+    assert joined.n_answers == index.n_answers and joined.n_rows == index.n_rows
+    np.testing.assert_array_equal(np.array(joined.terms, dtype=object)[np.maximum(joined.tokens, 0)],
+                                  np.array(index.terms, dtype=object)[np.maximum(index.tokens, 0)])
+    np.testing.assert_array_equal(joined.tokens < 0, index.tokens < 0)
+    np.testing.assert_array_equal(joined.answer_rows, index.answer_rows)
+    np.testing.assert_array_equal(joined.texts, index.texts)
+    for query in QUERIES:
+        np.testing.assert_array_equal(joined.search(query), index.search(query))
+    pd.testing.assert_frame_equal(joined.term_counts(np.ones(joined.n_answers, bool)).set_index('Term').sort_index(),
+                                  index.term_counts(np.ones(index.n_answers, bool)).set_index('Term').sort_index())
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils import DATA_PATH, COL_TIMESTAMP, COL_TALK_FREQUENCY, COL_TALK_DURATION, read_dataset
+from src.scoring import score_yapping_factor
+from src.timeline import TIMELINE_COLUMNS, SHARE_MEASURES, TREND_MEASURES, EVENT_GAP_HOURS, build_timeline, \
+    resample_timeline, rolling_timeline
+from src.trends import ROLLING_WINDOWS
+
+# Resampled and rolling trends against pandas resample and rolling over the responses of the bundled survey
+
+
+@pytest.fixture(scope='module')
+def df():
+    return read_dataset(DATA_PATH, TIMELINE_COLUMNS)
+
+
+@pytest.fixture(scope='module')
+def timeline(df):
+    return build_timeline(df)
+
+
+# Every measure per dated response (NaN where unanswered), indexed by the hour it was submitted in
+@pytest.fixture(scope='module')
+def measures(df):
+    values = {TREND_MEASURES[0]: score_yapping_factor(df[COL_TALK_FREQUENCY], df[COL_TALK_DURATION])}
+    for measure, (col, answers) in SHARE_MEASURES.items():
+        values[measure] = np.where(df[col].isna(), np.nan, df[col].isin(answers) * 100.0)
+    frame = pd.DataFrame(values, index=df[COL_TIMESTAMP].dt.floor('h'))
+    return frame[frame.index.notna()].sort_index()
+
+
+def assert_trends(trends, responses, counts, means):
+    for measure in TREND_MEASURES:
+        rows = trends[trends['Measure'] == measure]
+        np.testing.assert_array_equal(rows['Responses'], responses)
+        np.testing.assert_array_equal(rows['Answers'], counts[measure])
+        np.testing.assert_allclose(rows['Mean'], means[measure], rtol=1e-12)
+
+
+# Weeks start on Mondays, and 1970-01-05 was one
+@pytest.mark.parametrize('period, rule', [('Day', pd.offsets.Day()), ('Week', pd.Timedelta(weeks=1))])
+def test_resample(measures, timeline, period, rule):
+    resampled = measures.resample(rule, origin=pd.Timestamp('1970-01-05'))
+    responses = resampled.size()
+    used = responses > 0
+    trends = resample_timeline(timeline, period)
+    np.testing.assert_array_equal(trends['Start'].unique(), responses.index[used])
+    assert_trends(trends, responses[used], resampled.count()[used], resampled.mean()[used])
+
+
+def test_resample_events(measures, timeline):
+    hours = measures.index.to_series()
+    events = measures.groupby((hours.diff() > pd.Timedelta(hours=EVENT_GAP_HOURS)).cumsum().to_numpy())
+    trends = resample_timeline(timeline, 'Event')
+    assert trends['Period'].nunique() == events.ngroups > 1
+    assert_trends(trends, events.size(), events.count(), events.mean())
+
+
+@pytest.mark.parametrize('window', ROLLING_WINDOWS.values())
+def test_rolling(measures, timeline, window):
+    hourly = measures.resample('h')
+    sums = hourly.sum().rolling(window, min_periods=1).sum()
+    counts = hourly.count().rolling(window, min_periods=1).sum()
+    rolling = rolling_timeline(timeline, window)
+    for measure in TREND_MEASURES:
+        rows = rolling[rolling['Measure'] == measure]
+        np.testing.assert_array_equal(rows['Time'], counts.index + pd.Timedelta(hours=1))
+        np.testing.assert_array_equal(rows['Answers'], counts[measure])
+        with np.errstate(invalid='ignore'):
+            expected = np.where(counts[measure] > 0, sums[measure] / counts[measure], np.nan)
+        np.testing.assert_allclose(rows['Mean'], expected, rtol=1e-9, atol=1e-9)
+
+
+def test_merge_matches_full_build(df, timeline):
+    merged = build_timeline(df.iloc[:50]).merge(build_timeline(df.iloc[50:]))
+    assert (merged.start, merged.undated) == (timeline.start, timeline.undated)
+    np.testing.assert_array_equal(merged.responses, timeline.responses)
+    np.testing.assert_array_equal(merged.counts, timeline.counts)
+    np.testing.assert_allclose(merged.sums, timeline.sums, rtol=1e-12)
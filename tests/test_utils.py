@@ -0,0 +1,25 @@
+import os
+
+from src.utils import CACHE_DIR, get_snapshot_path, make_temp_file
+from src.validation import get_quarantine_path
+
+
+def test_cache_paths_differ_by_directory(tmp_path):
+    first, second = tmp_path / 'a' / 'survey.csv', tmp_path / 'b' / 'survey.csv'
+    assert get_snapshot_path(str(first)) != get_snapshot_path(str(second))
+    assert get_quarantine_path(str(first)) != get_quarantine_path(str(second))
+    # The same export reached by another relative path shares its cache file
+    assert get_snapshot_path(os.path.relpath(first)) == get_snapshot_path(str(first))
+    assert os.path.dirname(get_snapshot_path(str(first))) == CACHE_DIR
+
+
+def test_temp_files_follow_the_umask(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        paths = [make_temp_file(str(tmp_path / 'snapshot.parquet')) for _ in range(3)]
+    finally:
+        os.umask(umask)
+    assert len(set(paths)) == 3
+    for path in paths:
+        assert os.path.dirname(path) == str(tmp_path)
+        assert os.stat(path).st_mode & 0o777 == 0o644
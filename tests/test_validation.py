@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils import DATA_PATH, COL_QUIET_IMPORTANCE, COL_LIKELIHOOD_INTERVENE, COL_NUMBER_OF_ROLES, ROLE_COLUMNS, \
+    MISSING_INTEGER, read_validated_csv
+from src.validation import COL_REJECTION_REASONS
+
+
+# The bundled survey with blank integer answers, and one Likert answer off the scale
+@pytest.fixture(scope='module')
+def blank_survey(tmp_path_factory):
+    df = pd.read_csv(DATA_PATH, dtype=str, keep_default_na=False)
+    df.loc[[3, 10, 50], COL_QUIET_IMPORTANCE] = ''
+    df.loc[[10, 70], COL_LIKELIHOOD_INTERVENE] = ''
+    df.loc[20, ROLE_COLUMNS[1]] = ''
+    df.loc[30, COL_NUMBER_OF_ROLES] = ''
+    df.loc[40, COL_LIKELIHOOD_INTERVENE] = '7'
+    path = str(tmp_path_factory.mktemp('validation') / 'blank_answers_survey.csv')
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_blank_integers_are_missing(blank_survey):
+    df, rejections = read_validated_csv(blank_survey)
+    assert len(df) == 118
+    assert rejections.summary() == {'rows': 1, 'columns': {COL_LIKELIHOOD_INTERVENE: 1}}
+    assert rejections.rows[COL_REJECTION_REASONS].tolist() == [f"{COL_LIKELIHOOD_INTERVENE}: unexpected value '7'"]
+    assert (df[COL_QUIET_IMPORTANCE] == MISSING_INTEGER).sum() == 3
+    assert (df[COL_LIKELIHOOD_INTERVENE] == MISSING_INTEGER).sum() == 2
+
+
+def test_cube_leaves_blank_integers_out(blank_survey):
+    from src.cube import build_cube, CUBE_COLUMNS
+    from src import analytics
+
+    raw = pd.read_csv(blank_survey)
+    raw = raw[raw[COL_LIKELIHOOD_INTERVENE] != 7]
+    cube = build_cube(read_validated_csv(blank_survey, CUBE_COLUMNS)[0])
+
+    importance, likelihood = analytics.quiet_averages(cube)
+    assert importance == pytest.approx(raw[COL_QUIET_IMPORTANCE].mean(), rel=1e-12)
+    assert likelihood == pytest.approx(raw[COL_LIKELIHOOD_INTERVENE].mean(), rel=1e-12)
+    counts, _ = analytics.quiet_heatmap(cube)
+    assert counts.to_numpy().sum() == raw[[COL_QUIET_IMPORTANCE, COL_LIKELIHOOD_INTERVENE]].notna().all(axis=1).sum()
+    roles = analytics.role_distribution(cube)
+    np.testing.assert_array_equal(roles[ROLE_COLUMNS].to_numpy(), raw[ROLE_COLUMNS].sum().to_numpy())
+
+
+def test_database_leaves_blank_integers_out(blank_survey):
+    from src.database import check_parity
+
+    assert check_parity(blank_survey, 'sqlite', filter_keys=[()]) == []